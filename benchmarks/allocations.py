@@ -0,0 +1,269 @@
+"""
+Memory allocated per frame by the GestureHandler state: coordinates, listening hand, swipe/click state machines and
+payload, on a landmark recording (see RECORD_LANDMARKS_PATH in pipeline.py)
+
+Usage: python -m benchmarks.allocations RECORDING
+
+The landmarks and gestures of every frame are computed first, so only the per-frame state updates are measured.
+Reports, with tracemalloc, the peak of the memory allocated during a frame (the objects built then dropped) and the
+memory still held after it, then the time per frame without tracing, for the handlers updating their state in place
+and for the baseline rebuilding it on each frame (the Legacy* classes: new coordinates, in-area, deltas and locked
+coordinates containers, the click transitions table rebuilt at every step, payloads sharing the state).
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.replay import MODEL_PATH, RESOLUTION, SWIPE_SENSITIVITY
+from helpers.gesture_handler.activation_area import get_activation_area
+from helpers.gesture_handler.click_handler import MAX_HOLDING_SINCE, ClickHandler, States
+from helpers.gesture_handler.coordinates import is_hand_in_area_of_activation
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.recording import RecordedFaceTracker, RecordedLandmarks, load_recording
+from helpers.gesture_handler.swipe_handler import SwipeHandler
+
+
+class LegacyClickHandler(ClickHandler):
+    """
+    Click state machine evaluating a transitions table rebuilt at every step, as before the TRANSITIONS table
+    """
+
+    def handle_step(self, current_gesture):
+        if current_gesture == "palm" or current_gesture == "closed":
+            self.previous_gesture = self.current_gesture
+            self.current_gesture = current_gesture
+
+        current_time = self.clock()
+        holding_since = current_time - self.state_since if self.state_since is not None else None
+
+        if holding_since is not None and holding_since > MAX_HOLDING_SINCE:
+            self.state_since = current_time
+            self.current_state = States.PENDING
+
+        # The None check fixed with the TRANSITIONS table is kept, so both paths give the same actions
+        in_time = holding_since is not None and holding_since <= MAX_HOLDING_SINCE
+
+        transitions = {
+            States.PENDING: {
+                "condition": current_gesture == "palm",
+                "next_state": States.FIRST_OPEN
+            },
+            States.FIRST_OPEN: {
+                "condition": self.previous_gesture == "palm" and current_gesture == "closed" and in_time,
+                "next_state": States.FIRST_CLOSED
+            },
+            States.FIRST_CLOSED: {
+                "condition": self.previous_gesture == "closed" and current_gesture == "palm" and in_time,
+                "next_state": States.SECOND_OPEN
+            },
+            States.SECOND_OPEN: {
+                "condition": self.previous_gesture == "palm" and current_gesture == "closed" and in_time,
+                "next_state": States.SECOND_CLOSED
+            },
+            States.SECOND_CLOSED: {
+                "condition": self.previous_gesture == "closed" and current_gesture == "palm" and in_time,
+                "next_state": States.CLICK
+            },
+            States.CLICK: {
+                "condition": True,
+                "next_state": States.PENDING
+            }
+        }
+
+        transition = transitions[self.current_state]
+
+        if transition["condition"]:
+            self.state_since = current_time
+            self.current_state = transition["next_state"]
+
+
+class LegacySwipeHandler(SwipeHandler):
+    """
+    Swipe handler building new locked coordinates and deltas containers instead of updating them
+    """
+
+    def reset_locked_coords(self):
+        self.locked_control_coords = [
+            (0, 0),
+            (0, 0),
+        ]
+
+    def get_current_swipe(self):
+        self.deltas = {"x": 0, "y": 0}
+
+        return super().get_current_swipe()
+
+
+class LegacyGestureHandler(GestureHandler):
+    """
+    Gesture handler building its per-frame dicts on each frame, with payloads sharing them instead of copies
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.swipe_handler = LegacySwipeHandler(self.frame_resolution, kwargs["swipe_sensitivity"])
+        self.click_handler = LegacyClickHandler(self.clock)
+
+    def compute_coordinates(self, detect_face=True):
+        self.coordinates = {key: (0, 0) for key in ["left_hand", "right_hand", "face"]}
+
+        super().compute_coordinates(detect_face)
+
+    def get_listening_hand(self):
+        self.activation_area = activation_area = get_activation_area(self.coordinates["face"])
+
+        in_activation_area = {
+            "left_hand": is_hand_in_area_of_activation(self.coordinates["left_hand"], activation_area),
+            "right_hand": is_hand_in_area_of_activation(self.coordinates["right_hand"], activation_area),
+        }
+
+        for hand, is_pending in in_activation_area.items():
+            if self.hand_listened == hand:
+                continue
+
+            if not is_pending:
+                self.hand_pending[hand] = False
+                self.pending_from[hand] = None
+                continue
+
+            if self.get_gesture(hand)[0] == "palm":
+                self.hand_pending[hand] = True
+
+                if not self.pending_from[hand]:
+                    self.pending_from[hand] = self.clock()
+
+                if self.clock() - self.pending_from[hand] > 1:
+                    self.hand_listened = hand
+                    self.hand_pending[hand] = False
+                    self.pending_from[hand] = None
+
+        return self.hand_listened
+
+    def build_payload(self):
+        listening_hand = self.get_listening_hand()
+
+        if not listening_hand:
+            return {
+                "hand": None,
+                "coordinates": self.coordinates,
+                "gesture": "no_gesture",
+                "deltas": {"x": 0, "y": 0},
+                "action": None,
+            }
+
+        action = self.listen(listening_hand)
+
+        return {
+            "hand": listening_hand,
+            "coordinates": self.coordinates,
+            "gesture": self.current_gesture,
+            "deltas": self.swipe_handler.deltas,
+            "action": action,
+        }
+
+
+def prepare_frames(recording_path):
+    """
+    :return: (list of (timestamp, landmarks dict, gestures dict, detect_face) of each frame, landmark model of the
+    recording)
+    """
+    timestamps, hands, faces, detect_face = load_recording(recording_path)
+
+    current_time = 0
+
+    def clock():
+        return current_time
+
+    gesture_handler = GestureHandler(RESOLUTION, RecordedLandmarks(hands, faces), MODEL_PATH,
+                                     swipe_sensitivity=SWIPE_SENSITIVITY, gesture_model_backend="numpy", clock=clock,
+                                     face_tracker=RecordedFaceTracker(detect_face))
+    frame = np.zeros((1, 1, 3), dtype=np.uint8)
+    frames = []
+
+    for timestamp, frame_detect_face in zip(timestamps, detect_face):
+        current_time = float(timestamp)
+
+        gesture_handler.handle_frame(frame)
+        gesture_handler.classify_hands()
+
+        frames.append((current_time, dict(gesture_handler.landmarks), dict(gesture_handler.gestures),
+                       bool(frame_detect_face)))
+
+    return frames, gesture_handler.landmark_model
+
+
+def run(frames, landmark_model, trace, handler_class=GestureHandler):
+    """
+    Run the per-frame state updates of a new handler on the prepared frames
+    :param handler_class: GestureHandler, or LegacyGestureHandler for the baseline
+    :return: (peak bytes allocated during each frame, bytes held after each frame, seconds per frame, action of each
+    frame)
+    """
+    current_time = 0
+
+    def clock():
+        return current_time
+
+    gesture_handler = handler_class(RESOLUTION, landmark_model, MODEL_PATH, swipe_sensitivity=SWIPE_SENSITIVITY,
+                                    gesture_model_backend="numpy", clock=clock)
+
+    peaks = []
+    held = []
+    durations = []
+    actions = []
+
+    for timestamp, landmarks, gestures, detect_face in frames:
+        current_time = timestamp
+
+        if trace:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+
+        gesture_handler.landmarks = landmarks
+        gesture_handler.compute_coordinates(detect_face)
+        gesture_handler.gestures = gestures
+        # Dropped right away, as the sender does once the payload is sent
+        action = gesture_handler.build_payload()["action"]
+
+        duration = time.perf_counter() - start
+
+        if trace:
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            held.append(after - before)
+
+        durations.append(duration)
+        actions.append(action)
+
+    return peaks, held, durations, actions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording")
+    args = parser.parse_args()
+
+    frames, landmark_model = prepare_frames(args.recording)
+    print(f"{len(frames)} frames")
+
+    results = {}
+
+    for name, handler_class in (("baseline", LegacyGestureHandler), ("in place", GestureHandler)):
+        tracemalloc.start()
+        peaks, held, _, actions = run(frames, landmark_model, trace=True, handler_class=handler_class)
+        tracemalloc.stop()
+
+        _, _, durations, _ = run(frames, landmark_model, trace=False, handler_class=handler_class)
+        results[name] = actions
+
+        print(f"{name:>8}: allocated during a frame (peak) mean {np.mean(peaks):.0f} B, "
+              f"p95 {np.percentile(peaks, 95):.0f} B, held after a frame mean {np.mean(held):.1f} B, "
+              f"time per frame p50 {np.percentile(durations, 50) * 1e6:.1f} us, "
+              f"p95 {np.percentile(durations, 95) * 1e6:.1f} us")
+
+    print("Same actions" if results["baseline"] == results["in place"] else "The actions differ")
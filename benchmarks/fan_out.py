@@ -0,0 +1,140 @@
+"""
+Delivery latency of the fan-out GestureServer with 1, 10 and 100 local clients
+
+Usage: python -m benchmarks.fan_out [--clients N ...] [--seconds S] [--fps N] [--slow-clients N] [--protocol P]
+
+A simulated session is published at the pipeline frame rate, with the publish time in each payload. The clients
+connect from another process and measure publish to receive latency. --slow-clients adds clients sleeping 50 ms
+per message (with a small receive buffer, like a loaded device), which overflow their buffer on the server and get
+evicted without delaying the others.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+
+import numpy as np
+import websockets
+
+from benchmarks.synthetic import simulated_session
+from helpers.instrumentation import LatencyHistogram
+from helpers.websockets.protocol import ChangeOnlyEncoder
+from helpers.websockets.server import GestureServer
+
+PORT = 8766
+SLOW_CLIENT_DELAY = 0.05
+SLOW_CLIENT_RECEIVE_BUFFER = 4096
+
+
+async def run_client(uri, histogram, slow, counters):
+    async with websockets.connect(uri, compression=None, max_queue=1 if slow else 16) as websocket:
+        if slow:
+            websocket.transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                                                     SLOW_CLIENT_RECEIVE_BUFFER)
+
+        try:
+            async for message in websocket:
+                counters["received"] += 1
+
+                if isinstance(message, str) and message.startswith('{"sent_at"'):
+                    histogram.record(int((time.perf_counter() - json.loads(message)["sent_at"]) * 1e9))
+
+                if slow:
+                    await asyncio.sleep(SLOW_CLIENT_DELAY)
+
+        except websockets.ConnectionClosed:
+            pass
+
+        if websocket.close_code == 1013:
+            counters["evicted"] += 1
+
+
+async def run_clients(uri, num_clients, num_slow_clients, results, connected):
+    histograms = {"fast": LatencyHistogram(), "slow": LatencyHistogram()}
+    counters = {"received": 0, "evicted": 0}
+
+    tasks = [asyncio.create_task(run_client(uri, histograms["slow" if i < num_slow_clients else "fast"],
+                                            i < num_slow_clients, counters))
+             for i in range(num_clients + num_slow_clients)]
+
+    # Let the connections open before the publication starts
+    await asyncio.sleep(1)
+    connected.set()
+
+    await asyncio.gather(*tasks)
+
+    results.put({**counters, "latency": {name: histogram.get_report() for name, histogram in histograms.items()}})
+
+
+def clients_process(uri, num_clients, num_slow_clients, results, connected):
+    asyncio.run(run_clients(uri, num_clients, num_slow_clients, results, connected))
+
+
+async def measure(session, num_clients, num_slow_clients, fps, protocol):
+    encoder = ChangeOnlyEncoder() if protocol == "changes" else None
+    server = await GestureServer("127.0.0.1", PORT, encoder=encoder).start()
+
+    results = multiprocessing.Queue()
+    connected = multiprocessing.Event()
+    process = multiprocessing.Process(target=clients_process,
+                                      args=(f"ws://127.0.0.1:{PORT}/", num_clients, num_slow_clients, results,
+                                            connected))
+    process.start()
+    await asyncio.to_thread(connected.wait)
+
+    publish_histogram = LatencyHistogram()
+    start = time.perf_counter()
+
+    for i, (_, payload) in enumerate(session):
+        # Paced like the recognition loop
+        await asyncio.sleep(max(start + i / fps - time.perf_counter(), 0))
+
+        # The publish time comes first so the clients find it without decoding the other messages
+        payload = {"sent_at": time.perf_counter(), **payload}
+
+        publish_start = time.perf_counter_ns()
+        server.publish(payload)
+        publish_histogram.record(time.perf_counter_ns() - publish_start)
+
+    # Let the clients drain their buffers
+    await asyncio.sleep(0.5)
+    counters = server.get_counters()
+    await server.stop()
+
+    report = await asyncio.to_thread(results.get)
+    await asyncio.to_thread(process.join)
+
+    return report, publish_histogram.get_report(), counters
+
+
+def print_latency(name, latency):
+    print(f"{name:>32}: p50 {latency['p50_us']:>8.1f} us, p95 {latency['p95_us']:>8.1f} us, "
+          f"p99 {latency['p99_us']:>8.1f} us, max {latency['max_us']:>8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=48)
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument("--protocol", choices=["json", "changes"], default="json")
+    args = parser.parse_args()
+
+    session = simulated_session(np.random.default_rng(0), args.seconds, args.fps)
+
+    for num_clients in args.clients:
+        client_report, publish_latency, server_counters = asyncio.run(
+            measure(session, num_clients, args.slow_clients, args.fps, args.protocol)
+        )
+
+        print(f"\n{num_clients} clients ({args.slow_clients} slow), {len(session)} payloads published")
+        print_latency("publish (serialize + enqueue)", publish_latency)
+        if args.protocol == "json":
+            print_latency("publish to receive", client_report["latency"]["fast"])
+            if args.slow_clients:
+                print_latency("publish to receive, slow clients", client_report["latency"]["slow"])
+        print(f"{'received':>32}: {client_report['received']} messages, "
+              f"{client_report['evicted']} clients evicted (server: {server_counters['evicted']})")
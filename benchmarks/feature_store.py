@@ -0,0 +1,48 @@
+"""
+Load time of a features dataset from CSV and from a feature store
+
+Usage: python -m benchmarks.feature_store [rows]
+The datasets/*.csv rows are repeated up to `rows` rows (200 000 by default) in a temporary folder.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from helpers.ai.data import read_dataset, read_datasets
+from helpers.ai.feature_store import FeatureStore, feature_store_to_csv, read_feature_store
+
+NUM_ROWS = 200_000
+
+
+def measure(name, load):
+    start = time.perf_counter()
+    inputs = load()
+    # Touch every value so memory-mapped loads are measured with their page faults
+    checksum = float(np.asarray(inputs, dtype=np.float64).sum())
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<24}: {elapsed * 1000:9.1f} ms ({checksum:.1f})")
+
+
+if __name__ == "__main__":
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_ROWS
+
+    inputs, labels = read_datasets()
+    repeats = -(-num_rows // len(inputs))
+
+    with tempfile.TemporaryDirectory() as folder:
+        store_path = os.path.join(folder, "dataset.features")
+        csv_path = os.path.join(folder, "dataset.csv")
+
+        store = FeatureStore(store_path)
+        store.append(np.tile(inputs, (repeats, 1))[:num_rows], (labels * repeats)[:num_rows])
+        feature_store_to_csv(store_path, csv_path)
+
+        print(f"{num_rows} rows: CSV {os.path.getsize(csv_path) / 2 ** 20:.1f} MiB, "
+              f"store {sum(os.path.getsize(os.path.join(store_path, f)) for f in os.listdir(store_path)) / 2 ** 20:.1f} MiB")
+
+        measure("csv (read_dataset)", lambda: read_dataset(csv_path)[0])
+        measure("feature store (mmap)", lambda: read_feature_store(store_path)[0])
@@ -0,0 +1,31 @@
+"""
+Latency of the landmark feature extraction, one hand at a time vs batched
+
+Usage: python -m benchmarks.features
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import random_hand_points, to_landmark_list
+from helpers.computations import compute_distances_angles_from_wrist, compute_distances_angles_from_wrist_batch
+
+NUM_HANDS = 5000
+
+
+if __name__ == "__main__":
+    points = random_hand_points(np.random.default_rng(0), NUM_HANDS)
+    hands = [to_landmark_list(hand_points) for hand_points in points]
+
+    start = time.perf_counter_ns()
+    single = [compute_distances_angles_from_wrist(landmarks) for landmarks in hands]
+    single_time = time.perf_counter_ns() - start
+
+    start = time.perf_counter_ns()
+    batch = compute_distances_angles_from_wrist_batch(points)
+    batch_time = time.perf_counter_ns() - start
+
+    print(f"hands                : {NUM_HANDS}")
+    print(f"identical features   : {np.array_equal(np.array(single, dtype=np.float32), batch)}")
+    print(f"one hand per call    : {single_time / NUM_HANDS / 1000:8.2f} us/hand")
+    print(f"batched (one call)   : {batch_time / NUM_HANDS / 1000:8.2f} us/hand")
@@ -0,0 +1,70 @@
+"""
+Per-frame time spent on debug overlays (drawing + display flip) that headless mode saves.
+Landmarks are synthetic so only the GestureHandler work is measured; imshow/waitKey are not
+measured since they need a display, they only add to the savings.
+
+Usage: python -m benchmarks.headless
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import face_landmarks, random_hand_landmarks
+from helpers.camera import flip_frame
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.landmarks import HandsFaceDetectionLandmarks
+
+NUM_FRAMES = 2000
+RESOLUTION = (360, 360)
+MODEL_PATH = "./models/March28/March28.keras"
+
+
+def process_frame(gesture_handler, landmarks, frame, preview):
+    gesture_handler.landmarks = landmarks
+    gesture_handler.gestures = None
+    gesture_handler.compute_coordinates()
+
+    hand = gesture_handler.get_listening_hand()
+    if hand:
+        gesture_handler.listen(hand)
+
+    if preview:
+        gesture_handler.draw(frame, hand)
+        flip_frame(frame)
+
+
+def measure(gesture_handler, frames_landmarks, preview):
+    frame = np.zeros((RESOLUTION[1], RESOLUTION[0], 3), dtype=np.uint8)
+
+    start = time.perf_counter_ns()
+    for landmarks in frames_landmarks:
+        process_frame(gesture_handler, landmarks, frame, preview)
+    elapsed = time.perf_counter_ns() - start
+
+    return elapsed / len(frames_landmarks) / 1000
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    face = face_landmarks()
+
+    frames_landmarks = [
+        {
+            "face": face,
+            "left_hand": random_hand_landmarks(rng, (0.3, 0.35)),
+            "right_hand": random_hand_landmarks(rng, (0.7, 0.35)),
+        }
+        for _ in range(NUM_FRAMES)
+    ]
+
+    # Landmarks are injected, the landmark model is never run
+    gesture_handler = GestureHandler(RESOLUTION, HandsFaceDetectionLandmarks(), MODEL_PATH, gesture_model_backend="numpy")
+    gesture_handler.hand_listened = "right_hand"
+    gesture_handler.click_handler.reset_state()
+
+    with_preview = measure(gesture_handler, frames_landmarks, preview=True)
+    headless = measure(gesture_handler, frames_landmarks, preview=False)
+
+    print(f"with overlays + flip : {with_preview:8.1f} us/frame")
+    print(f"headless             : {headless:8.1f} us/frame")
+    print(f"saved                : {with_preview - headless:8.1f} us/frame")
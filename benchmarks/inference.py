@@ -0,0 +1,72 @@
+"""
+Parity and latency of the gesture classifier backends
+
+Usage: python -m benchmarks.inference [model_path ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from helpers.ai.data import read_datasets
+from helpers.ai.inference import load_gesture_model
+
+MODEL_PATHS = [
+    "./models/March28/March28.keras",
+    "./models/4february/4february.hdf5",
+    "./models/4_feb_w_additional_datasets/4_feb_w_additional_datasets.hdf5",
+]
+
+ITERATIONS = 2000
+KERAS_ITERATIONS = 200
+
+# Folding BatchNormalization changes the float32 rounding order, nothing more
+MAX_ABS_DIFFERENCE = 1e-4
+
+
+def time_single_row(model, inputs, iterations):
+    """
+    Average latency of one predict call on a single row, like on the hot path
+    :return: latency in microseconds
+    """
+    rows = [inputs[i % len(inputs)].reshape(1, -1) for i in range(iterations)]
+
+    model.predict(rows[0])  # Warm-up
+
+    start = time.perf_counter_ns()
+    for row in rows:
+        model.predict(row)
+    end = time.perf_counter_ns()
+
+    return (end - start) / iterations / 1000
+
+
+def compare(model_path, inputs):
+    keras_model = load_gesture_model(model_path, "keras")
+    numpy_model = load_gesture_model(model_path, "numpy")
+
+    keras_predictions = keras_model.predict(inputs)
+    numpy_predictions = numpy_model.predict(inputs)
+
+    max_difference = np.abs(keras_predictions - numpy_predictions).max()
+    same_labels = np.mean(keras_predictions.argmax(axis=1) == numpy_predictions.argmax(axis=1))
+
+    print(f"{model_path}")
+    print(f"  rows                : {len(inputs)}")
+    print(f"  max |keras - numpy| : {max_difference:.2e}")
+    print(f"  same argmax         : {same_labels * 100:.2f} %")
+    print(f"  keras predict       : {time_single_row(keras_model, inputs, KERAS_ITERATIONS):10.1f} us/call")
+    print(f"  numpy predict       : {time_single_row(numpy_model, inputs, ITERATIONS):10.1f} us/call")
+
+    return max_difference <= MAX_ABS_DIFFERENCE and same_labels == 1
+
+
+if __name__ == "__main__":
+    inputs, _ = read_datasets()
+
+    model_paths = sys.argv[1:] or MODEL_PATHS
+    results = [compare(model_path, inputs) for model_path in model_paths]
+
+    if not all(results):
+        print("Numpy backend does not match Keras")
+        sys.exit(1)
@@ -0,0 +1,100 @@
+"""
+Per-frame latency and CPU time of the landmark backends
+
+Usage: python -m benchmarks.landmark_backends [--video PATH | --frames-file PATH] [--save-frames PATH]
+                                              [--model-complexity N] [--frames N]
+Without a video, frames are random noise: detectors run but no hand/face landmarks are tracked.
+--save-frames writes the preprocessed video frames to a raw frame file, --frames-file plays such a file back
+(see helpers/frame_recording.py) so reruns measure the landmark stage without decoding the video again.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from helpers.camera import frame_preprocessing
+from helpers.frame_recording import FrameRecorder, RecordedFrames
+from helpers.gesture_handler.landmarks import LANDMARK_BACKENDS, create_landmark_model, get_landmarks
+
+RESOLUTION = (360, 360)
+
+
+def read_frames(video_path, num_frames):
+    if video_path is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, (RESOLUTION[1], RESOLUTION[0], 3), dtype=np.uint8) for _ in range(num_frames)]
+
+    capture = cv2.VideoCapture(video_path)
+    frames = []
+
+    while len(frames) < num_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame_preprocessing(frame, resolution=RESOLUTION))
+
+    capture.release()
+
+    return frames
+
+
+def read_frames_file(path, num_frames):
+    source = RecordedFrames(path)
+
+    frames = []
+    while len(frames) < num_frames:
+        frame, _, _ = source.read()
+        if frame is None:
+            break
+        frames.append(frame)
+
+    return frames
+
+
+def save_frames(frames, path):
+    with FrameRecorder(path) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.write(frame, float(i))
+
+
+def measure(backend, frames, model_complexity):
+    with create_landmark_model(backend, model_complexity=model_complexity) as landmark_model:
+        get_landmarks(frames[0], landmark_model)  # Warm-up
+
+        detected = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        for frame in frames:
+            landmarks = get_landmarks(frame, landmark_model)
+            detected += any(landmarks.values())
+
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+
+    print(f"{backend:<22}: {wall_time / len(frames) * 1000:7.2f} ms/frame, "
+          f"{cpu_time / len(frames) * 1000:7.2f} ms CPU/frame, "
+          f"{detected}/{len(frames)} frames with landmarks")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames-file", default=None)
+    parser.add_argument("--save-frames", default=None)
+    parser.add_argument("--model-complexity", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.frames_file:
+        frames = read_frames_file(args.frames_file, args.frames)
+    else:
+        frames = read_frames(args.video, args.frames)
+
+    if args.save_frames:
+        save_frames(frames, args.save_frames)
+        print(f"{len(frames)} frames saved in {args.save_frames}")
+
+    for backend in LANDMARK_BACKENDS:
+        measure(backend, frames, args.model_complexity)
@@ -0,0 +1,91 @@
+"""
+Classifier calls saved by the motion gate on a dwell-heavy synthetic session: poses held for a few seconds with
+landmark jitter and slow hand drift, then a new pose
+
+Usage: python -m benchmarks.motion_gate [epsilon]
+"""
+import sys
+import time
+
+import numpy as np
+
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.recording import RecordedLandmarks
+
+RESOLUTION = (360, 360)
+MODEL_PATH = "./models/March28/March28.keras"
+
+FPS = 30
+SECONDS = 60
+POSE_SECONDS = 3
+JITTER = 0.002  # Landmark noise of a still hand, normalized
+DRIFT = 0.001  # Hand translation per frame, normalized
+EPSILON = 0.01
+
+
+def dwell_session(rng):
+    """
+    :return: (timestamps, hands of shape (N, 2, 21, 3), faces of shape (N, 1, 3)) with the right hand only
+    """
+    num_frames = FPS * SECONDS
+    hands = np.full((num_frames, 2, 21, 3), np.nan, dtype=np.float32)
+    faces = np.tile(np.array([0.5, 0.3, 0], dtype=np.float32), (num_frames, 1, 1))
+
+    pose = None
+    for i in range(num_frames):
+        if i % (FPS * POSE_SECONDS) == 0:
+            pose = rng.random((21, 3)) * 0.1
+
+        drift = np.array([0.6 + DRIFT * (i % FPS), 0.35, 0])
+        hands[i, 1] = pose + drift + rng.normal(0, JITTER / 2, (21, 3))
+
+    return np.arange(num_frames) / FPS, hands, faces
+
+
+def run(session, motion_epsilon):
+    timestamps, hands, faces = session
+    current_time = 0
+
+    def clock():
+        return current_time
+
+    gesture_handler = GestureHandler(RESOLUTION, RecordedLandmarks(hands, faces), MODEL_PATH,
+                                     gesture_model_backend="numpy", clock=clock, motion_epsilon=motion_epsilon)
+
+    model = gesture_handler.gesture_model
+    predict = model.predict
+    calls = 0
+
+    def counted_predict(input_data):
+        nonlocal calls
+        calls += 1
+        return predict(input_data)
+
+    model.predict = counted_predict
+
+    frame = np.zeros((1, 1, 3), dtype=np.uint8)
+    gestures = []
+
+    start = time.perf_counter()
+    for timestamp in timestamps:
+        current_time = float(timestamp)
+        gesture_handler.handle_frame(frame)
+        gestures.append(gesture_handler.get_gesture("right_hand")[0])
+    elapsed = time.perf_counter() - start
+
+    return calls, elapsed / len(timestamps) * 1e6, gestures, gesture_handler.motion_gate
+
+
+if __name__ == "__main__":
+    epsilon = float(sys.argv[1]) if len(sys.argv) > 1 else EPSILON
+    session = dwell_session(np.random.default_rng(0))
+
+    calls, frame_time, gestures, _ = run(session, None)
+    gated_calls, gated_frame_time, gated_gestures, gate = run(session, epsilon)
+
+    same = np.mean([a == b for a, b in zip(gestures, gated_gestures)]) * 100
+
+    print(f"{len(gestures)} frames, epsilon {epsilon}")
+    print(f"without gate: {calls:5d} classifier calls, {frame_time:6.1f} us/frame")
+    print(f"with gate   : {gated_calls:5d} classifier calls, {gated_frame_time:6.1f} us/frame, {gate.get_report()}")
+    print(f"same gesture on {same:.2f} % of the frames")
@@ -0,0 +1,49 @@
+"""
+Throughput and latency of helpers/multi_stream.py with a growing number of streams
+
+Usage: python -m benchmarks.multi_stream FRAMES_FILE [--streams N ...] [--duration SECONDS] [--model-complexity N]
+                                         [--batch-wait SECONDS]
+Every stream plays the same raw frame file back in a loop (see --save-frames of benchmarks.landmark_backends),
+without sending the payloads, for --duration seconds once every stream started. The total frame rate should grow
+with the streams up to the number of cores.
+"""
+import argparse
+import os
+
+from helpers.multi_stream import MultiStreamRunner, print_stream_report
+
+MODEL_PATH = "./models/March28/March28.keras"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("frames_file")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default="numpy")
+    # 0 is the pipeline default, 1 is bundled with the mediapipe wheel and needs no download
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--batch-wait", type=float, default=0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    results = []
+
+    for num_streams in args.streams:
+        streams = [{"source": args.frames_file, "uri": None} for _ in range(num_streams)]
+        settings = {"model_complexity": args.model_complexity, "loop": True}
+
+        print(f"\n{num_streams} streams")
+        report = MultiStreamRunner(streams, args.model, args.backend, settings,
+                                   batch_wait=args.batch_wait).start().run(args.duration)
+
+        for stream_report in report["streams"]:
+            print_stream_report(stream_report)
+        print(f"classifier: {report['classifier']}")
+
+        total_fps = sum(stream_report["fps"] for stream_report in report["streams"] if stream_report)
+        results.append((num_streams, total_fps, report["classifier"]["mean_batch_size"]))
+
+    print(f"\n{'streams':>8}{'total fps':>12}{'per stream':>12}{'batch size':>12}")
+    for num_streams, total_fps, batch_size in results:
+        print(f"{num_streams:>8}{total_fps:>12.1f}{total_fps / num_streams:>12.1f}{batch_size:>12.2f}")
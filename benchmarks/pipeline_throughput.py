@@ -0,0 +1,72 @@
+"""
+End-to-end throughput of the recognition loop, with recognition inline in the event loop (before)
+and in the RecognitionWorker thread (after)
+
+Usage: python -m benchmarks.pipeline_throughput [model_complexity]
+"""
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.landmarks import HolisticLandmarks
+from helpers.recognition_worker import RecognitionWorker
+from helpers.websockets.websockets import send_gesture
+
+NUM_FRAMES = 200
+RESOLUTION = (360, 360)
+MODEL_PATH = "./models/March28/March28.keras"
+MP_MODEL_COMPLEXITY = 0
+
+# Simulated network time of one websocket send
+SEND_LATENCY = 0.005
+
+
+class FakeWebsocket:
+    async def send(self, message):
+        await asyncio.sleep(SEND_LATENCY)
+
+
+def get_frame():
+    return np.full((RESOLUTION[1], RESOLUTION[0], 3), 127, dtype=np.uint8), None, time.perf_counter()
+
+
+async def run_inline(gesture_handler, websocket):
+    for _ in range(NUM_FRAMES):
+        frame, _, _ = get_frame()
+        payload = gesture_handler.recognize(frame)
+        await send_gesture(websocket, payload)
+
+
+async def run_worker(gesture_handler, websocket):
+    recognition_worker = RecognitionWorker(get_frame, gesture_handler).start()
+
+    for _ in range(NUM_FRAMES):
+        frame, payload = await recognition_worker.get()
+        await send_gesture(websocket, payload)
+
+    await recognition_worker.stop()
+
+
+async def measure(name, run, gesture_handler):
+    start = time.perf_counter()
+    await run(gesture_handler, FakeWebsocket())
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<28}: {NUM_FRAMES / elapsed:7.1f} fps ({elapsed / NUM_FRAMES * 1000:.2f} ms/frame)")
+
+
+async def main(model_complexity):
+    with HolisticLandmarks(model_complexity=model_complexity) as landmark_model:
+        gesture_handler = GestureHandler(RESOLUTION, landmark_model, MODEL_PATH, gesture_model_backend="numpy")
+
+        gesture_handler.recognize(get_frame()[0])  # Warm-up
+
+        await measure("inline in the event loop", run_inline, gesture_handler)
+        await measure("recognition worker thread", run_worker, gesture_handler)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else MP_MODEL_COMPLEXITY))
@@ -0,0 +1,135 @@
+"""
+Per-frame cost of the frame preprocessing: crop, resize, camera flip, RGB conversion for the landmark model and
+display flip, with frame_preprocessing (new arrays at every step) and with FramePreprocessor (views and reused
+buffers, landmarks mirrored instead of flipping the frames)
+
+Usage: python -m benchmarks.preprocessing [--frames N] [--no-flip] [--no-roi]
+
+Frames are synthetic 1280x720 camera frames processed with the pipeline settings. Reports the time per frame, the
+bytes written per frame and, with tracemalloc, the bytes allocated during a frame.
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from helpers.camera import FramePreprocessor, flip_frame, frame_preprocessing
+
+CAMERA_RESOLUTION = (1280, 720)
+RESIZE_TO = (700, 700)
+RESOLUTION = (360, 360)
+# Crop of the source frame around the activation area given to the landmark model
+ROI = (100, 150, 400, 550)
+
+
+def legacy_path(frame, flip, roi):
+    """
+    :return: bytes written
+    """
+    source_frame = frame_preprocessing(frame, RESIZE_TO, None, flip)
+    processed_frame = frame_preprocessing(source_frame, None, RESOLUTION)
+    copied = processed_frame.nbytes + (source_frame.nbytes if flip else 0)
+
+    landmarks_frame = processed_frame
+    if roi:
+        x_min, y_min, x_max, y_max = ROI
+        landmarks_frame = source_frame[y_min:y_max, x_min:x_max]
+    copied += cv2.cvtColor(landmarks_frame, cv2.COLOR_BGR2RGB).nbytes
+
+    copied += flip_frame(processed_frame).nbytes
+
+    return copied
+
+
+def create_preprocessed_path():
+    frame_preprocessor = FramePreprocessor(RESIZE_TO, RESOLUTION)
+    buffers = {"rgb": np.empty(0, dtype=np.uint8), "display": None}
+
+    def preprocessed_path(frame, flip, roi):
+        copied = frame_preprocessor.total_bytes_copied
+        processed_frame, source_frame = frame_preprocessor.process(frame)
+
+        landmarks_frame = processed_frame
+        if roi:
+            x_min, y_min, x_max, y_max = ROI
+            if flip:
+                x_min, x_max = source_frame.shape[1] - x_max, source_frame.shape[1] - x_min
+            landmarks_frame = source_frame[y_min:y_max, x_min:x_max]
+
+        if buffers["rgb"].size < landmarks_frame.size:
+            buffers["rgb"] = np.empty(landmarks_frame.size, dtype=np.uint8)
+        rgb_buffer = buffers["rgb"][:landmarks_frame.size].reshape(landmarks_frame.shape)
+        frame_preprocessor.count_copy(cv2.cvtColor(landmarks_frame, cv2.COLOR_BGR2RGB, dst=rgb_buffer).nbytes)
+
+        if flip:
+            # GestureHandler.draw flips the preview in place before drawing the overlays
+            frame_preprocessor.count_copy(flip_frame(processed_frame, processed_frame).nbytes)
+
+        buffers["display"] = flip_frame(processed_frame, buffers["display"])
+        frame_preprocessor.count_copy(buffers["display"].nbytes)
+
+        # Every copy of the frame, as FramePreprocessor.get_report counts them
+        return frame_preprocessor.total_bytes_copied - copied
+
+    return preprocessed_path
+
+
+def measure(path, frames, flip, roi, trace):
+    """
+    :return: (bytes written per frame, peak bytes allocated during each frame, seconds per frame)
+    """
+    copied = []
+    peaks = []
+    durations = []
+
+    for frame in frames:
+        if trace:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        copied.append(path(frame, flip, roi))
+        durations.append(time.perf_counter() - start)
+
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+
+    return copied, peaks, durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--no-flip", action="store_true")
+    parser.add_argument("--no-roi", action="store_true")
+    args = parser.parse_args()
+
+    flip = not args.no_flip
+    roi = not args.no_roi
+
+    rng = np.random.default_rng(0)
+    # A few distinct frames so the caches do not hold a single one
+    camera_frames = [rng.integers(0, 256, (CAMERA_RESOLUTION[1], CAMERA_RESOLUTION[0], 3), dtype=np.uint8)
+                     for _ in range(8)]
+    frames = [camera_frames[i % len(camera_frames)] for i in range(args.frames)]
+
+    print(f"{args.frames} frames {CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}, crop {RESIZE_TO}, "
+          f"resolution {RESOLUTION}, flip {flip}, roi {roi}")
+
+    for name, path in (("frame_preprocessing", legacy_path), ("FramePreprocessor", create_preprocessed_path())):
+        # First frames allocate the buffers
+        measure(path, frames[:10], flip, roi, trace=False)
+
+        tracemalloc.start()
+        copied, peaks, _ = measure(path, frames, flip, roi, trace=True)
+        tracemalloc.stop()
+
+        _, _, durations = measure(path, frames, flip, roi, trace=False)
+
+        print(f"{name:>20}: p50 {np.percentile(durations, 50) * 1e6:>7.0f} us, "
+              f"p95 {np.percentile(durations, 95) * 1e6:>7.0f} us, "
+              f"written {np.mean(copied) / 1024:>7.0f} KiB/frame, "
+              f"allocated {np.mean(peaks) / 1024:>7.0f} KiB/frame")
@@ -0,0 +1,70 @@
+"""
+Bytes sent and serialization time per minute of session: whole JSON payload every frame
+vs the change-only protocol (JSON and binary)
+
+Usage: python -m benchmarks.protocol
+"""
+import json
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import simulated_session
+from helpers.websockets.protocol import ChangeOnlyDecoder, ChangeOnlyEncoder, get_discrete_state
+
+SESSION_SECONDS = 60
+FPS = 48
+
+
+def measure_json(session):
+    start = time.perf_counter()
+    messages = [json.dumps(payload) for _, payload in session]
+    elapsed = time.perf_counter() - start
+
+    return messages, elapsed
+
+
+def measure_change_only(session, binary):
+    encoder = ChangeOnlyEncoder(binary=binary)
+    decoder = ChangeOnlyDecoder()
+
+    messages = []
+    elapsed = 0
+    discrete_state_mismatches = 0
+
+    for timestamp, payload in session:
+        start = time.perf_counter()
+        frame_messages = encoder.encode(payload, timestamp)
+        elapsed += time.perf_counter() - start
+
+        for message in frame_messages:
+            decoded = decoder.decode(message)
+
+        messages += frame_messages
+
+        # Discrete changes are never sampled, the consumer must always be in sync
+        if get_discrete_state(decoded) != get_discrete_state(payload):
+            discrete_state_mismatches += 1
+
+    return messages, elapsed, discrete_state_mismatches
+
+
+def report(name, messages, elapsed):
+    size = sum(len(message) for message in messages)
+
+    print(f"{name:<22}: {len(messages):6d} messages, {size / 1024:8.1f} KiB, {elapsed * 1000:7.1f} ms serialization")
+
+
+if __name__ == "__main__":
+    session = simulated_session(np.random.default_rng(0), SESSION_SECONDS, FPS)
+    print(f"{SESSION_SECONDS} s session at {FPS} fps ({len(session)} frames)")
+
+    messages, elapsed = measure_json(session)
+    report("json every frame", messages, elapsed)
+
+    for name, binary in [("change-only json", False), ("change-only binary", True)]:
+        messages, elapsed, mismatches = measure_change_only(session, binary)
+        report(name, messages, elapsed)
+
+        if mismatches:
+            print(f"  {mismatches} frames with a desynchronized discrete state")
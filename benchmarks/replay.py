@@ -0,0 +1,103 @@
+"""
+Replays a landmark recording (see RECORD_LANDMARKS_PATH in pipeline.py) through the GestureHandler as fast as possible,
+with the recorded timestamps as clock. Reports the per-stage latency and the resulting action stream.
+
+Usage: python -m benchmarks.replay RECORDING [--actions-out PATH] [--expected PATH] [--backend numpy|keras]
+With --expected, exits with an error if the action stream differs from the one saved with --actions-out.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.recording import RecordedFaceTracker, RecordedLandmarks, load_recording
+
+RESOLUTION = (360, 360)
+SWIPE_SENSITIVITY = {"x": 0.075, "y": 0.1}
+MODEL_PATH = "./models/March28/March28.keras"
+
+PERCENTILES = [50, 95, 99]
+
+
+def replay(recording_path, model_path=MODEL_PATH, backend="numpy"):
+    """
+    :return: (actions as a list of [timestamp, hand, gesture, action], durations in seconds by stage)
+    """
+    timestamps, hands, faces, detect_face = load_recording(recording_path)
+
+    current_time = timestamps[0] if len(timestamps) else 0
+
+    def clock():
+        return current_time
+
+    gesture_handler = GestureHandler(RESOLUTION, RecordedLandmarks(hands, faces), model_path,
+                                     swipe_sensitivity=SWIPE_SENSITIVITY, gesture_model_backend=backend, clock=clock,
+                                     face_tracker=RecordedFaceTracker(detect_face))
+
+    # The recorded landmarks are returned whatever the frame
+    frame = np.zeros((1, 1, 3), dtype=np.uint8)
+
+    actions = []
+    durations = {"landmarks": [], "classification": [], "state_machines": [], "total": []}
+
+    for timestamp in timestamps:
+        current_time = float(timestamp)
+
+        start = time.perf_counter()
+        payload = gesture_handler.recognize(frame)
+        total = time.perf_counter() - start
+
+        stage_durations = gesture_handler.stage_durations
+        durations["landmarks"].append(stage_durations["landmarks"])
+        durations["classification"].append(stage_durations["classification"])
+        durations["state_machines"].append(total - stage_durations["landmarks"] - stage_durations["classification"])
+        durations["total"].append(total)
+
+        actions.append([current_time, payload["hand"], payload["gesture"], payload["action"]])
+
+    return actions, durations
+
+
+def report(durations):
+    for stage, values in durations.items():
+        percentiles = np.percentile(np.array(values) * 1e6, PERCENTILES)
+        print(f"{stage:<15}: " + ", ".join(f"p{p} {value:8.1f} us" for p, value in zip(PERCENTILES, percentiles)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--actions-out", default=None)
+    parser.add_argument("--expected", default=None)
+    args = parser.parse_args()
+
+    actions, durations = replay(args.recording, args.model, args.backend)
+
+    print(f"{len(actions)} frames replayed")
+    report(durations)
+
+    action_changes = [entry for i, entry in enumerate(actions) if i == 0 or entry[1:] != actions[i - 1][1:]]
+    print(f"{len(action_changes)} hand/gesture/action changes")
+
+    if args.actions_out:
+        with open(args.actions_out, "w") as f:
+            json.dump(actions, f)
+
+    if args.expected:
+        with open(args.expected) as f:
+            expected = json.load(f)
+
+        if expected != actions:
+            mismatch = next(
+                (i for i, (entry, expected_entry) in enumerate(zip(actions, expected)) if entry != expected_entry),
+                min(len(actions), len(expected)),
+            )
+            print(f"Action stream differs from {args.expected} from frame {mismatch}")
+            sys.exit(1)
+
+        print(f"Action stream matches {args.expected}")
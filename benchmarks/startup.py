@@ -0,0 +1,107 @@
+"""
+Startup time of the pipeline, up to the first classified frame, each scenario in a fresh process
+
+Usage: python -m benchmarks.startup [--model PATH] [--backend BACKEND] [--model-complexity N] [--repeats N]
+
+Scenarios: the folded weights artifact missing (cold, built on load) or present (cached), with and without
+GestureHandler.warm_up. Time to first gesture is measured from the process start (before any import) to the first
+frame through the landmark model and the gesture classifier.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODEL_PATH = "./models/March28/March28.keras"
+RESOLUTION = (360, 360)
+
+SCENARIOS = [
+    ("cold", False),
+    ("cold", True),
+    ("cached", False),
+    ("cached", True),
+]
+
+STEPS = ["import_ms", "landmark_model_ms", "gesture_handler_ms", "warm_up_ms", "first_frame_ms",
+         "time_to_first_gesture_ms"]
+
+
+def measure_startup(model_path: str, backend: str, model_complexity: int, warm_up: bool, process_start: float):
+    """
+    Measure the startup steps in the current process
+    :param process_start: time.time() of the parent when it started this process
+    :return: dict of the durations of each step in milliseconds
+    """
+    measures = {}
+
+    start = time.perf_counter()
+    import numpy as np
+
+    from helpers.gesture_handler.gesture_handler import INPUT_SIZE, GestureHandler
+    from helpers.gesture_handler.landmarks import create_landmark_model
+    measures["import_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    landmark_model = create_landmark_model("holistic", model_complexity=model_complexity)
+    measures["landmark_model_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    gesture_handler = GestureHandler(RESOLUTION, landmark_model, model_path, gesture_model_backend=backend)
+    measures["gesture_handler_ms"] = (time.perf_counter() - start) * 1000
+
+    measures["warm_up_ms"] = gesture_handler.warm_up() * 1000 if warm_up else 0
+
+    # First frame: landmarks of a camera-sized frame, then the classification of a hand
+    start = time.perf_counter()
+    gesture_handler.handle_frame(np.zeros((RESOLUTION[1], RESOLUTION[0], 3), dtype=np.uint8))
+    gesture_handler.gesture_model.predict(np.zeros((1, INPUT_SIZE), dtype=np.float32))
+    measures["first_frame_ms"] = (time.perf_counter() - start) * 1000
+
+    measures["time_to_first_gesture_ms"] = (time.time() - process_start) * 1000
+
+    landmark_model.close()
+
+    return measures
+
+
+def run_scenario(model_path: str, backend: str, model_complexity: int, cache: str, warm_up: bool):
+    from helpers.ai.inference import get_weights_artifact_path
+
+    artifact_path = get_weights_artifact_path(model_path)
+    if cache == "cold" and os.path.exists(artifact_path):
+        os.remove(artifact_path)
+
+    output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", str(time.time()),
+                             "--model", model_path, "--backend", backend, "--model-complexity", str(model_complexity)]
+                            + (["--warm-up"] if warm_up else []),
+                            capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default="numpy")
+    # 0 is the pipeline default, 1 is bundled with the mediapipe wheel and needs no download
+    parser.add_argument("--model-complexity", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--child", type=float, default=None)
+    parser.add_argument("--warm-up", action="store_true")
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure_startup(args.model, args.backend, args.model_complexity, args.warm_up, args.child)))
+        sys.exit()
+
+    print(f"{args.model}, {args.backend} backend, model complexity {args.model_complexity}")
+    print(f"{'scenario':<20}" + "".join(f"{step[:-3]:>24}" for step in STEPS))
+
+    for cache, warm_up in SCENARIOS:
+        runs = [run_scenario(args.model, args.backend, args.model_complexity, cache, warm_up)
+                for _ in range(args.repeats)]
+
+        name = f"{cache}{', warm-up' if warm_up else ''}"
+        print(f"{name:<20}" + "".join(f"{min(run[step] for run in runs):>24.1f}" for step in STEPS))
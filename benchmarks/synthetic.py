@@ -0,0 +1,91 @@
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+NUM_FACE_LANDMARKS = 468
+
+
+def to_landmark_list(points):
+    """
+    Build a mediapipe landmark list from an array of points
+    :param points: array of shape (N, 2) or (N, 3)
+    :return: NormalizedLandmarkList
+    """
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+
+    for point in points:
+        landmarks.landmark.add(x=point[0], y=point[1], z=point[2] if len(point) > 2 else 0)
+
+    return landmarks
+
+
+def random_hand_points(rng, num_hands, center=(0.5, 0.5), spread=0.1):
+    """
+    :return: float32 array of shape (num_hands, 21, 3) around the center
+    """
+    points = rng.random((num_hands, 21, 3)) * spread
+    points[..., 0] += center[0] - spread / 2
+    points[..., 1] += center[1] - spread / 2
+
+    return points.astype(np.float32)
+
+
+def random_hand_landmarks(rng, center=(0.5, 0.5), spread=0.1):
+    return to_landmark_list(random_hand_points(rng, 1, center, spread)[0])
+
+
+def face_landmarks(nose=(0.5, 0.3)):
+    return to_landmark_list(np.tile((nose[0], nose[1], 0), (NUM_FACE_LANDMARKS, 1)))
+
+
+def jitter(rng, coordinates, amount=1):
+    return int(coordinates[0] + rng.integers(-amount, amount + 1)), int(coordinates[1] + rng.integers(-amount, amount + 1))
+
+
+def simulated_session(rng, seconds=60, fps=48):
+    """
+    Payload stream of a simulated session: idle periods, a hand taking focus, swipes and clicks,
+    with a pixel of jitter on every detected coordinate like a real camera
+    :return: list of (timestamp in seconds, payload)
+    """
+    session = []
+    face = (180, 110)
+    hand = (240, 130)
+    timestamp = 0.0
+
+    def add(frames, payload_hand, gesture, action, hand_step=(0, 0), locked=None):
+        nonlocal hand, timestamp
+
+        for _ in range(frames):
+            hand = (hand[0] + hand_step[0], hand[1] + hand_step[1])
+            coordinates = {
+                "left_hand": (0, 0),
+                "right_hand": jitter(rng, hand) if payload_hand else (0, 0),
+                "face": jitter(rng, face),
+            }
+            deltas = {"x": 0, "y": 0}
+            if locked:
+                deltas = {"x": coordinates["right_hand"][0] - locked[0], "y": coordinates["right_hand"][1] - locked[1]}
+
+            session.append((timestamp, {
+                "hand": payload_hand,
+                "coordinates": coordinates,
+                "gesture": gesture,
+                "deltas": deltas,
+                "action": action,
+            }))
+            timestamp += 1 / fps
+
+    while timestamp < seconds:
+        add(fps * 3, None, "no_gesture", None)  # Nobody in front of the screen
+        add(fps, "right_hand", "palm", "none")  # Hand taking focus, dwelling
+        add(fps // 2, "right_hand", "closed", "hover_none", locked=hand)
+        add(fps // 2, "right_hand", "closed", "hover_left", hand_step=(-2, 0), locked=hand)
+        add(fps // 4, "right_hand", "palm", "left")  # Validated swipe
+        add(fps, "right_hand", "palm", "none")
+        add(2, "right_hand", "closed", "none")  # Click: palm / closed / palm / closed / palm
+        add(2, "right_hand", "palm", "none")
+        add(2, "right_hand", "closed", "none")
+        add(1, "right_hand", "palm", "click")
+        add(fps * 2, "right_hand", "palm", "none")
+
+    return [(t, payload) for t, payload in session if t < seconds]
@@ -0,0 +1,105 @@
+"""
+Accuracy, per-call latency, load time and memory of the gesture model backends, each in a fresh process
+
+Usage: python -m benchmarks.tflite [MODEL]
+Run `python -m helpers.ai.tflite` first to convert the model. Accuracy is measured on the datasets/*.csv rows
+against their labels, and as the agreement of the predicted labels with the Keras backend.
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODEL_PATH = "./models/March28/March28.keras"
+BACKENDS = ["keras", "numpy", "tflite", "tflite_int8"]
+
+ITERATIONS = {
+    "keras": 50,
+    "numpy": 5000,
+    "tflite": 5000,
+    "tflite_int8": 5000,
+}
+
+
+def get_rss_mib():
+    # Peak resident set size of this process image: ru_maxrss survives exec on Linux, VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_backend(model_path, backend):
+    """
+    Measure a backend in the current process
+    :return: dict of the measures and the predicted label indexes
+    """
+    start = time.perf_counter()
+    from helpers.ai.inference import load_gesture_model
+
+    model = load_gesture_model(model_path, backend)
+    load_time = time.perf_counter() - start
+
+    from helpers.ai.data import read_datasets
+    inputs, _ = read_datasets()
+
+    predictions = np.concatenate([model.predict(row[None]) for row in inputs])
+
+    row = inputs[:1]
+    iterations = ITERATIONS[backend]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model.predict(row)
+    latency = (time.perf_counter() - start) / iterations
+
+    return {
+        "load_ms": load_time * 1000,
+        "latency_us": latency * 1e6,
+        "rss_mib": get_rss_mib(),
+        "predictions": predictions.argmax(axis=1).tolist(),
+    }
+
+
+def run_backend(model_path, backend):
+    output = subprocess.run([sys.executable, "-m", "benchmarks.tflite", model_path, "--child", backend],
+                            capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        print(json.dumps(measure_backend(sys.argv[1], sys.argv[-1])))
+        sys.exit(0)
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    results = {backend: run_backend(model_path, backend) for backend in BACKENDS}
+
+    # Imports TensorFlow through mediapipe, after the measures
+    from helpers.ai.data import read_datasets
+    from helpers.gesture_handler.gesture_handler import LABELS
+
+    _, labels = read_datasets()
+    keras_predictions = np.array(results["keras"]["predictions"])
+
+    known = np.array([label in LABELS for label in labels])
+    expected = np.array([LABELS.index(label) if label in LABELS else -1 for label in labels])
+
+    print(f"{model_path}, {len(labels)} rows")
+    print(f"{'backend':<12} {'accuracy':>9} {'= keras':>8} {'latency':>12} {'load':>10} {'peak RSS':>10}")
+
+    for backend, result in results.items():
+        predictions = np.array(result["predictions"])
+        accuracy = (predictions[known] == expected[known]).mean() * 100
+        agreement = (predictions == keras_predictions).mean() * 100
+
+        print(f"{backend:<12} {accuracy:8.2f}% {agreement:7.2f}% {result['latency_us']:9.1f} us "
+              f"{result['load_ms']:7.0f} ms {result['rss_mib']:6.0f} MiB")
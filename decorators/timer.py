@@ -1,10 +1,9 @@
-import time
+from helpers.instrumentation import instrumentation
+
 
 def timer(func):
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        print(f"Temps d'exécution de {func.__name__}: {end_time - start_time} secondes")
-        return result
-    return wrapper
\ No newline at end of file
+    """
+    Time every call of a function or coroutine function into the instrumentation registry, under the function name.
+    Free while the instrumentation is disabled, see helpers/instrumentation.py for the report.
+    """
+    return instrumentation.timed()(func)
@@ -1,4 +1,77 @@
+import csv
+import glob
+
+import numpy as np
+
+DATASETS_GLOB = "./datasets/*.csv"
+
+LANDMARK_NAMES = [
+    "THUMB_CMC",
+    "THUMB_MCP",
+    "THUMB_IP",
+    "THUMB_TIP",
+    "INDEX_FINGER_MCP",
+    "INDEX_FINGER_PIP",
+    "INDEX_FINGER_DIP",
+    "INDEX_FINGER_TIP",
+    "MIDDLE_FINGER_MCP",
+    "MIDDLE_FINGER_PIP",
+    "MIDDLE_FINGER_DIP",
+    "MIDDLE_FINGER_TIP",
+    "RING_FINGER_MCP",
+    "RING_FINGER_PIP",
+    "RING_FINGER_DIP",
+    "RING_FINGER_TIP",
+    "PINKY_MCP",
+    "PINKY_PIP",
+    "PINKY_DIP",
+    "PINKY_TIP",
+]
+
+COLUMNS = (
+        ["LEFT_HAND", "RIGHT_HAND"]
+        + [name + "_DISTANCE_FROM_WRIST" for name in LANDMARK_NAMES]
+        + [name + "_ANGLE_FROM_WRIST" for name in LANDMARK_NAMES]
+        + ["label"]
+)
+
+
 def write_labels(path: str, unique_labels: list[str]):
     # Write unique labels to file
     with open(path + "./labels.txt", "w") as f:
         f.write(", ".join(unique_labels))
+
+
+def read_dataset(path: str):
+    """
+    Read a features CSV (LEFT_HAND, RIGHT_HAND, ..., label)
+    :param path: path of the CSV file
+    :return: (inputs as a float32 array of shape (N, 42), list of labels)
+    """
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)  # Skip header
+
+        rows = [row for row in reader if row]
+
+    inputs = np.array([row[:-1] for row in rows], dtype=np.float32)
+    labels = [row[-1] for row in rows]
+
+    return inputs, labels
+
+
+def read_datasets(pattern: str = DATASETS_GLOB):
+    """
+    Read and concatenate every features CSV matching the pattern
+    :param pattern: glob pattern of the CSV files
+    :return: (inputs as a float32 array of shape (N, 42), list of labels)
+    """
+    all_inputs = []
+    all_labels = []
+
+    for path in sorted(glob.glob(pattern)):
+        inputs, labels = read_dataset(path)
+        all_inputs.append(inputs)
+        all_labels += labels
+
+    return np.concatenate(all_inputs), all_labels
@@ -0,0 +1,286 @@
+"""
+Builds a features CSV from a folder of labelled images (one sub folder per label, e.g. HaGRID), in parallel.
+
+Usage: python -m helpers.ai.extraction IMAGES_FOLDER OUTPUT [--workers N] [--batch-size N]
+                                       [--model-complexity N] [--min-detection-confidence X]
+
+Images are sharded in batches across a process pool with one MediaPipe Holistic instance per worker. Each worker
+appends its rows to its own buffered part file and the completed batches are recorded in a checkpoint manifest:
+an interrupted run resumes where it stopped when launched again with the same arguments. The part files are merged
+into OUTPUT at the end: a features CSV, or a feature store when it ends with .features (see feature_store.py).
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from helpers.ai.data import COLUMNS
+from helpers.ai.feature_store import FEATURE_STORE_EXTENSION, FeatureStore
+from helpers.computations import compute_distances_angles_from_wrist_batch, landmarks_to_array
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+HAND_ENCODINGS = {
+    "left_hand": ["1", "0"],
+    "right_hand": ["0", "1"],
+}
+
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# State of the worker process, set by init_worker
+holistic = None
+part_name = None
+part_file = None
+part_writer = None
+
+
+def list_images(folder: str):
+    """
+    :param folder: folder with one sub folder of images per label
+    :return: sorted list of (image path, label)
+    """
+    images = []
+
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*"), recursive=True)):
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append((path, os.path.basename(os.path.dirname(path))))
+
+    return images
+
+
+def init_worker(checkpoint_folder: str, run_id: str, model_complexity: int, min_detection_confidence: float):
+    global holistic, part_name, part_file, part_writer
+
+    holistic = mp.solutions.holistic.Holistic(
+        static_image_mode=True,
+        model_complexity=model_complexity,
+        min_detection_confidence=min_detection_confidence,
+    )
+
+    # Rows are prefixed with their batch index: on merge, only the rows of the part file recorded for the batch in
+    # the manifest are kept, so batches left unrecorded by an interrupted run do not end up duplicated
+    part_name = f"part-{run_id}-{os.getpid()}.csv"
+    part_file = open(os.path.join(checkpoint_folder, part_name), "w", newline="", encoding="utf-8")
+    part_writer = csv.writer(part_file)
+
+
+def get_hand_landmarks(image):
+    """
+    :param image: BGR image
+    :return: (hand, landmarks) of the only hand of the image, (None, None) without hands or with both hands
+    """
+    results = holistic.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    if results.left_hand_landmarks and results.right_hand_landmarks:
+        return None, None
+
+    if results.left_hand_landmarks:
+        return "left_hand", results.left_hand_landmarks
+
+    if results.right_hand_landmarks:
+        return "right_hand", results.right_hand_landmarks
+
+    return None, None
+
+
+def process_batch(batch_index: int, images: list):
+    """
+    Decode, detect and featurize a batch of images in a worker, then append the rows to the worker part file
+    :param batch_index: index of the batch in the image list
+    :param images: list of (image path, label)
+    :return: (worker pid, part file name, batch index, number of images, number of rows, seconds spent)
+    """
+    start = time.perf_counter()
+
+    hands = []
+    points = []
+    labels = []
+
+    for path, label in images:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+
+        hand, landmarks = get_hand_landmarks(image)
+        if hand is None:
+            continue
+
+        hands.append(hand)
+        points.append(landmarks_to_array(landmarks))
+        labels.append(label)
+
+    if points:
+        features = compute_distances_angles_from_wrist_batch(np.stack(points))
+
+        part_writer.writerows(
+            [batch_index] + HAND_ENCODINGS[hand] + [str(value) for value in row] + [label]
+            for hand, row, label in zip(hands, features, labels)
+        )
+
+    part_file.flush()
+    os.fsync(part_file.fileno())
+
+    return os.getpid(), part_name, batch_index, len(images), len(points), time.perf_counter() - start
+
+
+def read_manifest(checkpoint_folder: str, settings: dict):
+    """
+    :param checkpoint_folder: folder of the part files and manifest
+    :param settings: settings of the current run, the checkpoint must have been made with the same ones
+    :return: dict of the part file name of each completed batch index
+    """
+    manifest_path = os.path.join(checkpoint_folder, MANIFEST_FILENAME)
+
+    content = ""
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            content = f.read()
+
+    # An interrupted run can leave an empty manifest or a partial last line, only the complete lines are kept
+    lines = content.split("\n")[:-1]
+
+    # No header: the previous run was interrupted before any batch completed, start over
+    if not lines:
+        with open(manifest_path, "w") as f:
+            f.write(json.dumps(settings) + "\n")
+        return {}
+
+    if json.loads(lines[0]) != settings:
+        raise ValueError(f"{checkpoint_folder} was made with other settings ({lines[0]}), "
+                         f"delete it to start over")
+
+    if not content.endswith("\n"):
+        # Drop the partial line, the entries of this run are appended after it
+        with open(manifest_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    entries = [json.loads(line) for line in lines[1:] if line]
+
+    return {entry["batch"]: entry["part"] for entry in entries}
+
+
+def merge_parts(checkpoint_folder: str, output_path: str, completed: dict):
+    """
+    Merge the rows of the completed batches of every part file into the output CSV, in image order.
+    Rows are appended to a feature store instead when the output path ends with FEATURE_STORE_EXTENSION
+    :param completed: part file name of each completed batch index
+    :return: number of rows
+    """
+    rows = []
+
+    for part_path in sorted(glob.glob(os.path.join(checkpoint_folder, "part-*.csv"))):
+        name = os.path.basename(part_path)
+
+        with open(part_path, newline="", encoding="utf-8") as part:
+            rows += [row for row in csv.reader(part) if row and completed.get(int(row[0])) == name]
+
+    rows.sort(key=lambda row: int(row[0]))
+
+    if output_path.endswith(FEATURE_STORE_EXTENSION):
+        store = FeatureStore(output_path)
+        store.append([row[1:-1] for row in rows], [row[-1] for row in rows])
+        store.compact()
+        return len(rows)
+
+    with open(output_path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(COLUMNS)
+        writer.writerows(row[1:] for row in rows)
+
+    return len(rows)
+
+
+def print_throughput(workers: dict):
+    for pid, (images, seconds) in sorted(workers.items()):
+        print(f"  worker {pid}: {images} images, {images / seconds if seconds else 0:.1f} images/s")
+
+
+def extract_features(images_folder: str, output_path: str, workers: int = None, batch_size: int = 64,
+                     model_complexity: int = 0, min_detection_confidence: float = 0.3):
+    """
+    Build a features CSV from a folder of labelled images, resuming from the checkpoint of an interrupted run
+    :param images_folder: folder with one sub folder of images per label
+    :param output_path: path of the features CSV, or of a feature store to append to
+    :param workers: number of worker processes, one per CPU by default
+    :param batch_size: images per batch, the unit of work and of checkpointing
+    :param model_complexity: Holistic model complexity
+    :param min_detection_confidence: Holistic minimum detection confidence
+    :return: number of rows written
+    """
+    images = list_images(images_folder)
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+
+    checkpoint_folder = output_path + ".parts"
+    os.makedirs(checkpoint_folder, exist_ok=True)
+
+    settings = {
+        "images_folder": os.path.abspath(images_folder),
+        "num_images": len(images),
+        "batch_size": batch_size,
+        "model_complexity": model_complexity,
+        "min_detection_confidence": min_detection_confidence,
+    }
+    completed = read_manifest(checkpoint_folder, settings)
+
+    remaining = [i for i in range(len(batches)) if i not in completed]
+    print(f"{len(images)} images in {len(batches)} batches, {len(batches) - len(remaining)} already done")
+
+    # Images processed and seconds spent by worker pid
+    throughput = {}
+    start = time.perf_counter()
+
+    if remaining:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(checkpoint_folder, str(int(time.time())), model_complexity,
+                                           min_detection_confidence)) as pool, \
+                open(os.path.join(checkpoint_folder, MANIFEST_FILENAME), "a") as manifest:
+
+            futures = [pool.submit(process_batch, i, batches[i]) for i in remaining]
+
+            for done, future in enumerate(as_completed(futures), 1):
+                pid, part, batch_index, num_images, num_rows, seconds = future.result()
+
+                # The rows are flushed by the worker before the batch is marked as completed
+                manifest.write(json.dumps({"batch": batch_index, "part": part, "images": num_images,
+                                           "rows": num_rows}) + "\n")
+                manifest.flush()
+                completed[batch_index] = part
+
+                images_done, seconds_spent = throughput.get(pid, (0, 0))
+                throughput[pid] = (images_done + num_images, seconds_spent + seconds)
+
+                if done % 10 == 0 or done == len(futures):
+                    elapsed = time.perf_counter() - start
+                    processed = sum(images_done for images_done, _ in throughput.values())
+                    print(f"{done}/{len(futures)} batches, {processed / elapsed:.1f} images/s")
+
+        print_throughput(throughput)
+
+    num_rows = merge_parts(checkpoint_folder, output_path, completed)
+    shutil.rmtree(checkpoint_folder)
+
+    print(f"{num_rows} rows written to {output_path} in {time.perf_counter() - start:.1f} s")
+
+    return num_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images_folder")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--model-complexity", type=int, default=0)
+    parser.add_argument("--min-detection-confidence", type=float, default=0.3)
+    args = parser.parse_args()
+
+    extract_features(args.images_folder, args.output, args.workers, args.batch_size, args.model_complexity,
+                     args.min_detection_confidence)
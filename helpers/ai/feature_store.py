@@ -0,0 +1,288 @@
+"""
+Columnar binary store for the features datasets (LEFT_HAND, RIGHT_HAND, ..., label).
+
+A store is a folder of chunks: a float32 (N, 42) .npy array of inputs and a uint16 (N,) .npy array of label codes
+per chunk, plus a meta.json with the columns, the label dictionary and the chunk list. Appending writes a new chunk,
+loading memory-maps the chunks. The converter and the extraction compact the store into a single chunk once written,
+so loading it does not copy.
+
+Usage: python -m helpers.ai.feature_store to-store STORE CSV [CSV ...]
+       python -m helpers.ai.feature_store to-csv STORE CSV
+       python -m helpers.ai.feature_store compact STORE
+"""
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+from helpers.ai.data import COLUMNS
+
+FEATURE_STORE_EXTENSION = ".features"
+VERSION = 1
+
+INPUT_COLUMNS = COLUMNS[:-1]
+INPUT_SIZE = len(INPUT_COLUMNS)
+
+# Rows of the chunks written by the CSV converter
+CHUNK_ROWS = 100_000
+
+META_FILENAME = "meta.json"
+
+
+class FeatureStore:
+    """
+    Chunked float32 features with a label dictionary
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a store, created empty if it does not exist
+        :param path: folder of the store
+        """
+        self.path = path
+        meta_path = os.path.join(path, META_FILENAME)
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+
+            if self.meta["version"] != VERSION or self.meta["columns"] != INPUT_COLUMNS:
+                raise ValueError(f"{path} is not a feature store of version {VERSION} with the {INPUT_SIZE} columns")
+        else:
+            self.meta = {
+                "version": VERSION,
+                "columns": INPUT_COLUMNS,
+                "labels": [],
+                "chunks": [],
+                "next_chunk": 0,
+            }
+
+    @property
+    def labels(self) -> list:
+        """
+        Label dictionary: the label of code i is labels[i]
+        """
+        return self.meta["labels"]
+
+    def __len__(self):
+        return sum(chunk["rows"] for chunk in self.meta["chunks"])
+
+    def encode_labels(self, labels) -> np.ndarray:
+        """
+        :param labels: label names, new ones are added to the dictionary
+        :return: uint16 label codes
+        """
+        codes = {label: code for code, label in enumerate(self.labels)}
+
+        for label in labels:
+            if label not in codes:
+                codes[label] = len(self.labels)
+                self.labels.append(label)
+
+        return np.array([codes[label] for label in labels], dtype=np.uint16)
+
+    def append(self, inputs, labels):
+        """
+        Append rows as a new chunk
+        :param inputs: array of shape (N, 42)
+        :param labels: N label names
+        """
+        inputs = np.asarray(inputs, dtype=np.float32).reshape(-1, INPUT_SIZE)
+
+        if len(inputs) != len(labels):
+            raise ValueError(f"{len(inputs)} rows of inputs for {len(labels)} labels")
+
+        if not len(inputs):
+            return
+
+        codes = self.encode_labels(labels)
+
+        os.makedirs(self.path, exist_ok=True)
+
+        self.meta["chunks"].append(self.write_chunk(inputs, codes))
+        self.write_meta()
+
+    def write_chunk(self, inputs, codes) -> dict:
+        """
+        :return: chunk entry of the meta
+        """
+        name = f"chunk-{self.meta['next_chunk']:05d}"
+        self.meta["next_chunk"] += 1
+
+        np.save(os.path.join(self.path, name + ".inputs.npy"), inputs)
+        np.save(os.path.join(self.path, name + ".labels.npy"), codes)
+
+        return {"name": name, "rows": len(inputs)}
+
+    def write_meta(self):
+        # Chunks are written before the meta, an interrupted append leaves the store as it was
+        meta_path = os.path.join(self.path, META_FILENAME)
+
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def iter_chunks(self, mmap: bool = True):
+        """
+        :param mmap: memory-map the chunks instead of reading them
+        :return: iterator of (float32 inputs of shape (N, 42), uint16 label codes of shape (N,)) for each chunk
+        """
+        mmap_mode = "r" if mmap else None
+
+        for chunk in self.meta["chunks"]:
+            inputs = np.load(os.path.join(self.path, chunk["name"] + ".inputs.npy"), mmap_mode=mmap_mode)
+            codes = np.load(os.path.join(self.path, chunk["name"] + ".labels.npy"), mmap_mode=mmap_mode)
+
+            yield inputs, codes
+
+    def load(self, mmap: bool = True):
+        """
+        Load every row. A single chunk stays memory-mapped, several chunks are concatenated in memory (see compact)
+        :param mmap: memory-map the chunks instead of reading them
+        :return: (float32 inputs of shape (N, 42), uint16 label codes of shape (N,))
+        """
+        chunks = list(self.iter_chunks(mmap))
+
+        if not chunks:
+            return np.empty((0, INPUT_SIZE), dtype=np.float32), np.empty(0, dtype=np.uint16)
+
+        if len(chunks) == 1:
+            return chunks[0]
+
+        return np.concatenate([inputs for inputs, _ in chunks]), np.concatenate([codes for _, codes in chunks])
+
+    def compact(self):
+        """
+        Rewrite the store as a single chunk, loaded without copy afterwards. The chunks are copied one at a time into
+        the memory-mapped new chunk
+        """
+        if len(self.meta["chunks"]) <= 1:
+            return
+
+        old_chunks = self.meta["chunks"]
+        rows = len(self)
+
+        name = f"chunk-{self.meta['next_chunk']:05d}"
+        self.meta["next_chunk"] += 1
+
+        inputs = np.lib.format.open_memmap(os.path.join(self.path, name + ".inputs.npy"), mode="w+",
+                                           dtype=np.float32, shape=(rows, INPUT_SIZE))
+        codes = np.lib.format.open_memmap(os.path.join(self.path, name + ".labels.npy"), mode="w+",
+                                          dtype=np.uint16, shape=(rows,))
+
+        row = 0
+        for chunk_inputs, chunk_codes in self.iter_chunks():
+            inputs[row:row + len(chunk_inputs)] = chunk_inputs
+            codes[row:row + len(chunk_codes)] = chunk_codes
+            row += len(chunk_inputs)
+
+        inputs.flush()
+        codes.flush()
+        del inputs, codes
+
+        self.meta["chunks"] = [{"name": name, "rows": rows}]
+        self.write_meta()
+
+        for chunk in old_chunks:
+            os.remove(os.path.join(self.path, chunk["name"] + ".inputs.npy"))
+            os.remove(os.path.join(self.path, chunk["name"] + ".labels.npy"))
+
+
+def read_feature_store(path: str, mmap: bool = True):
+    """
+    :param path: folder of the store
+    :param mmap: memory-map the chunks instead of reading them
+    :return: (float32 inputs of shape (N, 42), uint16 label codes of shape (N,), label dictionary)
+    """
+    store = FeatureStore(path)
+    inputs, codes = store.load(mmap)
+
+    return inputs, codes, store.labels
+
+
+def csv_to_feature_store(csv_paths: list, store_path: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Append features CSVs to a store, streamed by chunks of rows, then compact it
+    :param csv_paths: paths of the CSV files
+    :param store_path: folder of the store
+    :param chunk_rows: rows per chunk
+    :return: the store
+    """
+    store = FeatureStore(store_path)
+
+    for csv_path in csv_paths:
+        with open(csv_path, newline="", encoding="utf-8") as csv_file:
+            reader = csv.reader(csv_file)
+            header = next(reader)
+
+            if header != COLUMNS:
+                raise ValueError(f"{csv_path} does not have the features columns")
+
+            rows = []
+            for row in reader:
+                if not row:
+                    continue
+
+                rows.append(row)
+
+                if len(rows) == chunk_rows:
+                    store.append([row[:-1] for row in rows], [row[-1] for row in rows])
+                    rows = []
+
+            store.append([row[:-1] for row in rows], [row[-1] for row in rows])
+
+    store.compact()
+
+    return store
+
+
+def feature_store_to_csv(store_path: str, csv_path: str):
+    """
+    Write a store as a features CSV, with the hand encoding as ints and the float32 values written like the
+    extraction does
+    :param store_path: folder of the store
+    :param csv_path: path of the CSV file
+    """
+    store = FeatureStore(store_path)
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as csv_file:
+        # Unix line endings, like the datasets/*.csv files
+        writer = csv.writer(csv_file, lineterminator="\n")
+        writer.writerow(COLUMNS)
+
+        for inputs, codes in store.iter_chunks():
+            writer.writerows(
+                [str(int(value)) for value in row[:2]] + [str(value) for value in row[2:]] + [store.labels[code]]
+                for row, code in zip(inputs, codes)
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    to_store_parser = subparsers.add_parser("to-store")
+    to_store_parser.add_argument("store")
+    to_store_parser.add_argument("csv", nargs="+")
+
+    to_csv_parser = subparsers.add_parser("to-csv")
+    to_csv_parser.add_argument("store")
+    to_csv_parser.add_argument("csv")
+
+    compact_parser = subparsers.add_parser("compact")
+    compact_parser.add_argument("store")
+
+    args = parser.parse_args()
+
+    if args.command == "to-store":
+        feature_store = csv_to_feature_store(args.csv, args.store)
+        print(f"{len(feature_store)} rows in {args.store}, labels: {feature_store.labels}")
+
+    elif args.command == "to-csv":
+        feature_store_to_csv(args.store, args.csv)
+
+    else:
+        FeatureStore(args.store).compact()
@@ -0,0 +1,453 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+
+import numpy as np
+
+IGNORED_LAYERS = ["InputLayer", "Dropout"]
+
+# Version of the folded weights artifact, bumped when fold_layers or the artifact layout changes
+WEIGHTS_ARTIFACT_VERSION = 1
+WEIGHTS_ARTIFACT_EXTENSION = ".weights.npz"
+# Hash of the model file a TFLite conversion was made from, written next to it
+TFLITE_SOURCE_HASH_EXTENSION = ".source_hash"
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def softmax(x):
+    x -= x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def sigmoid(x):
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    return np.reciprocal(x, out=x)
+
+
+def linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    "relu": relu,
+    "softmax": softmax,
+    "sigmoid": sigmoid,
+    "tanh": np.tanh,
+    "linear": linear,
+}
+
+
+def get_keras_weights_keys(layers: list) -> list:
+    """
+    Keras 3 stores the weights of a layer under its snake case class name, suffixed with the number of layers of the
+    same class before it ("dense", "dense_1", ...), whatever the layer name
+    :param layers: layers config of a Sequential model
+    :return: key of each layer in the weights file, None for the input layer
+    """
+    keys = []
+    counts = {}
+
+    for layer in layers:
+        if layer["class_name"] == "InputLayer":
+            keys.append(None)
+            continue
+
+        key = re.sub(r"(?<!^)(?=[A-Z])", "_", layer["class_name"]).lower()
+        count = counts.get(key, 0)
+        counts[key] = count + 1
+
+        keys.append(f"{key}_{count}" if count else key)
+
+    return keys
+
+
+def read_keras_weights(path: str):
+    """
+    Read the layers config and weights of a Sequential model saved with Keras 3 (.keras archive)
+    :param path: path of the .keras file
+    :return: list of (layer config, list of weights)
+    """
+    import h5py
+
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read("config.json"))
+
+        with archive.open("model.weights.h5") as weights_file, h5py.File(weights_file, "r") as weights:
+            layers = []
+            layers_config = config["config"]["layers"]
+
+            for layer, key in zip(layers_config, get_keras_weights_keys(layers_config)):
+                variables = weights.get(f"layers/{key}/vars") if key else None
+
+                values = []
+                if variables is not None:
+                    values = [variables[str(i)][()] for i in range(len(variables))]
+
+                layers.append((layer, values))
+
+    return layers
+
+
+def read_hdf5_weights(path: str):
+    """
+    Read the layers config and weights of a Sequential model saved with Keras 2 (.hdf5 file)
+    :param path: path of the .hdf5 file
+    :return: list of (layer config, list of weights)
+    """
+    import h5py
+
+    with h5py.File(path, "r") as model_file:
+        config = json.loads(model_file.attrs["model_config"])
+        weights = model_file["model_weights"]
+
+        layers = []
+
+        for layer in config["config"]["layers"]:
+            name = layer["config"]["name"]
+            values = []
+
+            if name in weights:
+                weight_names = weights[name].attrs["weight_names"]
+                values = [weights[name][weight_name][()] for weight_name in weight_names]
+
+            layers.append((layer, values))
+
+    return layers
+
+
+def get_batch_normalization_affine(config: dict, values: list):
+    """
+    Convert an inference-mode BatchNormalization layer to a scale and a shift
+    :param config: layer config
+    :param values: layer weights ([gamma], [beta], moving_mean, moving_variance)
+    :return: (scale, shift) so that output = input * scale + shift
+    """
+    values = list(values)
+
+    gamma = values.pop(0) if config.get("scale", True) else 1.0
+    beta = values.pop(0) if config.get("center", True) else 0.0
+    moving_mean, moving_variance = values
+
+    scale = gamma / np.sqrt(moving_variance + config["epsilon"])
+    shift = beta - moving_mean * scale
+
+    return scale, shift
+
+
+def fold_layers(layers: list):
+    """
+    Fold BatchNormalization layers into the neighbouring Dense weights and drop Dropout layers
+    :param layers: list of (layer config, list of weights)
+    :return: list of (kernel, bias, activation name)
+    """
+    folded = []
+
+    # BatchNormalization following an activation is pushed into the next Dense layer
+    pending_scale = None
+    pending_shift = None
+
+    for layer, values in layers:
+        class_name = layer["class_name"]
+        config = layer["config"]
+
+        if class_name in IGNORED_LAYERS:
+            continue
+
+        if class_name == "Dense":
+            kernel = values[0].astype(np.float64)
+            bias = values[1].astype(np.float64) if config.get("use_bias", True) else np.zeros(kernel.shape[1])
+
+            if pending_scale is not None:
+                bias = pending_shift @ kernel + bias
+                kernel = pending_scale[:, None] * kernel
+                pending_scale = None
+                pending_shift = None
+
+            folded.append([kernel, bias, config.get("activation", "linear")])
+            continue
+
+        if class_name == "BatchNormalization":
+            scale, shift = get_batch_normalization_affine(config, values)
+
+            if folded and pending_scale is None and folded[-1][2] == "linear":
+                folded[-1][0] = folded[-1][0] * scale
+                folded[-1][1] = folded[-1][1] * scale + shift
+                continue
+
+            if pending_scale is None:
+                pending_scale, pending_shift = scale, shift
+            else:
+                pending_shift = pending_shift * scale + shift
+                pending_scale = pending_scale * scale
+            continue
+
+        raise ValueError(f"Unsupported layer for numpy inference: {class_name}")
+
+    if pending_scale is not None:
+        folded.append([np.diag(pending_scale), pending_shift, "linear"])
+
+    return [
+        (np.ascontiguousarray(kernel, dtype=np.float32), np.ascontiguousarray(bias, dtype=np.float32), activation)
+        for kernel, bias, activation in folded
+    ]
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_weights_artifact_path(model_path: str) -> str:
+    return model_path.rsplit(".", 1)[0] + WEIGHTS_ARTIFACT_EXTENSION
+
+
+def load_folded_layers(model_path: str, use_cache: bool = True):
+    """
+    Get the folded layers of a model from its weights artifact next to it, folding and writing the artifact when it is
+    missing, of another version, or made from another version of the model file
+    :param model_path: path of the .keras / .hdf5 model
+    :param use_cache: read and write the artifact
+    :return: list of (kernel, bias, activation name), see fold_layers
+    """
+    artifact_path = get_weights_artifact_path(model_path)
+    source_hash = hash_file(model_path)
+
+    if use_cache and os.path.exists(artifact_path):
+        with np.load(artifact_path) as artifact:
+            if int(artifact["version"]) == WEIGHTS_ARTIFACT_VERSION and str(artifact["source_hash"]) == source_hash:
+                activations = [str(activation) for activation in artifact["activations"]]
+
+                return [(artifact[f"kernel_{i}"], artifact[f"bias_{i}"], activation)
+                        for i, activation in enumerate(activations)]
+
+    if model_path.endswith(".keras"):
+        layers = fold_layers(read_keras_weights(model_path))
+    else:
+        layers = fold_layers(read_hdf5_weights(model_path))
+
+    if use_cache:
+        arrays = {}
+        for i, (kernel, bias, _) in enumerate(layers):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+
+        try:
+            write_weights_artifact(artifact_path, source_hash=source_hash,
+                                   activations=np.array([activation for _, _, activation in layers]), **arrays)
+        except OSError:
+            # Read-only models folder (e.g. kiosk image): the layers are folded on every load
+            pass
+
+    return layers
+
+
+def write_weights_artifact(artifact_path: str, **arrays):
+    """
+    Write the weights artifact to a temporary file of the same folder then rename it, so a concurrent reader never
+    sees a partial artifact and concurrent writers do not write into the same file
+    """
+    file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp.npz", dir=os.path.dirname(artifact_path) or ".")
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            np.savez(f, version=WEIGHTS_ARTIFACT_VERSION, **arrays)
+
+        os.replace(temporary_path, artifact_path)
+
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+class NumpyGestureModel:
+    """
+    Forward pass of the gesture MLP as a few NumPy matmuls
+    """
+    layers = []
+
+    def __init__(self, model_path: str, use_cache: bool = True):
+        self.layers = []
+
+        for kernel, bias, activation in load_folded_layers(model_path, use_cache):
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation for numpy inference: {activation}")
+
+            self.layers.append((kernel, bias, ACTIVATIONS[activation]))
+
+        self.input_size = self.layers[0][0].shape[0]
+        self.output_size = self.layers[-1][0].shape[1]
+
+    def predict(self, input_data):
+        """
+        Run the model on a batch of rows
+        :param input_data: array of shape (N, input_size) or (input_size,)
+        :return: predictions of shape (N, output_size)
+        """
+        x = np.asarray(input_data, dtype=np.float32).reshape(-1, self.input_size)
+
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            x += bias
+            x = activation(x)
+
+        return x
+
+
+class KerasGestureModel:
+    """
+    Keras model behind the same interface as NumpyGestureModel
+    """
+
+    def __init__(self, model_path: str):
+        # TensorFlow is only loaded by this backend
+        from tensorflow.keras.models import load_model
+
+        self.model = load_model(model_path, compile=False)
+
+    def predict(self, input_data):
+        return self.model.predict(input_data, verbose=0)
+
+
+def get_tflite_path(model_path: str, quantization: str = "float") -> str:
+    """
+    :param model_path: path of the .keras / .hdf5 model
+    :param quantization: "float" or "int8"
+    :return: path of its TFLite conversion (see helpers/ai/tflite.py)
+    """
+    if model_path.endswith(".tflite"):
+        return model_path
+
+    base_path = model_path.rsplit(".", 1)[0]
+
+    return base_path + (".int8.tflite" if quantization == "int8" else ".tflite")
+
+
+def get_tflite_source_hash_path(tflite_path: str) -> str:
+    return tflite_path + TFLITE_SOURCE_HASH_EXTENSION
+
+
+def check_tflite_conversion(model_path: str, tflite_path: str):
+    """
+    Check that a TFLite conversion was made from the current version of the model file
+    :raise ValueError: when the conversion is missing, or made from another version of the model file
+    """
+    hash_path = get_tflite_source_hash_path(tflite_path)
+
+    if not os.path.exists(tflite_path):
+        raise ValueError(f"{tflite_path} is missing, run `python -m helpers.ai.tflite {model_path}` first")
+
+    source_hash = None
+    if os.path.exists(hash_path):
+        with open(hash_path) as f:
+            source_hash = f.read().strip()
+
+    if source_hash != hash_file(model_path):
+        raise ValueError(f"{tflite_path} was not converted from this version of {model_path}, "
+                         f"run `python -m helpers.ai.tflite {model_path}` again")
+
+
+def create_tflite_interpreter(model_path: str):
+    """
+    Interpreter of the standalone tflite_runtime package when installed, of TensorFlow otherwise
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite.python.interpreter import Interpreter
+
+    return Interpreter(model_path=model_path)
+
+
+class TFLiteGestureModel:
+    """
+    TFLite conversion of the gesture model run by the TFLite interpreter, float or full int8
+    """
+    quantization = "float"
+
+    def __init__(self, model_path: str):
+        tflite_path = get_tflite_path(model_path, self.quantization)
+        # A conversion given directly has no model file to be compared with
+        if tflite_path != model_path:
+            check_tflite_conversion(model_path, tflite_path)
+
+        self.interpreter = create_tflite_interpreter(tflite_path)
+        self.interpreter.allocate_tensors()
+
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+
+        self.input_size = self.input_details["shape"][-1]
+        self.output_size = self.output_details["shape"][-1]
+        self.batch_size = self.input_details["shape"][0]
+
+    def quantize(self, x):
+        scale, zero_point = self.input_details["quantization"]
+
+        if self.input_details["dtype"] == np.float32 or not scale:
+            return x.astype(self.input_details["dtype"], copy=False)
+
+        info = np.iinfo(self.input_details["dtype"])
+
+        return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(self.input_details["dtype"])
+
+    def dequantize(self, y):
+        scale, zero_point = self.output_details["quantization"]
+
+        if self.output_details["dtype"] == np.float32 or not scale:
+            return y.astype(np.float32, copy=False)
+
+        return (y.astype(np.float32) - zero_point) * scale
+
+    def predict(self, input_data):
+        """
+        Run the model on a batch of rows
+        :param input_data: array of shape (N, input_size) or (input_size,)
+        :return: predictions of shape (N, output_size)
+        """
+        x = np.asarray(input_data, dtype=np.float32).reshape(-1, self.input_size)
+
+        # The input tensor is only resized when the number of hands changes
+        if len(x) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_details["index"], [len(x), self.input_size])
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(x)
+
+        self.interpreter.set_tensor(self.input_details["index"], self.quantize(x))
+        self.interpreter.invoke()
+
+        return self.dequantize(self.interpreter.get_tensor(self.output_details["index"]))
+
+
+class TFLiteInt8GestureModel(TFLiteGestureModel):
+    quantization = "int8"
+
+
+BACKENDS = {
+    "keras": KerasGestureModel,
+    "numpy": NumpyGestureModel,
+    "tflite": TFLiteGestureModel,
+    "tflite_int8": TFLiteInt8GestureModel,
+}
+
+
+def load_gesture_model(model_path: str, backend: str = "keras"):
+    """
+    Load the gesture classifier with the given inference backend
+    :param model_path: path of the .keras / .hdf5 model, the tflite backends load its conversion next to it
+    :param backend: one of BACKENDS
+    :return: model with a predict(input_data) method
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown gesture model backend: {backend} (expected one of {list(BACKENDS)})")
+
+    return BACKENDS[backend](model_path)
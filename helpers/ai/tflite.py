@@ -0,0 +1,117 @@
+"""
+Converts the gesture models to TFLite, float and full int8, for the "tflite" and "tflite_int8" backends.
+
+Usage: python -m helpers.ai.tflite [MODEL ...] [--data GLOB] [--representative-rows N]
+Models default to models/*/*.keras and models/*/*.hdf5, the conversions are written next to them
+(<name>.tflite and <name>.int8.tflite), with the hash of the model file they were made from: the backends refuse a
+conversion of another version of the model. The int8 quantization is calibrated on rows of the features datasets.
+"""
+import argparse
+import glob
+
+import numpy as np
+
+from helpers.ai.data import DATASETS_GLOB, read_datasets
+from helpers.ai.inference import get_tflite_path, get_tflite_source_hash_path, hash_file, load_folded_layers
+
+MODELS_GLOBS = ["./models/*/*.keras", "./models/*/*.hdf5"]
+
+# Rows of the datasets used to calibrate the int8 quantization
+REPRESENTATIVE_ROWS = 1000
+
+QUANTIZATIONS = ["float", "int8"]
+
+
+def get_representative_data(pattern: str = DATASETS_GLOB, num_rows: int = REPRESENTATIVE_ROWS):
+    """
+    :return: float32 array of at most num_rows rows drawn from the features datasets
+    """
+    inputs, _ = read_datasets(pattern)
+    rng = np.random.default_rng(0)
+
+    return inputs[rng.permutation(len(inputs))[:num_rows]]
+
+
+def convert_model(model_path: str, quantization: str = "float", representative_data=None) -> bytes:
+    """
+    Convert a Keras model to TFLite
+    :param model_path: path of the .keras / .hdf5 model
+    :param quantization: "float", or "int8" for int8 weights, activations, input and output
+    :param representative_data: rows calibrating the int8 ranges
+    :return: the TFLite flatbuffer
+    """
+    import tensorflow as tf
+
+    activations = {
+        "relu": tf.nn.relu,
+        "softmax": tf.nn.softmax,
+        "sigmoid": tf.sigmoid,
+        "tanh": tf.tanh,
+        "linear": tf.identity,
+    }
+
+    # The Keras 3 models do not convert (the converter fails on the BatchNormalization variables): the inference
+    # graph is rebuilt from the weights, with BatchNormalization folded like the numpy backend does
+    layers = [(tf.constant(kernel), tf.constant(bias), activation)
+              for kernel, bias, activation in load_folded_layers(model_path)]
+
+    @tf.function(input_signature=[tf.TensorSpec([1, layers[0][0].shape[0]], tf.float32)])
+    def predict(x):
+        for kernel, bias, activation in layers:
+            x = activations[activation](tf.matmul(x, kernel) + bias)
+        return x
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([predict.get_concrete_function()])
+
+    if quantization == "int8":
+        if representative_data is None:
+            raise ValueError("The int8 quantization needs representative data")
+
+        def representative_dataset():
+            for row in representative_data:
+                yield [row[None].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    return converter.convert()
+
+
+def export_model(model_path: str, representative_data=None, quantizations=QUANTIZATIONS) -> list:
+    """
+    Write the TFLite conversions of a model next to it
+    :return: paths of the written files
+    """
+    paths = []
+    source_hash = hash_file(model_path)
+
+    for quantization in quantizations:
+        tflite_path = get_tflite_path(model_path, quantization)
+
+        with open(tflite_path, "wb") as f:
+            f.write(convert_model(model_path, quantization, representative_data))
+
+        with open(get_tflite_source_hash_path(tflite_path), "w") as f:
+            f.write(source_hash)
+
+        paths.append(tflite_path)
+
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("models", nargs="*")
+    parser.add_argument("--data", default=DATASETS_GLOB)
+    parser.add_argument("--representative-rows", type=int, default=REPRESENTATIVE_ROWS)
+    args = parser.parse_args()
+
+    model_paths = args.models or sorted(path for pattern in MODELS_GLOBS for path in glob.glob(pattern))
+    rows = get_representative_data(args.data, args.representative_rows)
+
+    for path in model_paths:
+        for written_path in export_model(path, rows):
+            print(f"{path} -> {written_path}")
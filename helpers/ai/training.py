@@ -0,0 +1,373 @@
+"""
+Non-interactive training of the gesture classifier, with hyperparameter sweeps.
+
+Usage: python -m helpers.ai.training NAME [--data PATH ...] [--sweep grid|random] [--samples N] [--workers N]
+                                     [--learning-rates X ...] [--dropouts X ...] [--layers 32,16 ...]
+                                     [--epochs N] [--patience N] [--force]
+
+--data takes features CSVs (datasets/*.csv by default) or feature stores. The prepared tensors are cached in
+CACHE_FOLDER under the hash of the dataset content. Each candidate of the sweep is trained in a worker process and
+written to models/<NAME>-<hyperparameters>/ (models/<NAME>/ without sweep) with its training.log, labels.txt and
+results.json (test accuracy and inference latency). The sweep summary is written to logs/sweeps/<NAME>.json.
+Existing model folders are not overwritten unless --force is given.
+"""
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from helpers.ai.data import DATASETS_GLOB, read_dataset, write_labels
+from helpers.ai.feature_store import FEATURE_STORE_EXTENSION, read_feature_store
+from helpers.ai.metrics import append_metrics_csv, create_metrics_csv
+
+CACHE_FOLDER = "./datasets/.cache"
+MODELS_FOLDER = "./models"
+SWEEPS_FOLDER = "./logs/sweeps"
+
+LEARNING_RATE = 0.0001
+REGULARIZATION_RATE = 0.001
+DROPOUT = 0.2
+LAYER_SIZES = (32, 16)
+
+NUM_EPOCHS = 1000
+BATCH_SIZE = 128
+VALIDATION_SPLIT = 0.2
+TEST_SPLIT = 0.2
+# Epochs without val_loss improvement before stopping (None to train all the epochs)
+PATIENCE = 20
+
+SEED = 42
+
+# Single row predict calls timed for the latency numbers
+NUMPY_LATENCY_ITERATIONS = 2000
+KERAS_LATENCY_ITERATIONS = 20
+
+
+def get_dataset_paths(sources: list) -> list:
+    """
+    :param sources: CSV paths, glob patterns or feature store folders
+    :return: sorted list of the dataset paths
+    """
+    paths = []
+
+    for source in sources:
+        paths += glob.glob(source) if not source.endswith(FEATURE_STORE_EXTENSION) else [source]
+
+    return sorted(set(paths))
+
+
+def hash_datasets(paths: list) -> str:
+    """
+    :param paths: CSV files and feature store folders
+    :return: hash of their content
+    """
+    digest = hashlib.sha256()
+
+    for path in paths:
+        files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, "*")))
+
+        for file_path in files:
+            digest.update(os.path.basename(file_path).encode())
+
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+
+    return digest.hexdigest()[:16]
+
+
+def prepare_data(paths: list):
+    """
+    Read the datasets and encode the labels as one-hot vectors
+    :return: (float32 inputs of shape (N, 42), float32 one-hot labels of shape (N, classes), sorted classes)
+    """
+    all_inputs = []
+    all_labels = []
+
+    for path in paths:
+        if path.endswith(FEATURE_STORE_EXTENSION):
+            inputs, codes, labels = read_feature_store(path)
+            all_inputs.append(np.asarray(inputs))
+            all_labels += [labels[code] for code in codes]
+        else:
+            inputs, labels = read_dataset(path)
+            all_inputs.append(inputs)
+            all_labels += labels
+
+    # Sorted like pd.get_dummies did in the training notebook
+    classes = sorted(set(all_labels))
+    class_indexes = {label: i for i, label in enumerate(classes)}
+
+    one_hot = np.zeros((len(all_labels), len(classes)), dtype=np.float32)
+    one_hot[np.arange(len(all_labels)), [class_indexes[label] for label in all_labels]] = 1
+
+    return np.concatenate(all_inputs), one_hot, classes
+
+
+def load_training_data(sources: list):
+    """
+    Load the prepared tensors from the cache, preparing and caching them on a miss
+    :param sources: CSV paths, glob patterns or feature store folders
+    :return: path of the cached .npz file (inputs, labels, classes)
+    """
+    paths = get_dataset_paths(sources)
+
+    if not paths:
+        raise ValueError(f"No dataset found in {sources}")
+
+    cache_path = os.path.join(CACHE_FOLDER, hash_datasets(paths) + ".npz")
+
+    if os.path.exists(cache_path):
+        print(f"Using cached tensors {cache_path}")
+        return cache_path
+
+    inputs, labels, classes = prepare_data(paths)
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    np.savez(cache_path, inputs=inputs, labels=labels, classes=np.array(classes))
+    print(f"Cached {len(inputs)} rows of {paths} in {cache_path}")
+
+    return cache_path
+
+
+def split_data(inputs, labels):
+    from sklearn.model_selection import train_test_split
+
+    x_train, x_test, y_train, y_test = train_test_split(inputs, labels, test_size=TEST_SPLIT, random_state=SEED)
+    x_train, x_validation, y_train, y_validation = train_test_split(x_train, y_train, test_size=VALIDATION_SPLIT,
+                                                                    random_state=SEED)
+
+    return (x_train, y_train), (x_validation, y_validation), (x_test, y_test)
+
+
+def make_dataset(inputs, labels, batch_size: int = BATCH_SIZE, shuffle: bool = False):
+    """
+    :return: tf.data pipeline of batches, prefetched while the previous batch trains
+    """
+    import tensorflow as tf
+
+    dataset = tf.data.Dataset.from_tensor_slices((inputs, labels))
+
+    if shuffle:
+        dataset = dataset.shuffle(len(inputs), seed=SEED, reshuffle_each_iteration=True)
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def build_model(input_size: int, output_size: int, layer_sizes=LAYER_SIZES, dropout: float = DROPOUT,
+                regularization_rate: float = REGULARIZATION_RATE):
+    """
+    Dense -> BatchNormalization -> Dropout blocks then a softmax layer, as in the training notebook
+    """
+    from tensorflow.keras import regularizers
+    from tensorflow.keras.layers import BatchNormalization, Dense, Dropout, Input
+    from tensorflow.keras.models import Sequential
+
+    layers = [Input(shape=[input_size])]
+
+    for units in layer_sizes:
+        layers += [
+            Dense(units, activation="relu", kernel_regularizer=regularizers.l2(regularization_rate)),
+            BatchNormalization(),
+            Dropout(rate=dropout),
+        ]
+
+    layers.append(Dense(units=output_size, activation="softmax"))
+
+    return Sequential(layers)
+
+
+def measure_latency(model, iterations: int) -> float:
+    """
+    :param model: model with a predict(input_data) method
+    :return: mean single row predict time in microseconds
+    """
+    row = np.random.default_rng(SEED).random((1, model_input_size(model)), dtype=np.float32)
+    model.predict(row)  # Warm-up
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model.predict(row)
+
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def model_input_size(model):
+    return model.input_size if hasattr(model, "input_size") else model.model.input_shape[-1]
+
+
+def get_candidate_name(name: str, hyperparameters: dict) -> str:
+    layers = "x".join(str(units) for units in hyperparameters["layer_sizes"])
+
+    return f"{name}-lr{hyperparameters['learning_rate']:g}-do{hyperparameters['dropout']:g}-{layers}"
+
+
+def train_candidate(cache_path: str, model_name: str, hyperparameters: dict, epochs: int = NUM_EPOCHS,
+                    patience: int = PATIENCE, threads: int = None):
+    """
+    Train one configuration and write it to models/<model_name>/
+    :param cache_path: cached tensors from load_training_data
+    :param model_name: name of the model folder
+    :param hyperparameters: learning_rate, dropout, layer_sizes
+    :param epochs: maximum number of epochs
+    :param patience: epochs without val_loss improvement before stopping, None to train all the epochs
+    :param threads: TensorFlow intra/inter op threads, TensorFlow default when None
+    :return: results dict, also written to results.json
+    """
+    import tensorflow as tf
+
+    from helpers.ai.inference import KerasGestureModel, NumpyGestureModel
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+    tf.keras.utils.set_random_seed(SEED)
+
+    with np.load(cache_path) as data:
+        inputs, labels, classes = data["inputs"], data["labels"], list(data["classes"])
+
+    train, validation, test = split_data(inputs, labels)
+
+    model_folder = os.path.join(MODELS_FOLDER, model_name)
+    model_path = os.path.join(model_folder, model_name + ".keras")
+    metrics_path = os.path.join(model_folder, "training.log")
+
+    create_metrics_csv(metrics_path)
+    write_labels(model_folder + "/", classes)
+
+    model = build_model(inputs.shape[1], labels.shape[1], hyperparameters["layer_sizes"], hyperparameters["dropout"])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=hyperparameters["learning_rate"]),
+                  loss="categorical_crossentropy", metrics=["accuracy"])
+
+    callbacks = [
+        tf.keras.callbacks.ModelCheckpoint(filepath=model_path, monitor="val_loss", save_best_only=True),
+        tf.keras.callbacks.LambdaCallback(on_epoch_end=lambda epoch, logs: append_metrics_csv(
+            metrics_path, logs["loss"], logs["accuracy"], logs["val_loss"], logs["val_accuracy"]
+        )),
+    ]
+    if patience:
+        callbacks.append(tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=patience,
+                                                          restore_best_weights=True))
+
+    start = time.perf_counter()
+    history = model.fit(make_dataset(*train, shuffle=True), validation_data=make_dataset(*validation),
+                        epochs=epochs, verbose=0, callbacks=callbacks)
+    training_time = time.perf_counter() - start
+
+    test_loss, test_accuracy = model.evaluate(make_dataset(*test), verbose=0)
+
+    results = {
+        "name": model_name,
+        "hyperparameters": hyperparameters,
+        "epochs": len(history.history["loss"]),
+        "training_seconds": round(training_time, 1),
+        "best_val_loss": float(min(history.history["val_loss"])),
+        "test_loss": float(test_loss),
+        "test_accuracy": float(test_accuracy),
+        "latency_us": {
+            "numpy": round(measure_latency(NumpyGestureModel(model_path), NUMPY_LATENCY_ITERATIONS), 1),
+            "keras": round(measure_latency(KerasGestureModel(model_path), KERAS_LATENCY_ITERATIONS), 1),
+        },
+    }
+
+    with open(os.path.join(model_folder, "results.json"), "w") as f:
+        json.dump(results, f, indent=2)
+
+    return results
+
+
+def get_candidates(learning_rates: list, dropouts: list, layer_sizes: list, sweep: str = "grid",
+                   samples: int = None) -> list:
+    """
+    :param sweep: "grid" for every combination, "random" for `samples` combinations drawn from the grid
+    :return: list of hyperparameters dicts
+    """
+    candidates = [
+        {"learning_rate": learning_rate, "dropout": dropout, "layer_sizes": list(sizes)}
+        for learning_rate, dropout, sizes in itertools.product(learning_rates, dropouts, layer_sizes)
+    ]
+
+    if sweep == "random":
+        candidates = random.Random(SEED).sample(candidates, min(samples or len(candidates), len(candidates)))
+
+    return candidates
+
+
+def run_sweep(name: str, sources: list, candidates: list, workers: int = None, epochs: int = NUM_EPOCHS,
+              patience: int = PATIENCE, force: bool = False):
+    """
+    Train the candidates in a process pool, each worker using its share of the CPUs
+    :param force: overwrite the model folders that already exist
+    :return: results of the candidates, best test accuracy first
+    """
+    if len(candidates) == 1:
+        model_names = [name]
+    else:
+        model_names = [get_candidate_name(name, hyperparameters) for hyperparameters in candidates]
+
+    existing = [model_name for model_name in model_names if os.path.exists(os.path.join(MODELS_FOLDER, model_name))]
+    if existing and not force:
+        raise FileExistsError(f"Model with name {', '.join(existing)} already exists ! Use --force to overwrite it")
+
+    cache_path = load_training_data(sources)
+
+    if len(candidates) == 1:
+        results = [train_candidate(cache_path, name, candidates[0], epochs, patience)]
+    else:
+        workers = workers or min(len(candidates), os.cpu_count())
+        threads = max(1, os.cpu_count() // workers)
+
+        # TensorFlow does not survive a fork once initialized, workers are spawned
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+            futures = [
+                pool.submit(train_candidate, cache_path, model_name, hyperparameters, epochs, patience, threads)
+                for model_name, hyperparameters in zip(model_names, candidates)
+            ]
+            results = [future.result() for future in futures]
+
+    results.sort(key=lambda result: result["test_accuracy"], reverse=True)
+
+    os.makedirs(SWEEPS_FOLDER, exist_ok=True)
+    with open(os.path.join(SWEEPS_FOLDER, name + ".json"), "w") as f:
+        json.dump(results, f, indent=2)
+
+    return results
+
+
+def print_results(results: list):
+    for result in results:
+        print(f"{result['name']:<48} test accuracy {result['test_accuracy'] * 100:6.2f} %, "
+              f"{result['epochs']:4d} epochs in {result['training_seconds']:7.1f} s, "
+              f"numpy {result['latency_us']['numpy']:6.1f} us, keras {result['latency_us']['keras']:8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name")
+    parser.add_argument("--data", nargs="+", default=[DATASETS_GLOB])
+    parser.add_argument("--sweep", choices=["grid", "random"], default="grid")
+    parser.add_argument("--samples", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[LEARNING_RATE])
+    parser.add_argument("--dropouts", type=float, nargs="+", default=[DROPOUT])
+    parser.add_argument("--layers", nargs="+", default=[",".join(map(str, LAYER_SIZES))])
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--force", action="store_true", help="overwrite the existing model folders")
+    args = parser.parse_args()
+
+    sweep_candidates = get_candidates(args.learning_rates, args.dropouts,
+                                      [[int(units) for units in layers.split(",")] for layers in args.layers],
+                                      args.sweep, args.samples)
+
+    print_results(run_sweep(args.name, args.data, sweep_candidates, args.workers, args.epochs, args.patience or None,
+                            args.force))
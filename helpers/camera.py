@@ -1,6 +1,10 @@
+import threading
 import time
 
 import cv2
+import numpy as np
+
+from helpers.instrumentation import instrumentation
 
 
 def close_camera(capture):
@@ -19,6 +23,102 @@ def read_frame(capture, framerate=None):
     return frame
 
 
+class SynchronousCapture:
+    """
+    Frame source reading the capture on demand, in the calling thread
+    """
+
+    def __init__(self, capture, framerate=None):
+        self.capture = capture
+        self.framerate = framerate
+
+        self.sequence = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        return self
+
+    def read(self):
+        """
+        Read the next frame
+        :return: (frame, capture timestamp from time.perf_counter, sequence number)
+        """
+        frame = read_frame(self.capture, self.framerate)
+        self.sequence += 1
+
+        return frame, time.perf_counter(), self.sequence
+
+    def stop(self):
+        return
+
+
+class ThreadedCapture:
+    """
+    Frame source owning the capture in a dedicated thread and keeping only the newest frame
+    """
+
+    def __init__(self, capture):
+        self.capture = capture
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        self.frame = None
+        self.timestamp = None
+        self.sequence = 0
+
+        self.last_read_sequence = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, name="capture", daemon=True)
+        self.thread.start()
+
+        return self
+
+    def capture_loop(self):
+        while self.running:
+            ret, frame = self.capture.read()
+            timestamp = time.perf_counter()
+
+            with self.condition:
+                if not ret:
+                    self.running = False
+                    self.condition.notify_all()
+                    return
+
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Wait for a frame newer than the last one read and return it, older frames are dropped
+        :param timeout: maximum time to wait in seconds, None to wait forever
+        :return: (frame, capture timestamp from time.perf_counter, sequence number), frame is None once stopped
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > self.last_read_sequence or not self.running, timeout)
+
+            if self.sequence == self.last_read_sequence:
+                return None, None, self.sequence
+
+            self.dropped_frames += self.sequence - self.last_read_sequence - 1
+            self.last_read_sequence = self.sequence
+
+            return self.frame, self.timestamp, self.sequence
+
+    def stop(self):
+        self.running = False
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
 def get_close_event():
     return cv2.waitKey(1) & 0xFF == ord("q")
 
@@ -67,14 +167,22 @@ def show_image(image):
     cv2.waitKey(0)
 
 
-def frame_preprocessing(frame, resize_to=None, resolution=None, flip=False):
-    if resize_to is not None:
-        frame_height, frame_width = frame.shape[:2]
+def crop_center(frame, size):
+    """
+    :param size: (width, height) of the crop
+    :return: view of the center of the frame, no copy
+    """
+    frame_height, frame_width = frame.shape[:2]
 
-        offset_x = int((frame_width - resize_to[0]) / 2)
-        offset_y = int((frame_height - resize_to[1]) / 2)
+    offset_x = int((frame_width - size[0]) / 2)
+    offset_y = int((frame_height - size[1]) / 2)
 
-        frame = frame[offset_y:offset_y + resize_to[1], offset_x:offset_x + resize_to[0]]
+    return frame[offset_y:offset_y + size[1], offset_x:offset_x + size[0]]
+
+
+def frame_preprocessing(frame, resize_to=None, resolution=None, flip=False):
+    if resize_to is not None:
+        frame = crop_center(frame, resize_to)
 
     if resolution is not None:
         frame = cv2.resize(frame, resolution)
@@ -85,8 +193,88 @@ def frame_preprocessing(frame, resize_to=None, resolution=None, flip=False):
     return frame
 
 
-def flip_frame(frame):
-    return cv2.flip(frame, 1)
+def flip_frame(frame, dst=None):
+    """
+    :param dst: buffer of the same shape to flip the frame into, reused across frames, or frame itself
+    """
+    return cv2.flip(frame, 1, dst=dst)
+
+
+class FramePreprocessor:
+    """
+    Center crop and resize of the camera frames in a single pass, into buffers reused across frames.
+
+    The crop is a view of the camera frame, the resize writes into the next buffer of a ring: a frame stays valid
+    until `buffers` newer frames were processed, so it has to be larger than the number of frames in flight
+    (recognition queue, frame being recognized and frame being displayed). Frames are not flipped, see the mirror
+    option of GestureHandler.
+
+    The bytes copied per frame are reported with get_report: the resize, and the copies made downstream (RGB
+    conversion for the landmark model, flips) counted with count_copy.
+    """
+
+    def __init__(self, resize_to=None, resolution=None, buffers=4):
+        """
+        :param resize_to: (width, height) of the center crop, None to keep the whole frame
+        :param resolution: (width, height) of the processed frames, None to keep the crop resolution
+        :param buffers: number of frames in the ring
+        """
+        self.resize_to = resize_to
+        self.resolution = resolution
+
+        self.buffers = [None] * buffers
+        self.next_buffer = 0
+
+        self.frames = 0
+        self.total_bytes_copied = 0
+        # Copies are counted from the recognition thread and from the display loop
+        self.lock = threading.Lock()
+
+    def get_buffer(self, shape, dtype):
+        buffer = self.buffers[self.next_buffer]
+
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[self.next_buffer] = np.empty(shape, dtype=dtype)
+
+        self.next_buffer = (self.next_buffer + 1) % len(self.buffers)
+
+        return buffer
+
+    def process(self, frame):
+        """
+        :param frame: BGR camera frame
+        :return: (processed frame, crop of the camera frame at full resolution), the crop is a view of the frame
+        """
+        source_frame = frame if self.resize_to is None else crop_center(frame, self.resize_to)
+
+        processed_frame = source_frame
+
+        if self.resolution is not None:
+            width, height = self.resolution
+            buffer = self.get_buffer((height, width) + source_frame.shape[2:], source_frame.dtype)
+
+            processed_frame = cv2.resize(source_frame, self.resolution, dst=buffer)
+            self.count_copy(processed_frame.nbytes)
+
+        self.frames += 1
+
+        return processed_frame, source_frame
+
+    def count_copy(self, num_bytes: int):
+        """
+        Count bytes written for the frames, by process or downstream of it
+        :param num_bytes: size of the written array
+        """
+        with self.lock:
+            self.total_bytes_copied += num_bytes
+
+        instrumentation.count("bytes_copied", num_bytes)
+
+    def get_report(self) -> dict:
+        return {
+            "frames": self.frames,
+            "bytes_per_frame": round(self.total_bytes_copied / self.frames) if self.frames else 0,
+        }
 
 
 def close_image():
@@ -2,8 +2,9 @@ import math
 
 import numpy as np
 
-
-
+WRIST_INDEX = 0
+MIDDLE_FINGER_MCP_INDEX = 9
+NUM_HAND_LANDMARKS = 21
 
 
 def compute_distance(x1: float, x2: float, y1: float, y2: float):
@@ -27,41 +28,55 @@ def compute_normalized_angle(vec1, vec2):
     return (angle + math.pi) / (2 * math.pi)
 
 
-def compute_distances_angles_from_wrist(landmarks) -> list:
-    distances = []
-    angles = []
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """
+    Convert mediapipe hand landmarks to an array
+    :param landmarks: NormalizedLandmarkList or its repeated `landmark` field
+    :return: array of shape (21, 2) with the x, y coordinates
+    """
+    landmarks = getattr(landmarks, "landmark", landmarks)
+
+    return np.array([(landmark.x, landmark.y) for landmark in landmarks], dtype=np.float64)
+
+
+def compute_distances_angles_from_wrist_batch(points) -> np.ndarray:
+    """
+    Compute the distances and angles of every hand landmark from the wrist, for a batch of hands
+    :param points: array of shape (N, 21, 2) or (N, 21, 3), only x and y are used
+    :return: float32 array of shape (N, 40): 20 distances then 20 angles, in landmark order
+    """
+    points = np.asarray(points, dtype=np.float64)[..., :2]
+
+    wrist = points[:, WRIST_INDEX:WRIST_INDEX + 1]
+    others = points[:, WRIST_INDEX + 1:]
+
+    features = np.empty((points.shape[0], 2 * (NUM_HAND_LANDMARKS - 1)), dtype=np.float32)
 
-    MIDDLE_FINGER_MCP_INDEX = 8
+    offsets = others - wrist
+    features[:, :NUM_HAND_LANDMARKS - 1] = np.hypot(offsets[..., 0], offsets[..., 1])
 
-    # copy landmarks to avoid modifying the original list
-    landmarks = list(landmarks)
+    # Vectors point from the landmark to the wrist, rounded to float32 like the features were in the datasets
+    vectors = (wrist - others).astype(np.float32)
+    reference = vectors[:, MIDDLE_FINGER_MCP_INDEX - 1:MIDDLE_FINGER_MCP_INDEX]
 
-    wrist_landmarks = landmarks.pop(0)
-    middle_finger_mcp_landmarks = landmarks[MIDDLE_FINGER_MCP_INDEX]
+    dot = vectors[..., 0] * reference[..., 0] + vectors[..., 1] * reference[..., 1]
+    det = vectors[..., 0] * reference[..., 1] - vectors[..., 1] * reference[..., 0]
 
-    reference_vector = (
-        np.float32(wrist_landmarks.x - middle_finger_mcp_landmarks.x),
-        np.float32(wrist_landmarks.y - middle_finger_mcp_landmarks.y),
-    )
+    # Normalize angle between 0 and 1
+    angles = (np.arctan2(det.astype(np.float64), dot.astype(np.float64)) + math.pi) / (2 * math.pi)
+    angles[:, MIDDLE_FINGER_MCP_INDEX - 1] = 0.0  # Skip middle finger MCP
 
-    for i, landmark in enumerate(landmarks):
-        distances.append(
-            np.float32(
-                compute_distance(
-                    landmark.x, wrist_landmarks.x, landmark.y, wrist_landmarks.y
-                )
-            )
-        )
+    features[:, NUM_HAND_LANDMARKS - 1:] = angles
 
-        if i == MIDDLE_FINGER_MCP_INDEX:
-            angles.append(0.0)  # Skip middle finger MCP
-            continue
+    return features
 
-        vector = (
-            np.float32(wrist_landmarks.x - landmark.x),
-            np.float32(wrist_landmarks.y - landmark.y),
-        )
 
-        angles.append(np.float32(compute_normalized_angle(vector, reference_vector)))
+def compute_distances_angles_from_wrist(landmarks) -> list:
+    """
+    Compute the distances and angles of the hand landmarks from the wrist
+    :param landmarks: NormalizedLandmarkList or its repeated `landmark` field
+    :return: 20 distances then 20 angles
+    """
+    points = landmarks_to_array(landmarks)
 
-    return distances + angles
+    return list(compute_distances_angles_from_wrist_batch(points[None])[0])
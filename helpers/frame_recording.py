@@ -0,0 +1,160 @@
+import os
+import struct
+import time
+
+import numpy as np
+
+# Header of the raw frame files: magic, version, height, width, channels, padded so frames start aligned
+MAGIC = b"RAWFRAME"
+VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sIIII")
+HEADER_SIZE = 64
+
+# Index of the timestamps: float64 values back to back, appended with each frame
+INDEX_SUFFIX = ".index.f8"
+# Index of the recordings made before it was appended frame by frame, written when the recording was closed
+LEGACY_INDEX_SUFFIX = ".index.npy"
+
+
+def get_index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def read_index(path: str):
+    """
+    :param path: path of the raw frame file
+    :return: float64 timestamps of the frames, None if there is no index
+    """
+    if os.path.exists(get_index_path(path)):
+        return np.fromfile(get_index_path(path), dtype="<f8")
+
+    if os.path.exists(path + LEGACY_INDEX_SUFFIX):
+        return np.load(path + LEGACY_INDEX_SUFFIX)
+
+    return None
+
+
+class FrameRecorder:
+    """
+    Writes preprocessed uint8 frames back to back in a fixed-stride raw file, with their timestamps in an index file.
+    All the frames must have the shape of the first one.
+
+    Both files are written unbuffered, frame by frame: a recording interrupted before close (crash, killed process)
+    keeps every frame written so far.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+        self.index_file = None
+        self.shape = None
+
+    def write(self, frame, timestamp=None):
+        """
+        Append a frame
+        :param frame: uint8 array of shape (height, width, channels)
+        :param timestamp: capture time in seconds, time.perf_counter() by default
+        """
+        if frame.dtype != np.uint8 or frame.ndim != 3:
+            raise ValueError(f"Expected a uint8 frame of shape (height, width, channels), got {frame.dtype} {frame.shape}")
+
+        if self.file is None:
+            self.shape = frame.shape
+            self.file = open(self.path, "wb", buffering=0)
+            self.file.write(HEADER_STRUCT.pack(MAGIC, VERSION, *self.shape).ljust(HEADER_SIZE, b"\0"))
+            self.index_file = open(get_index_path(self.path), "wb", buffering=0)
+
+        elif frame.shape != self.shape:
+            raise ValueError(f"Frame shape changed during the recording: {frame.shape} instead of {self.shape}")
+
+        # Crops and flips are strided views, one copy to write them contiguously
+        self.file.write(np.ascontiguousarray(frame).data)
+        # After the frame: an interrupted write leaves a frame without timestamp, which is not read back
+        self.index_file.write(struct.pack("<d", time.perf_counter() if timestamp is None else timestamp))
+
+    def close(self):
+        """
+        Close the frame and index files
+        """
+        if self.file is None:
+            return
+
+        self.file.close()
+        self.index_file.close()
+        self.file = None
+        self.index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_frame_recording(path: str):
+    """
+    Memory-map a raw frame file
+    :param path: path of a file written by FrameRecorder
+    :return: (read-only uint8 array of shape (N, height, width, channels), float64 timestamps of shape (N,))
+    """
+    with open(path, "rb") as file:
+        magic, version, height, width, channels = HEADER_STRUCT.unpack(file.read(HEADER_STRUCT.size))
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a raw frame file (version {VERSION})")
+
+    frame_size = height * width * channels
+    # A recording interrupted during a write ends with a partial frame, which is left out
+    num_frames = (os.path.getsize(path) - HEADER_SIZE) // frame_size
+
+    timestamps = read_index(path)
+    if timestamps is None:
+        # Index deleted or not copied with the frames: the frames are kept, without their capture times
+        timestamps = np.full(num_frames, np.nan)
+
+    num_frames = min(num_frames, len(timestamps))
+
+    if num_frames == 0:
+        return np.empty((0, height, width, channels), dtype=np.uint8), timestamps[:0]
+
+    frames = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(num_frames, height, width, channels))
+
+    return frames, timestamps[:num_frames]
+
+
+class RecordedFrames:
+    """
+    Frame source playing a raw frame file back, with the interface of helpers.camera.SynchronousCapture.
+    Frames are read-only views into the memory-mapped file: no decoding and no copy.
+    """
+
+    def __init__(self, path: str, loop: bool = False):
+        self.frames, self.timestamps = open_frame_recording(path)
+        self.loop = loop
+
+        self.sequence = 0
+        self.dropped_frames = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def start(self):
+        return self
+
+    def read(self):
+        """
+        Read the next frame
+        :return: (frame, recorded timestamp, sequence number), frame is None at the end of the recording
+        """
+        index = self.sequence % len(self.frames) if self.loop and len(self.frames) else self.sequence
+
+        if index >= len(self.frames):
+            return None, None, self.sequence
+
+        self.sequence += 1
+
+        return self.frames[index], float(self.timestamps[index]), self.sequence
+
+    def stop(self):
+        return
@@ -0,0 +1,92 @@
+FULL = "full"
+LANDMARKS_ONLY = "landmarks_only"
+SKIP = "skip"
+
+
+class FrameScheduler:
+    """
+    Decides per frame how much work fits in a target end-to-end latency, from a moving estimate of each stage cost:
+    full recognition, landmarks only (reusing the last gestures), or skipping the frame.
+    """
+
+    def __init__(self, target_latency: float, smoothing: float = 0.1, max_consecutive_skips: int = 2,
+                 max_consecutive_reuses: int = 3):
+        """
+        :param target_latency: target latency from capture to payload, in seconds
+        :param smoothing: weight of the newest measure in the moving averages
+        :param max_consecutive_skips: frames skipped in a row before forcing one through
+        :param max_consecutive_reuses: frames reusing the last gestures in a row before forcing a classification
+        """
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.max_consecutive_skips = max_consecutive_skips
+        self.max_consecutive_reuses = max_consecutive_reuses
+
+        # Moving estimate of each stage cost in seconds, None until measured
+        self.costs = {
+            "landmarks": None,
+            "classification": None,
+        }
+
+        self.counters = {
+            FULL: 0,
+            LANDMARKS_ONLY: 0,
+            SKIP: 0,
+        }
+        self.consecutive_skips = 0
+        self.consecutive_reuses = 0
+
+        # Moving average of the achieved capture to payload latency, in seconds
+        self.latency = None
+        self.over_budget = 0
+
+    def decide(self, frame_age: float) -> str:
+        """
+        Decide what to do with a frame
+        :param frame_age: time elapsed since the frame was captured, in seconds
+        :return: FULL, LANDMARKS_ONLY or SKIP
+        """
+        remaining = self.target_latency - frame_age
+        landmarks_cost = self.costs["landmarks"] or 0
+        classification_cost = self.costs["classification"] or 0
+
+        if remaining < landmarks_cost and self.consecutive_skips < self.max_consecutive_skips:
+            decision = SKIP
+        elif remaining < landmarks_cost + classification_cost and self.consecutive_reuses < self.max_consecutive_reuses:
+            decision = LANDMARKS_ONLY
+        else:
+            decision = FULL
+
+        self.consecutive_skips = self.consecutive_skips + 1 if decision == SKIP else 0
+        self.consecutive_reuses = self.consecutive_reuses + 1 if decision == LANDMARKS_ONLY else 0
+        self.counters[decision] += 1
+
+        return decision
+
+    def average(self, current, value):
+        if current is None:
+            return value
+
+        return current + self.smoothing * (value - current)
+
+    def record(self, stage_durations: dict[str, float], latency: float):
+        """
+        Record the measures of a processed frame
+        :param stage_durations: duration of each stage in seconds, 0 when the stage did not run
+        :param latency: capture to payload latency of the frame, in seconds
+        """
+        for stage, duration in stage_durations.items():
+            if duration:
+                self.costs[stage] = self.average(self.costs.get(stage), duration)
+
+        self.latency = self.average(self.latency, latency)
+
+        if latency > self.target_latency:
+            self.over_budget += 1
+
+    def get_report(self):
+        return {
+            **self.counters,
+            "over_budget": self.over_budget,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+        }
@@ -1,7 +1,7 @@
 import cv2
 
 
-def get_activation_area(frame, face_coords):
+def get_activation_area(face_coords):
     activation_area = (
         face_coords[0] - 400,
         face_coords[1] - 120,
@@ -9,6 +9,10 @@ def get_activation_area(frame, face_coords):
         face_coords[1] + 120,
     )
 
+    return activation_area
+
+
+def draw_activation_area(frame, activation_area):
     cv2.rectangle(
         frame,
         (activation_area[0], activation_area[1]),
@@ -17,4 +21,4 @@ def get_activation_area(frame, face_coords):
         2,
     )
 
-    return activation_area
+    return frame
@@ -13,18 +13,36 @@ class States(Enum):
     CLICK = 6
 
 
+# Gesture expected on the previous step and on the current one to leave each state of a click (palm, closed, palm,
+# closed, palm), within MAX_HOLDING_SINCE of entering it, and the next state
+TRANSITIONS = {
+    States.FIRST_OPEN: ("palm", "closed", States.FIRST_CLOSED),
+    States.FIRST_CLOSED: ("closed", "palm", States.SECOND_OPEN),
+    States.SECOND_OPEN: ("palm", "closed", States.SECOND_CLOSED),
+    States.SECOND_CLOSED: ("closed", "palm", States.CLICK),
+}
+
+
 class ClickHandler:
-    current_state = States.PENDING
-    previous_state = None
-    state_since = None
+    __slots__ = ("clock", "current_state", "previous_state", "state_since", "current_gesture", "previous_gesture")
+
+    def __init__(self, clock=time.time):
+        """
+        :param clock: function returning the current time in seconds
+        """
+        self.clock = clock
+
+        self.current_state = States.PENDING
+        self.previous_state = None
+        self.state_since = None
 
-    current_gesture = None
-    previous_gesture = None
+        self.current_gesture = None
+        self.previous_gesture = None
 
     def reset_state(self):
         self.current_state = States.PENDING
         self.previous_state = None
-        self.state_since = time.time()
+        self.state_since = self.clock()
 
         self.current_gesture = None
         self.previous_gesture = None
@@ -39,49 +57,30 @@ class ClickHandler:
             self.previous_gesture = self.current_gesture
             self.current_gesture = current_gesture
 
-        current_time = time.time()
-        holding_since = current_time - self.state_since if self.state_since else None
+        current_time = self.clock()
+        # A clock starting at 0 is valid (replays), only None means no state was entered yet
+        holding_since = current_time - self.state_since if self.state_since is not None else None
 
-        if holding_since and holding_since > MAX_HOLDING_SINCE:
+        if holding_since is not None and holding_since > MAX_HOLDING_SINCE:
             self.state_since = current_time
             self.current_state = States.PENDING
 
-        transitions = {
-            States.PENDING: {
-                "condition": current_gesture == "palm",
-                "next_state": States.FIRST_OPEN
-            },
-            States.FIRST_OPEN: {
-                "condition": self.previous_gesture == "palm" and current_gesture == "closed" and holding_since <= MAX_HOLDING_SINCE,
-                "next_state": States.FIRST_CLOSED
-            },
-            States.FIRST_CLOSED: {
-                "condition": self.previous_gesture == "closed" and current_gesture == "palm" and holding_since <= MAX_HOLDING_SINCE,
-                "next_state": States.SECOND_OPEN
-            },
-            States.SECOND_OPEN: {
-                "condition": self.previous_gesture == "palm" and current_gesture == "closed" and holding_since <= MAX_HOLDING_SINCE,
-                "next_state": States.SECOND_CLOSED
-            },
-            States.SECOND_CLOSED: {
-                "condition": self.previous_gesture == "closed" and current_gesture == "palm" and holding_since <= MAX_HOLDING_SINCE,
-                "next_state": States.CLICK
-            },
-            States.CLICK: {
-                "condition": True,
-                "next_state": States.PENDING
-            }
-        }
-
-        if self.current_state not in transitions:
-            self.state_since = current_time
-            self.current_state = States.PENDING
+        if self.current_state == States.PENDING:
+            next_state = States.FIRST_OPEN if current_gesture == "palm" else None
+
+        elif self.current_state == States.CLICK:
+            next_state = States.PENDING
+
+        else:
+            previous_gesture, gesture, next_state = TRANSITIONS[self.current_state]
 
-        transition = transitions[self.current_state]
+            if self.previous_gesture != previous_gesture or current_gesture != gesture or holding_since is None or \
+                    holding_since > MAX_HOLDING_SINCE:
+                next_state = None
 
-        if transition["condition"]:
+        if next_state is not None:
             self.state_since = current_time
-            self.current_state = transition["next_state"]
+            self.current_state = next_state
 
     def is_clicking(self):
         return self.current_state == States.CLICK
@@ -0,0 +1,23 @@
+# Values shared with the consumers of the payloads (see helpers/websockets/protocol.py), without the models imports
+
+# Gestures of the classifier, in the order of its outputs
+LABELS = [
+    "closed",
+    "palm",
+    "point_up",
+    "rock",
+    "victory",
+    "victory_inverted",
+]
+
+# Swipe directions depending on direction
+swipe_directions = {
+    (1, 0): "up",
+    (-1, 0): "down",
+    (0, 1): "right",
+    (0, -1): "left",
+    (1, 1): "up-right",
+    (1, -1): "up-left",
+    (-1, 1): "down-right",
+    (-1, -1): "down-left",
+}
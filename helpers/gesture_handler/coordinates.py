@@ -12,14 +12,15 @@ def get_hand_coordinates(frame_resolution: tuple[int, int], landmarks) -> tuple[
     return coordinates
 
 
-def get_face_coordinates(frame_resolution: tuple[int, int], landmarks) -> tuple[int, int]:
+def get_face_coordinates(frame_resolution: tuple[int, int], landmarks, anchor_index: int = 4) -> tuple[int, int]:
     """
     Get the coordinates of the face based on the landmarks
     :param frame_resolution: the frame resolution
     :param landmarks: face landmarks from mediapipe
+    :param anchor_index: index of the nose in the face landmarks (4 in the face mesh)
     :return: coordinates [x, y] of face
     """
-    landmark = landmarks.landmark[4]  # Nose
+    landmark = landmarks.landmark[anchor_index]  # Nose
     coordinates = (int(landmark.x * frame_resolution[0]), int(landmark.y * frame_resolution[1]))
 
     return coordinates
@@ -36,3 +37,18 @@ def is_hand_in_area_of_activation(hand_coordinates, activation_area):
     x, y = hand_coordinates
 
     return activation_area[0] < x < activation_area[2] and activation_area[1] < y < activation_area[3]
+
+
+def is_near_area_edge(coordinates, area, margin):
+    """
+    Check if a point is closer than margin to the edges of an area, from inside or outside
+    :param coordinates: coordinates of the point
+    :param area: (x_min, y_min, x_max, y_max)
+    :param margin: distance to the edges
+    :return: boolean
+    """
+    x, y = coordinates
+
+    distance = min(x - area[0], area[2] - x, y - area[1], area[3] - y)
+
+    return -margin < distance < margin
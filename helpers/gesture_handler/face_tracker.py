@@ -0,0 +1,110 @@
+from helpers.gesture_handler.coordinates import is_near_area_edge
+
+
+class FaceAnchorTracker:
+    """
+    Keeps the face anchor between face localizations, so the face only has to be located every few frames.
+    Between two localizations the anchor is held, or extrapolated from its last velocity.
+    """
+
+    def __init__(self, refresh_every: int = 1, edge_margin: int = 40, extrapolate: bool = False):
+        """
+        :param refresh_every: locate the face at least every `refresh_every` frames (1 = every frame)
+        :param edge_margin: also locate the face when a hand is closer than this to the activation area edges (px)
+        :param extrapolate: extrapolate the anchor from its last velocity instead of holding it
+        """
+        self.refresh_every = refresh_every
+        self.edge_margin = edge_margin
+        self.extrapolate = extrapolate
+
+        self.anchor = (0, 0)
+        self.measured_anchor = None
+        self.velocity = (0, 0)
+
+        # Number of frames since the face was last located
+        self.age = 0
+
+        # Frames where the face was located, its anchor held and the face lost, and the ages of the anchors used
+        self.located_frames = 0
+        self.held_frames = 0
+        self.lost_frames = 0
+        self.total_age = 0
+        self.max_age = 0
+
+    def needs_refresh(self, hands_coordinates, activation_area) -> bool:
+        """
+        Check if the face has to be located on the next frame
+        :param hands_coordinates: coordinates of the hands on the last frame, (0, 0) when not detected
+        :param activation_area: activation area of the last frame
+        :return: boolean
+        """
+        if self.measured_anchor is None or self.age + 1 >= self.refresh_every:
+            return True
+
+        return any(
+            coords != (0, 0) and is_near_area_edge(coords, activation_area, self.edge_margin)
+            for coords in hands_coordinates
+        )
+
+    def update(self, face_coordinates):
+        """
+        The face was located on this frame
+        :param face_coordinates: coordinates of the face
+        """
+        if self.measured_anchor is not None:
+            frames = self.age + 1
+            self.velocity = (
+                (face_coordinates[0] - self.measured_anchor[0]) / frames,
+                (face_coordinates[1] - self.measured_anchor[1]) / frames,
+            )
+
+        self.anchor = face_coordinates
+        self.measured_anchor = face_coordinates
+        self.age = 0
+
+        self.located_frames += 1
+
+    def hold(self):
+        """
+        The face was not looked for on this frame, reuse the last anchor
+        """
+        if self.measured_anchor is None:
+            return
+
+        self.age += 1
+
+        self.held_frames += 1
+        self.total_age += self.age
+        self.max_age = max(self.max_age, self.age)
+
+        if self.extrapolate:
+            self.anchor = (
+                int(self.measured_anchor[0] + self.velocity[0] * self.age),
+                int(self.measured_anchor[1] + self.velocity[1] * self.age),
+            )
+
+    def lose(self):
+        """
+        The face was looked for on this frame but not found
+        """
+        self.anchor = (0, 0)
+        self.measured_anchor = None
+        self.velocity = (0, 0)
+        self.age = 0
+
+        self.lost_frames += 1
+
+    def get_report(self):
+        """
+        :return: dict with the frames where the face was located, held and lost, and the mean and max age in frames of
+        the anchors used (0 when located on the frame)
+        """
+        anchored_frames = self.located_frames + self.held_frames
+
+        return {
+            "located": self.located_frames,
+            "held": self.held_frames,
+            "lost": self.lost_frames,
+            "mean_age": round(self.total_age / anchored_frames, 2) if anchored_frames else None,
+            "max_age": self.max_age,
+        }
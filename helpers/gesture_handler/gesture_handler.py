@@ -1,123 +1,295 @@
 import time
 
+import cv2
 import numpy as np
-from tensorflow.keras.models import load_model
 
-from helpers.computations import compute_distances_angles_from_wrist
-from helpers.gesture_handler.activation_area import get_activation_area
+from helpers.ai.inference import load_gesture_model
+from helpers.computations import compute_distances_angles_from_wrist_batch, landmarks_to_array
+from helpers.gesture_handler.activation_area import draw_activation_area, get_activation_area
 from helpers.gesture_handler.click_handler import ClickHandler
+from helpers.gesture_handler.constants import LABELS
 from helpers.gesture_handler.coordinates import get_face_coordinates, get_hand_coordinates, \
     is_hand_in_area_of_activation
-from helpers.gesture_handler.landmarks import get_landmarks
+from helpers.gesture_handler.face_tracker import FaceAnchorTracker
+from helpers.gesture_handler.landmarks import get_landmarks, mirror_landmarks
+from helpers.gesture_handler.motion_gate import MotionGate
+from helpers.gesture_handler.roi import get_landmarks_roi, get_roi_input_size, map_landmarks_from_roi
 from helpers.gesture_handler.swipe_handler import SwipeHandler
+from helpers.instrumentation import instrumentation
 from helpers.mediapipe import draw_box, draw_face_pointer, draw_hand_pointer
 from helpers.predictions import get_label
 
 MIN_GESTURE_CONFIDENCE = 0.5
-LABELS = [
-    "closed",
-    "palm",
-    "point_up",
-    "rock",
-    "victory",
-    "victory_inverted",
-]
 
 LOSE_FOCUS_AFTER_SECONDS = 2
 
+INPUT_SIZE = 42
 
-class GestureHandler:
-    swipe_handler = None
-    click_handler = None
-
-    current_action = None
-
-    current_gesture = None
-
-    is_listening_for_swipe = False
-    hand_listened = None
-    hand_pending = {
-        "left_hand": False,
-        "right_hand": False,
-    }
-
-    pending_from = {
-        "left_hand": None,
-        "right_hand": None,
-    }
+HANDS = ["left_hand", "right_hand"]
+HAND_ENCODINGS = {
+    "left_hand": (1, 0),
+    "right_hand": (0, 1),
+}
 
-    no_interaction_since = None
+COORDINATES_KEYS = ["left_hand", "right_hand", "face"]
 
-    landmarks = {
-        "left_hand": None,
-        "right_hand": None,
-        "face": None,
-    }
+NO_GESTURE = ("no_gesture", 0)
 
-    coordinates = {
-        "left_hand": (0, 0),
-        "right_hand": (0, 0),
-        "face": (0, 0),
-    }
 
-    def __init__(self, frame_resolution: tuple[int, int], holistic_model, gesture_model_path,
-                 swipe_sensitivity={"x": 0.25, "y": 0.25}):
+class GestureHandler:
+    # The per-frame state is held by the instance and updated in place: handlers can run side by side in a process
+    __slots__ = (
+        "frame_resolution", "gesture_model", "landmark_model", "clock", "recorder",
+        "swipe_handler", "click_handler", "face_tracker", "motion_gate", "roi_padding", "roi", "roi_buffer",
+        "mirror", "rgb_buffer", "count_copy",
+        "current_action", "current_gesture", "is_listening_for_swipe", "hand_listened", "hand_pending",
+        "pending_from", "no_interaction_since", "landmarks", "coordinates", "gestures", "hand_gestures",
+        "activation_area", "start_time", "stage_durations",
+    )
+
+    def __init__(self, frame_resolution: tuple[int, int], landmark_model, gesture_model_path,
+                 swipe_sensitivity={"x": 0.25, "y": 0.25}, gesture_model_backend="keras", face_refresh_every=1,
+                 roi_padding=0.1, clock=time.time, recorder=None, motion_epsilon=None, max_reuse_age=0.5,
+                 gesture_model=None, mirror=False, face_tracker=None, count_copy=None):
 
         self.current_action = None
+        self.current_gesture = None
         self.frame_resolution = frame_resolution
 
-        self.gesture_model = load_model(gesture_model_path, compile=False)
-        self.holistic_model = holistic_model
+        # Any object with a predict(input_data) method can be given instead of loading the model from its path,
+        # e.g. the classifier shared by the streams of helpers/multi_stream.py
+        if gesture_model is None:
+            gesture_model = load_gesture_model(gesture_model_path, gesture_model_backend)
+
+        self.gesture_model = gesture_model
+        self.landmark_model = landmark_model
 
         self.start_time = None
 
+        # Injectable for deterministic replays
+        self.clock = clock
+        # LandmarkRecorder saving the landmarks of every frame
+        self.recorder = recorder
+
         self.swipe_handler = SwipeHandler(frame_resolution, swipe_sensitivity)
-        self.click_handler = ClickHandler()
+        self.click_handler = ClickHandler(clock)
+        # Any FaceAnchorTracker can be given, e.g. the RecordedFaceTracker of the replays
+        self.face_tracker = face_tracker if face_tracker is not None else FaceAnchorTracker(face_refresh_every)
+        self.roi_padding = roi_padding
+        self.roi = None
+
+        # Mirror the landmarks instead of flipping the frames (selfie view): same result without copying the pixels
+        self.mirror = mirror
+        # RGB conversion of the frames given to the landmark model, grown to the largest frame or region seen
+        self.rgb_buffer = np.empty(0, dtype=np.uint8)
+        # Region of interest scaled down to the pixels of the frame it replaces
+        self.roi_buffer = None
+        # Function counting the bytes of the frame copies, e.g. FramePreprocessor.count_copy (None to not count them)
+        self.count_copy = count_copy
+
+        # Reuse the gesture of a hand holding its pose instead of classifying it again (None to always classify)
+        self.motion_gate = MotionGate(motion_epsilon, max_reuse_age) if motion_epsilon is not None else None
+
+        self.is_listening_for_swipe = False
+        self.hand_listened = None
+        self.hand_pending = {hand: False for hand in HANDS}
+        self.pending_from = {hand: None for hand in HANDS}
+        self.no_interaction_since = None
+
+        self.landmarks = {"left_hand": None, "right_hand": None, "face": None}
+        self.coordinates = {key: (0, 0) for key in COORDINATES_KEYS}
+
+        # (gesture, accuracy) of each hand for the current frame, None until the hands are classified.
+        # When classified, it is hand_gestures, updated in place on each frame
+        self.gestures = None
+        self.hand_gestures = {hand: NO_GESTURE for hand in HANDS}
+
+        self.activation_area = (0, 0, 0, 0)
+
+        # Duration of each stage on the last frame, in seconds
+        self.stage_durations = {
+            "landmarks": 0,
+            "classification": 0,
+        }
 
-    def handle_frame(self, frame):
+    def warm_up(self):
+        """
+        Run the landmark and gesture models once on dummy inputs, so the first camera frame does not pay for their
+        lazy initialization (graph setup, memory allocation, tracing). Nothing is recorded and no state is changed
+        :return: seconds spent
+        """
+        start = time.perf_counter()
+
+        width, height = self.frame_resolution
+        get_landmarks(np.zeros((int(height), int(width), 3), dtype=np.uint8), self.landmark_model)
+
+        # Both batch sizes classify_hands uses, some backends resize their input on a new batch size
+        for num_hands in (1, 2):
+            self.gesture_model.predict(np.zeros((num_hands, INPUT_SIZE), dtype=np.float32))
+
+        return time.perf_counter() - start
+
+    def handle_frame(self, frame, source_frame=None):
         """
         Handle the frame and get the landmarks
         :param frame: OpenCV frame
+        :param source_frame: same image as frame at full resolution. When given, the landmarks are computed on a
+        crop of it around the activation area, or on the whole frame when the face is not tracked
         :return:
         """
-        self.landmarks = get_landmarks(frame, self.holistic_model)
-        self.compute_coordinates()
+        detect_face = self.face_tracker.needs_refresh(
+            (self.coordinates["left_hand"], self.coordinates["right_hand"]), self.activation_area
+        )
+
+        self.roi = None
+        if source_frame is not None and self.face_tracker.measured_anchor is not None:
+            self.roi = get_landmarks_roi(self.activation_area, self.frame_resolution, source_frame.shape,
+                                         self.roi_padding)
+
+        if self.roi is None:
+            self.landmarks = get_landmarks(frame, self.landmark_model, detect_face, self.get_rgb_buffer(frame))
+            self.record_copy(frame)
+        else:
+            if self.mirror:
+                # The activation area is in mirrored coordinates, the source frame is not mirrored
+                x_min, y_min, x_max, y_max = self.roi
+                self.roi = (source_frame.shape[1] - x_max, y_min, source_frame.shape[1] - x_min, y_max)
+
+            x_min, y_min, x_max, y_max = self.roi
+            roi_frame = source_frame[y_min:y_max, x_min:x_max]
+
+            # The landmarks are normalized, the model can get the region at a lower scale
+            input_size = get_roi_input_size(self.roi, self.frame_resolution)
+            if input_size is not None:
+                width, height = input_size
+                if self.roi_buffer is None or self.roi_buffer.shape[:2] != (height, width):
+                    self.roi_buffer = np.empty((height, width) + roi_frame.shape[2:], dtype=roi_frame.dtype)
+
+                roi_frame = cv2.resize(roi_frame, input_size, dst=self.roi_buffer, interpolation=cv2.INTER_AREA)
+                self.record_copy(roi_frame)
+
+            self.landmarks = get_landmarks(roi_frame, self.landmark_model, detect_face, self.get_rgb_buffer(roi_frame))
+            self.record_copy(roi_frame)
+            map_landmarks_from_roi(self.landmarks, self.roi, source_frame.shape)
+
+        if self.mirror:
+            mirror_landmarks(self.landmarks)
+
+        if self.recorder is not None:
+            self.recorder.record(self.clock(), self.landmarks, self.landmark_model.face_anchor_index, detect_face)
+
+        self.gestures = None
+        self.compute_coordinates(detect_face)
         return
 
-    def compute_coordinates(self):
-        self.coordinates = {key: (0, 0) for key in ["left_hand", "right_hand", "face"]}
+    def get_rgb_buffer(self, frame):
+        """
+        :return: uint8 array of the frame shape, a view of rgb_buffer, None without frame
+        """
+        if frame is None:
+            return None
 
-        for key in self.coordinates.keys():
-            if self.landmarks.get(key):
-                if key == "face":
-                    self.coordinates[key] = get_face_coordinates(self.frame_resolution, self.landmarks[key])
-                else:
-                    self.coordinates[key] = get_hand_coordinates(self.frame_resolution, self.landmarks[key])
+        if self.rgb_buffer.size < frame.size:
+            self.rgb_buffer = np.empty(frame.size, dtype=np.uint8)
 
-    def get_gesture(self, hand: str, landmarks):
+        return self.rgb_buffer[:frame.size].reshape(frame.shape)
 
-        if not landmarks:
-            return "no_gesture", 0
+    def record_copy(self, frame):
+        """
+        Count a copy of the size of the frame (RGB conversion, resize, flip) with count_copy
+        """
+        if self.count_copy is not None and frame is not None:
+            self.count_copy(frame.nbytes)
 
-        hand = [1, 0] if hand == "left_hand" else [0, 1]
+    def compute_coordinates(self, detect_face=True):
+        """
+        Compute the hands coordinates and the face anchor from the landmarks
+        :param detect_face: whether the face was looked for on this frame
+        :return:
+        """
+        for hand in HANDS:
+            if self.landmarks.get(hand):
+                self.coordinates[hand] = get_hand_coordinates(self.frame_resolution, self.landmarks[hand])
+            else:
+                self.coordinates[hand] = (0, 0)
 
-        landmarks_distances_and_angles = compute_distances_angles_from_wrist(
-            landmarks.landmark
-        )
+        if self.landmarks.get("face"):
+            self.face_tracker.update(get_face_coordinates(self.frame_resolution, self.landmarks["face"],
+                                                          self.landmark_model.face_anchor_index))
+        elif detect_face:
+            self.face_tracker.lose()
+        else:
+            self.face_tracker.hold()
 
-        input_data = np.concatenate((hand, landmarks_distances_and_angles))
-        input_data = input_data.reshape(1, -1)
+        self.coordinates["face"] = self.face_tracker.anchor
 
-        predictions = self.gesture_model.predict(input_data, verbose=0)
+    def classify_hands(self):
+        """
+        Classify every detected hand of the current frame in a single model call
+        :return: dict of (gesture, accuracy) by hand
+        """
+        start = time.perf_counter()
+
+        self.gestures = self.hand_gestures
+        for hand in HANDS:
+            self.gestures[hand] = NO_GESTURE
+
+        hands = []
+        hands_points = []
+        now = self.clock()
+
+        for hand in HANDS:
+            if not self.landmarks.get(hand):
+                if self.motion_gate:
+                    self.motion_gate.forget(hand)
+                continue
+
+            points = landmarks_to_array(self.landmarks[hand])
+            reused = self.motion_gate.get(hand, points, now) if self.motion_gate else None
+
+            if reused is not None:
+                self.gestures[hand] = reused
+                continue
 
-        accuracy = np.max(predictions)
+            hands.append(hand)
+            hands_points.append(points)
 
-        if accuracy < MIN_GESTURE_CONFIDENCE:
-            return "no_gesture", 0
+        if not hands:
+            return self.gestures
 
-        gesture = get_label(LABELS, predictions[0])
+        with instrumentation.span("features"):
+            points = np.stack(hands_points)
 
-        return gesture, accuracy
+            input_data = np.empty((len(hands), INPUT_SIZE), dtype=np.float32)
+            input_data[:, :2] = [HAND_ENCODINGS[hand] for hand in hands]
+            input_data[:, 2:] = compute_distances_angles_from_wrist_batch(points)
+
+        with instrumentation.span("classification"):
+            predictions = self.gesture_model.predict(input_data)
+
+        for hand, hand_points, hand_predictions in zip(hands, points, predictions):
+            accuracy = np.max(hand_predictions)
+
+            if accuracy >= MIN_GESTURE_CONFIDENCE:
+                self.gestures[hand] = (get_label(LABELS, hand_predictions), accuracy)
+
+            if self.motion_gate:
+                self.motion_gate.store(hand, hand_points, self.gestures[hand], now)
+
+        self.stage_durations["classification"] = time.perf_counter() - start
+
+        return self.gestures
+
+    def get_gesture(self, hand: str):
+        """
+        Get the gesture of a hand for the current frame, both hands are classified on the first call
+        :param hand: "left_hand" or "right_hand"
+        :return: (gesture, accuracy)
+        """
+        if self.gestures is None:
+            self.classify_hands()
+
+        return self.gestures[hand]
 
     def draw_pointers(self, frame, activation_area=None):
         for key, coords in self.coordinates.items():
@@ -128,52 +300,60 @@ class GestureHandler:
                 activated = is_hand_in_area_of_activation(coords, activation_area)
                 draw_hand_pointer(frame, coords, activated, is_listened)
 
-    def get_listening_hand(self, frame):
+    def draw(self, frame, hand=None):
+        """
+        Draw the debug overlays of the current frame state: activation area, pointers, gesture box and swipe
+        :param frame: OpenCV frame
+        :param hand: the hand listened during this frame
+        :return: frame with the overlays drawn
+        """
+        if self.mirror:
+            # The overlays are in mirrored coordinates: the frame is flipped in place, only when it is drawn
+            cv2.flip(frame, 1, dst=frame)
+            self.record_copy(frame)
+
+        draw_activation_area(frame, self.activation_area)
+        self.draw_pointers(frame, self.activation_area)
+
+        if hand and self.gestures is not None:
+            gesture, accuracy = self.gestures[hand]
+            draw_box(frame, gesture, accuracy, hand, self.landmarks[hand])
+
+            if self.swipe_handler.coords_locked:
+                self.swipe_handler.draw(frame)
+
+        return frame
+
+    def get_listening_hand(self):
         """
         Get the listening hand in activation area
-        :param frame: OpenCV Frame
         :return:
         """
 
         # Compute the area of activation from nose coordinates
-        activation_area = get_activation_area(frame, self.coordinates["face"])
-        self.draw_pointers(frame, activation_area)
-
-        # check if each hand is in the area of activation
-        in_activation_area = {
-            "left_hand": is_hand_in_area_of_activation(
-                self.coordinates["left_hand"], activation_area
-            ),
-            "right_hand": is_hand_in_area_of_activation(
-                self.coordinates["right_hand"], activation_area
-            ),
-        }
+        self.activation_area = activation_area = get_activation_area(self.coordinates["face"])
 
         # if hand is in the area of activation, check for gesture
-        for hand, is_pending in in_activation_area.items():
+        for hand in HANDS:
 
             if self.hand_listened == hand:
                 continue
 
-            if not is_pending:
+            if not is_hand_in_area_of_activation(self.coordinates[hand], activation_area):
                 self.hand_pending[hand] = False
                 self.pending_from[hand] = None
                 continue
 
-            landmarks = self.landmarks[hand]
-
-            gesture = self.get_gesture(
-                hand, landmarks
-            )
+            gesture = self.get_gesture(hand)
 
             if gesture[0] == "palm":
 
                 self.hand_pending[hand] = True
 
                 if not self.pending_from[hand]:
-                    self.pending_from[hand] = time.time()
+                    self.pending_from[hand] = self.clock()
 
-                if time.time() - self.pending_from[hand] > 1:
+                if self.clock() - self.pending_from[hand] > 1:
                     self.hand_listened = hand
                     self.hand_pending[hand] = False
                     self.pending_from[hand] = None
@@ -187,40 +367,33 @@ class GestureHandler:
 
         if not self.no_interaction_since:
             if not self.swipe_handler.coords_locked:
-                self.no_interaction_since = time.time()
+                self.no_interaction_since = self.clock()
 
             if self.hand_listened and self.coordinates[self.hand_listened] == (0, 0):
-                self.no_interaction_since = time.time()
+                self.no_interaction_since = self.clock()
 
             return
 
-        time_without_interaction = time.time() - self.no_interaction_since
+        time_without_interaction = self.clock() - self.no_interaction_since
 
         if time_without_interaction > LOSE_FOCUS_AFTER_SECONDS:
             self.hand_listened = None
             self.no_interaction_since = None
 
             # To avoid having the last gesture remaining at the last swipe seen
-            self.swipe_handler.locked_control_coords = [
-                (0, 0),
-                (0, 0)
-            ]
+            self.swipe_handler.reset_locked_coords()
 
-    def listen(self, frame, hand: str):
+    def listen(self, hand: str):
         """
         Gets actions from user based on their gestures and swipes
-        :param frame: OpenCV frame
         :param hand: the hand currently watched
         :return: action of the user
         """
 
-        landmarks = self.landmarks[hand]
-        gesture, accuracy = self.get_gesture(hand, landmarks)
+        gesture, accuracy = self.get_gesture(hand)
 
         self.current_gesture = gesture
 
-        draw_box(frame, gesture, accuracy, hand, landmarks)
-
         coords_locked = self.swipe_handler.handle_locking(gesture)
         self.update_no_interaction_since()
 
@@ -240,10 +413,67 @@ class GestureHandler:
             return "click"
 
         if coords_locked:
-            self.swipe_handler.draw(frame)
             return "hover_" + self.current_action
 
         # We return the last swipe to be able to catch validated swipes:
         # If the last gesture was "hover_up-left" and the user open his hand, the current gesture will be "none",
         # not the validated "up-left". We keep the last_swipe in a variable to keep it
         return last_swipe
+
+    def recognize(self, frame, source_frame=None, reuse_gestures=False):
+        """
+        Run the whole recognition on a frame: landmarks, listening hand, gesture and action
+        :param frame: OpenCV frame
+        :param source_frame: same image as frame at full resolution, see handle_frame
+        :param reuse_gestures: keep the gestures of the last frame for the hands still detected instead of
+        classifying them again
+        :return: payload to send to the server
+        """
+        last_gestures = self.gestures
+        self.stage_durations["classification"] = 0
+
+        start = time.perf_counter()
+        with instrumentation.span("landmarks"):
+            self.handle_frame(frame, source_frame)
+        self.stage_durations["landmarks"] = time.perf_counter() - start
+
+        if reuse_gestures and last_gestures is not None:
+            self.gestures = last_gestures
+            for hand in HANDS:
+                if not self.landmarks.get(hand):
+                    self.gestures[hand] = NO_GESTURE
+
+        with instrumentation.span("state_machines") as span:
+            payload = self.build_payload()
+            # The gestures are classified on demand by the state machines, in their own stages
+            span.exclude(int(self.stage_durations["classification"] * 1e9))
+
+        return payload
+
+    def build_payload(self):
+        """
+        Update the listening hand and the gesture/swipe/click state machines
+        :return: payload to send to the server
+        """
+        listening_hand = self.get_listening_hand()
+
+        # The payload outlives the frame (queued for the network, read from another thread): it gets copies of the
+        # coordinates and deltas, which are updated in place
+        if not listening_hand:
+            return {
+                "hand": None,
+                "coordinates": self.coordinates.copy(),
+                "gesture": "no_gesture",
+                "deltas": {"x": 0, "y": 0},
+                "action": None,
+            }
+
+        action = self.listen(listening_hand)
+
+        return {
+            "hand": listening_hand,
+            "coordinates": self.coordinates.copy(),
+            "gesture": self.current_gesture,
+            "deltas": self.swipe_handler.deltas.copy(),
+            "action": action,
+        }
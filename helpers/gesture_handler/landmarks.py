@@ -1,26 +1,188 @@
 import cv2
 
+NO_LANDMARKS = {
+    "face": None,
+    "left_hand": None,
+    "right_hand": None,
+}
 
-def get_landmarks(frame, holistics):
+
+class HolisticLandmarks:
+    """
+    Landmarks from the full mediapipe Holistic model (face mesh, pose and hands)
+    """
+    face_anchor_index = 4  # Nose in the face mesh
+
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=0):
+        # mediapipe is imported by the backends only, it is slow to import (and imports TensorFlow when installed)
+        import mediapipe as mp
+
+        self.holistic = mp.solutions.holistic.Holistic(
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            model_complexity=model_complexity,
+        )
+
+    def process(self, frame, detect_face=True):
+        """
+        :param frame: RGB frame
+        :param detect_face: ignored, the face mesh is always part of the Holistic graph
+        :return: landmarks dict
+        """
+        results = self.holistic.process(frame)
+
+        return {
+            "face": results.face_landmarks or None,
+            "left_hand": results.left_hand_landmarks or None,
+            "right_hand": results.right_hand_landmarks or None,
+        }
+
+    def close(self):
+        self.holistic.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class HandsFaceDetectionLandmarks:
+    """
+    Landmarks from mediapipe Hands and the short-range face detector, lighter than Holistic.
+    The face "landmarks" are the 6 detector keypoints.
+    """
+    face_anchor_index = 2  # Nose tip in the face detector keypoints
+
+    # Hands labels the handedness as seen in a mirror, Holistic as seen by the person in the image
+    HANDEDNESS = {
+        "Right": "left_hand",
+        "Left": "right_hand",
+    }
+
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=0):
+        import mediapipe as mp
+
+        self.hands = mp.solutions.hands.Hands(
+            max_num_hands=2,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            model_complexity=model_complexity,
+        )
+        self.face_detection = mp.solutions.face_detection.FaceDetection(
+            model_selection=0,  # Short-range model
+            min_detection_confidence=min_detection_confidence,
+        )
+
+    def process(self, frame, detect_face=True):
+        """
+        :param frame: RGB frame
+        :param detect_face: run the face detector, the face is None otherwise
+        :return: landmarks dict
+        """
+        landmarks = dict(NO_LANDMARKS)
+
+        hands_results = self.hands.process(frame)
+
+        for hand_landmarks, handedness in zip(hands_results.multi_hand_landmarks or [],
+                                              hands_results.multi_handedness or []):
+            hand = self.HANDEDNESS[handedness.classification[0].label]
+
+            if landmarks[hand] is None:
+                landmarks[hand] = hand_landmarks
+
+        if detect_face:
+            landmarks["face"] = self.process_face(frame)
+
+        return landmarks
+
+    def process_face(self, frame):
+        """
+        :param frame: RGB frame
+        :return: keypoints of the most confident face as a landmark list, or None
+        """
+        from mediapipe.framework.formats import landmark_pb2
+
+        face_results = self.face_detection.process(frame)
+
+        if not face_results.detections:
+            return None
+
+        detection = max(face_results.detections, key=lambda d: d.score[0])
+
+        face = landmark_pb2.NormalizedLandmarkList()
+        for keypoint in detection.location_data.relative_keypoints:
+            face.landmark.add(x=keypoint.x, y=keypoint.y)
+
+        return face
+
+    def close(self):
+        self.hands.close()
+        self.face_detection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+LANDMARK_BACKENDS = {
+    "holistic": HolisticLandmarks,
+    "hands_face_detection": HandsFaceDetectionLandmarks,
+}
+
+
+def create_landmark_model(backend: str = "holistic", **kwargs):
+    """
+    Create a landmark model
+    :param backend: one of LANDMARK_BACKENDS
+    :param kwargs: min_detection_confidence, min_tracking_confidence, model_complexity
+    :return: landmark model, to be closed or used as a context manager
+    """
+    if backend not in LANDMARK_BACKENDS:
+        raise ValueError(f"Unknown landmark backend: {backend} (expected one of {list(LANDMARK_BACKENDS)})")
+
+    return LANDMARK_BACKENDS[backend](**kwargs)
+
+
+def get_landmarks(frame, landmark_model, detect_face=True, dst=None):
     """
     Get the mediapipe landmarks from the frame
-    :param frame:
-    :param holistics:
+    :param frame: BGR frame
+    :param landmark_model: one of LANDMARK_BACKENDS
+    :param detect_face: whether the face has to be located, backends may skip it otherwise
+    :param dst: uint8 array of the frame shape the RGB conversion is written into, reused across frames (the
+    models copy their input), a new array when None
     :return: landmarks dict
     """
     if frame is None:
-        return {
-            "face": None,
-            "left_hand": None,
-            "right_hand": None,
-        }
+        return dict(NO_LANDMARKS)
+
+    # Frames played back from a recording are read-only views, leave them read-only
+    writeable = frame.flags.writeable
 
     frame.flags.writeable = False
-    results = holistics.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    frame.flags.writeable = True
+    landmarks = landmark_model.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst), detect_face)
+    frame.flags.writeable = writeable
 
-    return {
-        "face": results.face_landmarks or None,
-        "left_hand": results.left_hand_landmarks or None,
-        "right_hand": results.right_hand_landmarks or None,
-    }
+    return landmarks
+
+
+def mirror_landmarks(landmarks: dict):
+    """
+    Mirror landmarks horizontally in place, as if they were computed on the flipped frame: x becomes 1 - x and the
+    hands are swapped (both backends label the hands from the image, a flipped image swaps them)
+    :param landmarks: landmarks dict
+    :return: landmarks dict
+    """
+    for landmark_list in landmarks.values():
+        if not landmark_list:
+            continue
+
+        for landmark in landmark_list.landmark:
+            landmark.x = 1 - landmark.x
+
+    landmarks["left_hand"], landmarks["right_hand"] = landmarks["right_hand"], landmarks["left_hand"]
+
+    return landmarks
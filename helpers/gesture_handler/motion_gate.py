@@ -0,0 +1,73 @@
+import numpy as np
+
+from helpers.computations import WRIST_INDEX
+
+
+class MotionGate:
+    """
+    Reuses the last classification of a hand while it holds its pose, so the classifier only runs when the hand
+    shape changes. The hand shape is compared relative to the wrist: moving the whole hand does not reclassify it.
+    """
+
+    def __init__(self, epsilon: float = 0.01, max_age: float = 0.5):
+        """
+        :param epsilon: largest landmark displacement relative to the wrist (normalized coordinates) to reuse a result
+        :param max_age: seconds after which a hand is classified again even if it did not move
+        """
+        self.epsilon = epsilon
+        self.max_age = max_age
+
+        # Wrist-relative landmarks, (gesture, accuracy) and time of the last classification of each hand
+        self.shapes = {}
+        self.results = {}
+        self.classified_at = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hand: str, points, timestamp: float):
+        """
+        Get the last result of a hand if it did not move since
+        :param hand: "left_hand" or "right_hand"
+        :param points: array of shape (21, 2) of the hand landmarks on this frame
+        :param timestamp: time of the frame in seconds
+        :return: (gesture, accuracy), None when the hand has to be classified
+        """
+        shape = self.shapes.get(hand)
+
+        if (
+                shape is None
+                or timestamp - self.classified_at[hand] > self.max_age
+                or np.abs(points - points[WRIST_INDEX] - shape).max() > self.epsilon
+        ):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.results[hand]
+
+    def store(self, hand: str, points, result, timestamp: float):
+        """
+        Keep the classification of a hand
+        :param points: array of shape (21, 2) of the hand landmarks classified
+        :param result: (gesture, accuracy)
+        :param timestamp: time of the frame in seconds
+        """
+        self.shapes[hand] = points - points[WRIST_INDEX]
+        self.results[hand] = result
+        self.classified_at[hand] = timestamp
+
+    def forget(self, hand: str):
+        """
+        The hand is not detected anymore
+        """
+        self.shapes.pop(hand, None)
+
+    def get_report(self):
+        total = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
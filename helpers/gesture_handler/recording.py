@@ -0,0 +1,154 @@
+import numpy as np
+
+from helpers.gesture_handler.face_tracker import FaceAnchorTracker
+
+NUM_HAND_LANDMARKS = 21
+HANDS = ["left_hand", "right_hand"]
+
+
+def landmarks_to_points(landmarks, indexes=None):
+    """
+    :param landmarks: mediapipe landmark list or None
+    :param indexes: indexes of the landmarks to keep, all by default
+    :return: float32 array of shape (N, 3), NaN when there are no landmarks
+    """
+    if not landmarks:
+        return None
+
+    landmark = landmarks.landmark
+    indexes = range(len(landmark)) if indexes is None else indexes
+
+    return np.array([(landmark[i].x, landmark[i].y, landmark[i].z) for i in indexes], dtype=np.float32)
+
+
+def points_to_landmarks(points):
+    """
+    :param points: array of shape (N, 3), NaN when there are no landmarks
+    :return: NormalizedLandmarkList or None
+    """
+    if np.isnan(points[0, 0]):
+        return None
+
+    from mediapipe.framework.formats import landmark_pb2
+
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in points.tolist():
+        landmarks.landmark.add(x=x, y=y, z=z)
+
+    return landmarks
+
+
+class LandmarkRecorder:
+    """
+    Records the landmarks of each frame with their timestamp, to replay them without a camera.
+    Only the face anchor is kept from the face landmarks, which is all the GestureHandler uses. Whether the face was
+    looked for is recorded too: a frame without face is a lost face only if it was looked for (see FaceAnchorTracker).
+    """
+
+    def __init__(self):
+        self.timestamps = []
+        self.hands = []
+        self.faces = []
+        self.detect_face = []
+
+    def record(self, timestamp: float, landmarks: dict, face_anchor_index: int, detect_face: bool = True):
+        """
+        :param timestamp: time of the frame in seconds
+        :param landmarks: landmarks dict of the frame
+        :param face_anchor_index: index of the face anchor in the face landmarks
+        :param detect_face: whether the face was looked for on this frame
+        """
+        hands = np.full((len(HANDS), NUM_HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+        for i, hand in enumerate(HANDS):
+            points = landmarks_to_points(landmarks.get(hand))
+            if points is not None:
+                hands[i] = points
+
+        face = landmarks_to_points(landmarks.get("face"), [face_anchor_index])
+
+        self.timestamps.append(timestamp)
+        self.hands.append(hands)
+        self.faces.append(face if face is not None else np.full((1, 3), np.nan, dtype=np.float32))
+        self.detect_face.append(detect_face)
+
+    def save(self, path: str):
+        """
+        Save the recording as a compressed .npz file
+        :param path: path of the file
+        """
+        np.savez_compressed(
+            path,
+            timestamps=np.array(self.timestamps, dtype=np.float64),
+            hands=np.array(self.hands, dtype=np.float32).reshape(-1, len(HANDS), NUM_HAND_LANDMARKS, 3),
+            faces=np.array(self.faces, dtype=np.float32).reshape(-1, 1, 3),
+            detect_face=np.array(self.detect_face, dtype=bool),
+        )
+
+
+def load_recording(path: str):
+    """
+    Load a recording saved by LandmarkRecorder
+    :param path: path of the .npz file
+    :return: (timestamps of shape (N,), hands of shape (N, 2, 21, 3), faces of shape (N, 1, 3),
+    detect_face of shape (N,))
+    """
+    with np.load(path) as recording:
+        timestamps = recording["timestamps"]
+        # Recordings made before the flag was saved looked for the face on every frame
+        detect_face = recording["detect_face"] if "detect_face" in recording else np.ones(len(timestamps), dtype=bool)
+
+        return timestamps, recording["hands"], recording["faces"], detect_face
+
+
+class RecordedLandmarks:
+    """
+    Landmark model replaying a recording, one frame per call whatever the frame given
+    """
+    face_anchor_index = 0  # Only the anchor is recorded
+
+    def __init__(self, hands, faces):
+        self.hands = hands
+        self.faces = faces
+        self.index = 0
+
+    def process(self, frame, detect_face=True):
+        landmarks = {
+            "face": points_to_landmarks(self.faces[self.index]),
+            "left_hand": points_to_landmarks(self.hands[self.index, 0]),
+            "right_hand": points_to_landmarks(self.hands[self.index, 1]),
+        }
+
+        self.index += 1
+
+        return landmarks
+
+    def close(self):
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RecordedFaceTracker(FaceAnchorTracker):
+    """
+    Face anchor tracker looking for the face on the frames it was looked for during the recording, whatever the
+    refresh interval of the recording
+    """
+
+    def __init__(self, detect_face, **kwargs):
+        """
+        :param detect_face: recorded flag of each frame, see load_recording
+        """
+        super().__init__(**kwargs)
+
+        self.detect_face = detect_face
+        self.index = 0
+
+    def needs_refresh(self, hands_coordinates, activation_area) -> bool:
+        detect_face = bool(self.detect_face[self.index])
+        self.index += 1
+
+        return detect_face
@@ -0,0 +1,85 @@
+import math
+
+# Above this fraction of the source frame, the region saves too little to make up for switching the landmark model
+# between the crop and the whole frame (different aspect ratios, the video-mode tracking restarts)
+MAX_ROI_COVERAGE = 0.5
+
+
+def get_landmarks_roi(activation_area, frame_resolution: tuple[int, int], source_shape, padding: float = 0.1,
+                      max_coverage: float = MAX_ROI_COVERAGE):
+    """
+    Compute the region of the source frame to run the landmarks on, around the activation area
+    :param activation_area: activation area in frame coordinates (x_min, y_min, x_max, y_max)
+    :param frame_resolution: resolution of the frame the activation area is expressed in
+    :param source_shape: shape of the source frame, same field of view as the frame at a higher resolution
+    :param padding: padding added on each side, relative to the activation area size
+    :param max_coverage: largest fraction of the source frame area the region can cover
+    :return: (x_min, y_min, x_max, y_max) in source pixels, or None if the region is empty or covers more than
+    max_coverage of the frame (the whole frame is used then)
+    """
+    source_height, source_width = source_shape[:2]
+
+    scale_x = source_width / frame_resolution[0]
+    scale_y = source_height / frame_resolution[1]
+
+    padding_x = (activation_area[2] - activation_area[0]) * padding
+    padding_y = (activation_area[3] - activation_area[1]) * padding
+
+    roi = (
+        max(int((activation_area[0] - padding_x) * scale_x), 0),
+        max(int((activation_area[1] - padding_y) * scale_y), 0),
+        min(int((activation_area[2] + padding_x) * scale_x), source_width),
+        min(int((activation_area[3] + padding_y) * scale_y), source_height),
+    )
+
+    if roi[0] >= roi[2] or roi[1] >= roi[3]:
+        return None
+
+    if (roi[2] - roi[0]) * (roi[3] - roi[1]) > max_coverage * source_width * source_height:
+        return None
+
+    return roi
+
+
+def get_roi_input_size(roi, frame_resolution: tuple[int, int]):
+    """
+    Size the region is resized to before the landmark model, so it gets no more pixels than the frame it replaces
+    :param roi: (x_min, y_min, x_max, y_max) in source pixels
+    :param frame_resolution: resolution of the frame the landmarks are computed on without region
+    :return: (width, height), or None if the region already has fewer pixels
+    """
+    width = roi[2] - roi[0]
+    height = roi[3] - roi[1]
+
+    scale = math.sqrt(frame_resolution[0] * frame_resolution[1] / (width * height))
+    if scale >= 1:
+        return None
+
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+def map_landmarks_from_roi(landmarks: dict, roi, source_shape):
+    """
+    Map landmarks normalized in the region of interest back to landmarks normalized in the whole frame, in place
+    :param landmarks: landmarks dict
+    :param roi: (x_min, y_min, x_max, y_max) in source pixels
+    :param source_shape: shape of the source frame
+    :return: landmarks dict
+    """
+    source_height, source_width = source_shape[:2]
+
+    scale_x = (roi[2] - roi[0]) / source_width
+    scale_y = (roi[3] - roi[1]) / source_height
+    offset_x = roi[0] / source_width
+    offset_y = roi[1] / source_height
+
+    for landmark_list in landmarks.values():
+        if not landmark_list:
+            continue
+
+        for landmark in landmark_list.landmark:
+            landmark.x = offset_x + landmark.x * scale_x
+            landmark.y = offset_y + landmark.y * scale_y
+            landmark.z = landmark.z * scale_x  # z uses the same scale as x
+
+    return landmarks
@@ -1,42 +1,34 @@
 import cv2
 
-# Swipe directions depending on direction
-swipe_directions = {
-    (1, 0): "up",
-    (-1, 0): "down",
-    (0, 1): "right",
-    (0, -1): "left",
-    (1, 1): "up-right",
-    (1, -1): "up-left",
-    (-1, 1): "down-right",
-    (-1, -1): "down-left",
-}
+from helpers.gesture_handler.constants import swipe_directions
 
 
 class SwipeHandler:
-    current_swipe = None
-
-    delta_thresholds = {
-        "x": 0,
-        "y": 0,
-    }
-    deltas = {
-        "x": 0,
-        "y": 0
-
-    }
-    coords_locked = False
-    locked_control_coords = [
-        (0, 0),
-        (0, 0),
-    ]
+    # Per instance state, deltas and locked_control_coords are updated in place on each frame
+    __slots__ = ("current_swipe", "delta_thresholds", "deltas", "coords_locked", "locked_control_coords")
 
     def __init__(self, resolution=(0, 0), sensitivity: dict[str, float] = {"x": 0.25, "y": 0.25}):
+        self.current_swipe = None
 
         self.delta_thresholds = {
             "x": sensitivity["x"] * resolution[0],
             "y": sensitivity["y"] * resolution[1],
         }
+        self.deltas = {
+            "x": 0,
+            "y": 0,
+        }
+
+        self.coords_locked = False
+        # Coordinates of the hand when it closed, and its current coordinates while closed
+        self.locked_control_coords = [
+            (0, 0),
+            (0, 0),
+        ]
+
+    def reset_locked_coords(self):
+        self.locked_control_coords[0] = (0, 0)
+        self.locked_control_coords[1] = (0, 0)
 
     def handle_locking(self, current_gesture: str):
         """
@@ -49,10 +41,7 @@ class SwipeHandler:
 
         if current_gesture == "palm" and self.coords_locked:
             self.coords_locked = False
-            self.locked_control_coords = [
-                (0, 0),
-                (0, 0),
-            ]
+            self.reset_locked_coords()
 
         return self.coords_locked
 
@@ -97,13 +86,10 @@ class SwipeHandler:
 
     def get_current_swipe(self):
 
-        self.deltas = {
-            "x": 0,
-            "y": 0
-        }
-
         # If locked coords are not set, return "none"
         if self.locked_control_coords[0] == (0, 0) or self.locked_control_coords[1] == (0, 0):
+            self.deltas["x"] = 0
+            self.deltas["y"] = 0
             self.current_swipe = "none"
             return self.current_swipe
 
@@ -112,10 +98,8 @@ class SwipeHandler:
         deltaX = self.locked_control_coords[1][0] - self.locked_control_coords[0][0]
         deltaY = self.locked_control_coords[1][1] - self.locked_control_coords[0][1]
 
-        self.deltas = {
-            "x": deltaX,
-            "y": deltaY
-        }
+        self.deltas["x"] = deltaX
+        self.deltas["y"] = deltaY
 
         vertical_swipe_direction = 0
         horizontal_swipe_direction = 0
@@ -0,0 +1,307 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets: 2 ** SUB_BUCKET_BITS buckets per power of two, i.e. about 9% of relative error
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+PERCENTILES = [50, 95, 99]
+
+# Stages of a frame, from the camera to the server
+STAGES = [
+    "capture",
+    "preprocessing",
+    "landmarks",
+    "features",
+    "classification",
+    "state_machines",
+    "serialization",
+    "send",
+]
+
+
+def get_bucket(value: int) -> int:
+    """
+    :param value: duration in nanoseconds
+    :return: index of the log-linear bucket of the value
+    """
+    if value < SUB_BUCKETS:
+        return value
+
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+
+    return (shift + 1) * SUB_BUCKETS + ((value >> shift) & (SUB_BUCKETS - 1))
+
+
+def get_bucket_upper_bound(bucket: int) -> int:
+    if bucket < SUB_BUCKETS:
+        return bucket
+
+    shift = bucket // SUB_BUCKETS - 1
+
+    return ((SUB_BUCKETS + bucket % SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Streaming latency histogram with log-linear buckets: constant memory and O(1) record
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, duration_ns: int):
+        bucket = get_bucket(duration_ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+        self.count += 1
+        self.total += duration_ns
+        if duration_ns > self.max:
+            self.max = duration_ns
+
+    def get_percentile(self, percentile: float) -> int:
+        """
+        :param percentile: between 0 and 100
+        :return: upper bound of the bucket holding the percentile, in nanoseconds
+        """
+        if not self.count:
+            return 0
+
+        rank = percentile / 100 * self.count
+        seen = 0
+
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(get_bucket_upper_bound(bucket), self.max)
+
+        return self.max
+
+    def get_report(self) -> dict:
+        """
+        :return: count, mean, percentiles and max in microseconds
+        """
+        report = {
+            "count": self.count,
+            "mean_us": round(self.total / self.count / 1000, 1) if self.count else 0,
+        }
+
+        for percentile in PERCENTILES:
+            report[f"p{percentile}_us"] = round(self.get_percentile(percentile) / 1000, 1)
+
+        report["max_us"] = round(self.max / 1000, 1)
+
+        return report
+
+
+class Span:
+    """
+    Times a block into the histogram of a stage
+    """
+    __slots__ = ("instrumentation", "name", "start", "excluded")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = 0
+        self.excluded = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def exclude(self, duration_ns: int):
+        """
+        Leave out a part of the block already timed in another stage
+        :param duration_ns: duration in nanoseconds
+        """
+        self.excluded += duration_ns
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.instrumentation.record(self.name, time.perf_counter_ns() - self.start - self.excluded)
+
+
+class NullSpan:
+    """
+    Span doing nothing, returned when the instrumentation is disabled or the call is not sampled
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def exclude(self, duration_ns: int):
+        return
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return
+
+
+NULL_SPAN = NullSpan()
+
+
+class Instrumentation:
+    """
+    Registry of named latency histograms and counters for the hot path.
+
+    Disabled, spans are a shared no-op object and counters are ignored. With sample_every=N, only one call out of N
+    of each span is timed.
+    """
+
+    def __init__(self, enabled: bool = False, sample_every: int = 1):
+        self.enabled = enabled
+        self.sample_every = sample_every
+
+        self.histograms = {}
+        self.counters = {}
+        self.calls = {}
+
+        self.lock = threading.Lock()
+
+    def configure(self, enabled: bool = True, sample_every: int = 1):
+        self.enabled = enabled
+        self.sample_every = sample_every
+
+    def span(self, name: str):
+        """
+        Time a block: `with instrumentation.span("landmarks"): ...`
+        :param name: stage name, see STAGES
+        :return: context manager
+        """
+        if not self.enabled:
+            return NULL_SPAN
+
+        if self.sample_every > 1:
+            calls = self.calls.get(name, 0)
+            self.calls[name] = calls + 1
+
+            if calls % self.sample_every:
+                return NULL_SPAN
+
+        return Span(self, name)
+
+    def record(self, name: str, duration_ns: int):
+        """
+        Record a duration measured elsewhere
+        :param name: stage name
+        :param duration_ns: duration in nanoseconds
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+
+            histogram.record(duration_ns)
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, name: str = None):
+        """
+        Decorator timing every call of a function or coroutine function
+        :param name: stage name, the function name by default
+        """
+
+        def decorator(func):
+            span_name = name or func.__name__
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def get_report(self) -> dict:
+        """
+        :return: dict with the histogram report of each stage, in STAGES order, and the counters
+        """
+        with self.lock:
+            names = sorted(self.histograms, key=lambda n: (STAGES.index(n) if n in STAGES else len(STAGES), n))
+
+            return {
+                "stages": {name: self.histograms[name].get_report() for name in names},
+                "counters": dict(self.counters),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.calls = {}
+
+    def dump(self, path: str):
+        """
+        Write the report as JSON
+        :param path: path of the file, replaced on each dump
+        """
+        with open(path, "w") as f:
+            json.dump(self.get_report(), f, indent=2)
+
+    def start_periodic_dump(self, path: str, interval: float = 10):
+        """
+        Dump the report to a file every `interval` seconds from a daemon thread
+        :return: threading.Event stopping the dumps when set
+        """
+        stopped = threading.Event()
+
+        def dump_loop():
+            while not stopped.wait(interval):
+                self.dump(path)
+
+        threading.Thread(target=dump_loop, name="instrumentation-dump", daemon=True).start()
+
+        return stopped
+
+    def start_http_endpoint(self, port: int = 9100, host: str = "127.0.0.1"):
+        """
+        Serve the report as JSON on http://host:port/ from a daemon thread
+        :return: the server, to shutdown()
+        """
+        instrumentation = self
+
+        class ReportHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(instrumentation.get_report()).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                return
+
+        server = ThreadingHTTPServer((host, port), ReportHandler)
+        threading.Thread(target=server.serve_forever, name="instrumentation-http", daemon=True).start()
+
+        return server
+
+
+# Shared registry, disabled until configured (see INSTRUMENTATION in pipeline.py)
+instrumentation = Instrumentation()
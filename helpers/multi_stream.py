@@ -0,0 +1,471 @@
+"""
+Runs the recognition of several cameras or recorded sources on one box.
+
+Each stream gets its own process: capture, preprocessing, landmark model, GestureHandler state and websocket sender,
+so the landmark stage (the costly one) scales with the number of cores. The gesture classification of every stream
+goes to a single classifier process, which batches the requests pending across streams into one model call.
+Streams report their frame rate and capture to payload latency to the runner, which starts timing the run once every
+stream has started.
+"""
+import asyncio
+import multiprocessing
+import queue
+import signal
+import time
+
+import numpy as np
+
+# Settings shared by the streams, each stream can override them (see MultiStreamRunner)
+DEFAULT_SETTINGS = {
+    "resize_to": None,
+    "resolution": (360, 360),
+    "flip": False,
+    "landmarks_roi": False,
+    "roi_padding": 0.1,
+    "landmark_backend": "holistic",
+    "min_detection_confidence": 0.4,
+    "min_tracking_confidence": 0.2,
+    "model_complexity": 0,
+    "swipe_sensitivity": {"x": 0.075, "y": 0.1},
+    "face_refresh_every": 5,
+    "motion_epsilon": 0.01,
+    "max_reuse_age": 0.5,
+    "loop": False,
+    "queue_size": 2,
+    "send_queue_size": 8,
+}
+
+# Seconds between two reports of a stream
+REPORT_INTERVAL = 5
+
+# Seconds between two checks of the classifier while a stream waits for its predictions
+CLASSIFIER_CHECK_INTERVAL = 0.5
+
+
+class EndOfStream(Exception):
+    pass
+
+
+class ClassifierError(Exception):
+    pass
+
+
+class RemoteGestureModel:
+    """
+    Gesture model of a stream process, forwarding the predictions to the shared classifier process
+    """
+
+    def __init__(self, stream_index: int, requests, responses, classifier_failed):
+        """
+        :param classifier_failed: event set by the runner when the classifier process died
+        """
+        self.stream_index = stream_index
+        self.requests = requests
+        self.responses = responses
+        self.classifier_failed = classifier_failed
+
+    def predict(self, input_data):
+        """
+        :raise ClassifierError: when the classifier process died, its predictions would never come
+        """
+        self.requests.put((self.stream_index, input_data))
+
+        while True:
+            try:
+                return self.responses.get(timeout=CLASSIFIER_CHECK_INTERVAL)
+            except queue.Empty:
+                if self.classifier_failed.is_set():
+                    raise ClassifierError("The classifier process died")
+
+
+def run_classifier(model_path: str, backend: str, requests, responses: list, max_batch_size: int, batch_wait: float,
+                   stats):
+    """
+    Classifier process: answers the prediction requests of the streams, batching the pending ones in one call.
+    Stops on a None request
+    :param requests: queue of (stream index, input rows)
+    :param responses: response queue of each stream
+    :param max_batch_size: maximum number of requests in a batch
+    :param batch_wait: seconds to wait for other requests after the first one of a batch (0 to only take the pending
+    ones)
+    :param stats: queue receiving the batching counters on exit
+    """
+    from helpers.ai.inference import load_gesture_model
+
+    # Interrupts are handled by the runner, which stops the streams first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    model = load_gesture_model(model_path, backend)
+
+    batches = 0
+    batched_requests = 0
+    stopping = False
+
+    while not stopping:
+        request = requests.get()
+        if request is None:
+            break
+
+        pending = [request]
+        deadline = time.perf_counter() + batch_wait
+
+        while len(pending) < max_batch_size:
+            try:
+                request = requests.get(timeout=max(deadline - time.perf_counter(), 0)) if batch_wait else \
+                    requests.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is None:
+                stopping = True
+                break
+
+            pending.append(request)
+
+        predictions = model.predict(np.concatenate([input_data for _, input_data in pending]))
+
+        offset = 0
+        for stream_index, input_data in pending:
+            responses[stream_index].put(predictions[offset:offset + len(input_data)])
+            offset += len(input_data)
+
+        batches += 1
+        batched_requests += len(pending)
+
+    stats.put({
+        "batches": batches,
+        "requests": batched_requests,
+        "mean_batch_size": round(batched_requests / batches, 2) if batches else 0,
+    })
+
+
+def open_source(source, loop: bool = False):
+    """
+    :param source: camera index, raw frame file (.raw, see helpers/frame_recording.py) or video file
+    :param loop: play files back from the start when they end
+    :return: frame source with the read() interface of helpers.camera.SynchronousCapture, the timestamps are capture
+    times from time.perf_counter
+    """
+    import cv2
+
+    from helpers.camera import SynchronousCapture, ThreadedCapture
+    from helpers.frame_recording import RecordedFrames
+
+    if isinstance(source, int):
+        return ThreadedCapture(cv2.VideoCapture(source))
+
+    if source.endswith(".raw"):
+        return LiveRecordedFrames(RecordedFrames(source, loop))
+
+    capture = cv2.VideoCapture(source)
+
+    return SynchronousCapture(LoopingCapture(capture) if loop else capture)
+
+
+class LoopingCapture:
+    """
+    Video file capture rewinding to the first frame when the file ends
+    """
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def read(self):
+        import cv2
+
+        ret, frame = self.capture.read()
+        if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+class LiveRecordedFrames:
+    """
+    Recorded frames played back as a live source: each frame is stamped with the time it is read instead of the
+    timestamp of the recording, which comes from another clock
+    """
+
+    def __init__(self, recorded_frames):
+        self.recorded_frames = recorded_frames
+
+    def start(self):
+        self.recorded_frames.start()
+        return self
+
+    def read(self):
+        frame, _, sequence = self.recorded_frames.read()
+
+        return frame, time.perf_counter(), sequence
+
+    def stop(self):
+        self.recorded_frames.stop()
+
+
+async def stream_main(stream_index: int, stream: dict, requests, responses, reports, started, stop_event,
+                      classifier_failed):
+    from helpers.camera import FramePreprocessor
+    from helpers.gesture_handler.gesture_handler import GestureHandler
+    from helpers.gesture_handler.landmarks import create_landmark_model
+    from helpers.recognition_worker import RecognitionWorker
+    from helpers.websockets.sender import GestureSender
+
+    source = open_source(stream["source"], stream["loop"]).start()
+    frame_preprocessor = FramePreprocessor(stream["resize_to"], stream["resolution"], stream["queue_size"] + 2)
+
+    def get_frame():
+        frame, timestamp, _ = source.read()
+
+        if frame is None:
+            raise EndOfStream()
+
+        frame, source_frame = frame_preprocessor.process(frame)
+
+        return frame, source_frame if stream["landmarks_roi"] else None, timestamp
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+
+        reports.put({
+            "stream": stream_index,
+            "source": str(stream["source"]),
+            "frames": recognition_worker.processed_frames,
+            "fps": round(recognition_worker.processed_frames / elapsed, 1) if elapsed else 0,
+            "latency": recognition_worker.get_latency_report(),
+            "final": final,
+        })
+
+    with create_landmark_model(
+            stream["landmark_backend"],
+            min_detection_confidence=stream["min_detection_confidence"],
+            min_tracking_confidence=stream["min_tracking_confidence"],
+            model_complexity=stream["model_complexity"],
+    ) as landmark_model:
+
+        gesture_handler = GestureHandler(frame_resolution=stream["resolution"],
+                                         landmark_model=landmark_model,
+                                         gesture_model_path=None,
+                                         swipe_sensitivity=stream["swipe_sensitivity"],
+                                         face_refresh_every=stream["face_refresh_every"],
+                                         roi_padding=stream["roi_padding"],
+                                         motion_epsilon=stream["motion_epsilon"],
+                                         max_reuse_age=stream["max_reuse_age"],
+                                         mirror=stream["flip"],
+                                         count_copy=frame_preprocessor.count_copy,
+                                         gesture_model=RemoteGestureModel(stream_index, requests, responses,
+                                                                          classifier_failed))
+
+        recognition_worker = RecognitionWorker(get_frame, gesture_handler, stream["queue_size"])
+        sender = None
+        start = last_report = time.perf_counter()
+
+        try:
+            gesture_handler.warm_up()
+
+            recognition_worker.start()
+            sender = GestureSender(stream["uri"], stream["send_queue_size"]).start() if stream.get("uri") else None
+
+            start = last_report = time.perf_counter()
+            started.set()
+
+            while not stop_event.is_set():
+                _, payload = await recognition_worker.get()
+
+                if sender:
+                    sender.publish(payload)
+
+                if time.perf_counter() - last_report >= REPORT_INTERVAL:
+                    last_report = time.perf_counter()
+                    report()
+
+        except EndOfStream:
+            pass
+
+        except ClassifierError as e:
+            print(f"stream {stream_index}: {e}")
+
+        report(final=True)
+
+        if recognition_worker.thread is not None:
+            await recognition_worker.stop()
+        if sender:
+            await sender.stop()
+
+    source.stop()
+
+
+def run_stream(stream_index: int, stream: dict, requests, responses, reports, started, stop_event, classifier_failed):
+    """
+    Stream process: recognition of one source, until it ends or the stop event is set
+    :param stream: settings of the stream, with its "source" and websocket "uri" (None to not send the payloads)
+    :param requests: prediction requests queue of the classifier process
+    :param responses: prediction responses queue of this stream
+    :param reports: queue receiving the reports of the stream
+    :param started: event set once the stream is warmed up and recognizing frames
+    :param classifier_failed: event set by the runner when the classifier process died
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    asyncio.run(stream_main(stream_index, stream, requests, responses, reports, started, stop_event,
+                            classifier_failed))
+
+
+class MultiStreamRunner:
+    """
+    Starts one process per stream and the shared classifier process, and collects the stream reports
+    """
+
+    def __init__(self, streams: list, model_path: str, backend: str = "numpy", settings: dict = None,
+                 max_batch_size: int = None, batch_wait: float = 0):
+        """
+        :param streams: list of dicts with the "source" (camera index or file path) and the websocket "uri" of each
+        stream, with optional overrides of the settings
+        :param model_path: path of the gesture model
+        :param backend: inference backend of the classifier process, see helpers.ai.inference.BACKENDS
+        :param settings: overrides of DEFAULT_SETTINGS for every stream
+        :param max_batch_size: maximum requests per classifier call, one per stream by default
+        :param batch_wait: seconds the classifier waits for other streams after a request
+        """
+        self.streams = [{**DEFAULT_SETTINGS, **(settings or {}), **stream} for stream in streams]
+        self.model_path = model_path
+        self.backend = backend
+        self.max_batch_size = max_batch_size or len(streams)
+        self.batch_wait = batch_wait
+
+        # Spawned: the landmark models do not survive a fork
+        self.context = multiprocessing.get_context("spawn")
+
+        self.requests = self.context.Queue()
+        self.responses = [self.context.Queue() for _ in self.streams]
+        self.reports = self.context.Queue()
+        # Set by each stream once started, the model loading and warm-up take seconds
+        self.started = [self.context.Event() for _ in self.streams]
+        self.classifier_stats = self.context.Queue()
+        self.stop_event = self.context.Event()
+        # Set when the classifier process died, so the streams stop waiting for their predictions
+        self.classifier_failed = self.context.Event()
+
+        self.classifier = None
+        self.processes = []
+
+        # Latest report of each stream
+        self.stream_reports = {}
+
+    def start(self):
+        self.classifier = self.context.Process(
+            target=run_classifier, name="classifier",
+            args=(self.model_path, self.backend, self.requests, self.responses, self.max_batch_size, self.batch_wait,
+                  self.classifier_stats),
+        )
+        self.classifier.start()
+
+        for stream_index, stream in enumerate(self.streams):
+            process = self.context.Process(
+                target=run_stream, name=f"stream-{stream_index}",
+                args=(stream_index, stream, self.requests, self.responses[stream_index], self.reports,
+                      self.started[stream_index], self.stop_event, self.classifier_failed),
+            )
+            process.start()
+            self.processes.append(process)
+
+        return self
+
+    def poll_reports(self, timeout: float = None) -> list:
+        """
+        Wait for the next stream reports
+        :param timeout: seconds to wait for the first one
+        :return: list of the received reports
+        """
+        received = []
+
+        try:
+            received.append(self.reports.get(timeout=timeout))
+            while True:
+                received.append(self.reports.get_nowait())
+        except queue.Empty:
+            pass
+
+        for report in received:
+            self.stream_reports[report["stream"]] = report
+
+        self.check_classifier()
+
+        return received
+
+    def check_classifier(self):
+        """
+        Let the streams know when the classifier process died: it only exits on the None request of stop()
+        """
+        if not self.classifier.is_alive() and not self.classifier_failed.is_set():
+            self.classifier_failed.set()
+
+    def is_running(self) -> bool:
+        """
+        :return: whether a stream is still running: alive and without its final report (crashed streams never send it)
+        """
+        return any(process.is_alive() and (report is None or not report["final"])
+                   for process, report in zip(self.processes, self.get_stream_reports()))
+
+    def all_started(self) -> bool:
+        """
+        :return: whether every stream started or ended before starting
+        """
+        return all(started.is_set() or not process.is_alive() for started, process in zip(self.started, self.processes))
+
+    def get_stream_reports(self) -> list:
+        return [self.stream_reports.get(stream_index) for stream_index in range(len(self.streams))]
+
+    def run(self, duration: float = None, on_report=None):
+        """
+        Collect the reports until every stream ended or for duration seconds, then stop
+        :param duration: seconds counted from when every stream started, None to run until the sources end
+        :param on_report: function called with each received report
+        :return: dict with the final report of each stream and the classifier batching counters
+        """
+        end = None
+
+        while self.is_running() and (end is None or time.perf_counter() < end):
+            if duration is not None and end is None and self.all_started():
+                end = time.perf_counter() + duration
+
+            # Short polls until the streams started, so the clock starts with them
+            for report in self.poll_reports(timeout=1 if end is not None or duration is None else 0.1):
+                if on_report:
+                    on_report(report)
+
+        return self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+
+        # Final reports of the streams still running
+        for process in self.processes:
+            while process.is_alive():
+                self.poll_reports(timeout=0.1)
+            process.join()
+        self.poll_reports(timeout=0)
+
+        classifier_stats = None
+        if self.classifier.is_alive():
+            self.requests.put(None)
+            classifier_stats = self.classifier_stats.get(timeout=60)
+        self.classifier.join()
+
+        return {
+            "streams": self.get_stream_reports(),
+            "classifier": classifier_stats,
+        }
+
+
+def print_stream_report(report: dict):
+    if report is None:
+        return
+
+    latency = report["latency"]
+    print(f"stream {report['stream']} ({report['source']}): {report['frames']} frames, {report['fps']} fps, "
+          f"latency p50 {latency['p50_us'] / 1000:.1f} ms, p95 {latency['p95_us'] / 1000:.1f} ms, "
+          f"p99 {latency['p99_us'] / 1000:.1f} ms")
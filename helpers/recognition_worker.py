@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+from helpers.frame_scheduler import FULL, LANDMARKS_ONLY, SKIP
+from helpers.instrumentation import LatencyHistogram
+
+
+class RecognitionWorker:
+    """
+    Runs the landmarks and classification stages in a dedicated thread, off the asyncio event loop.
+    Frames and payloads are handed to the event loop through a bounded queue, so the next frame is
+    processed while the previous payload is being sent.
+
+    Debug overlays are only drawn every `preview_every` frames, the other frames are handed over as None.
+    With preview_every=None nothing is ever drawn (headless).
+
+    With a FrameScheduler, frames can be recognized without classification or skipped to stay in its latency budget.
+    """
+
+    def __init__(self, get_frame, gesture_handler, queue_size=2, preview_every=None, scheduler=None):
+        """
+        :param get_frame: function returning (frame, source frame or None, capture timestamp from time.perf_counter),
+        see GestureHandler.handle_frame
+        """
+        self.get_frame = get_frame
+        self.gesture_handler = gesture_handler
+        self.preview_every = preview_every
+        self.scheduler = scheduler
+
+        self.results = asyncio.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.loop = None
+        self.error = None
+
+        self.processed_frames = 0
+        # Capture to payload latency of the recognized frames, see get_latency_report
+        self.latencies = LatencyHistogram()
+        self.latencies_lock = threading.Lock()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.Thread(target=self.run, name="recognition", daemon=True)
+        self.thread.start()
+
+        return self
+
+    def put(self, item):
+        asyncio.run_coroutine_threadsafe(self.results.put(item), self.loop).result()
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                frame, source_frame, timestamp = self.get_frame()
+
+                decision = FULL
+                if self.scheduler:
+                    decision = self.scheduler.decide(time.perf_counter() - timestamp)
+
+                if decision == SKIP:
+                    continue
+
+                payload = self.gesture_handler.recognize(frame, source_frame,
+                                                         reuse_gestures=decision == LANDMARKS_ONLY)
+
+                latency = time.perf_counter() - timestamp
+                if self.scheduler:
+                    self.scheduler.record(self.gesture_handler.stage_durations, latency)
+
+                with self.latencies_lock:
+                    self.latencies.record(int(latency * 1e9))
+
+                preview = None
+                if self.preview_every and self.processed_frames % self.preview_every == 0:
+                    preview = self.gesture_handler.draw(frame, payload["hand"])
+
+                self.processed_frames += 1
+                self.put((preview, payload))
+
+        except Exception as e:
+            self.error = e
+            self.put(None)
+
+    def get_latency_report(self) -> dict:
+        """
+        :return: count, mean, percentiles and max of the capture to payload latency in microseconds
+        """
+        with self.latencies_lock:
+            return self.latencies.get_report()
+
+    async def get(self):
+        """
+        Wait for the next recognized frame
+        :return: (frame with the debug overlays or None, payload)
+        """
+        result = await self.results.get()
+
+        if result is None:
+            raise self.error
+
+        return result
+
+    async def stop(self):
+        self.stop_event.set()
+
+        # Unblock the worker if it is waiting for room in the queue
+        while not self.results.empty():
+            self.results.get_nowait()
+
+        await asyncio.to_thread(self.thread.join)
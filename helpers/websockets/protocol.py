@@ -0,0 +1,212 @@
+import json
+import struct
+import time
+
+from helpers.gesture_handler.constants import LABELS, swipe_directions
+
+# Message types
+KEYFRAME = "keyframe"
+EVENT = "event"
+UPDATE = "update"
+
+MESSAGE_TYPES = [KEYFRAME, EVENT, UPDATE]
+
+# Discrete values, indexed in the binary encoding
+HANDS = [None, "left_hand", "right_hand"]
+# "none" is the label of helpers.predictions.get_label when the prediction is flat, last to keep the other indexes
+GESTURES = ["no_gesture"] + LABELS + ["none"]
+SWIPES = ["none"] + list(swipe_directions.values())
+ACTIONS = [None, "click"] + SWIPES + ["hover_" + swipe for swipe in SWIPES]
+
+COORDINATES_KEYS = ["left_hand", "right_hand", "face"]
+
+# Binary layouts: message type, then discrete state indexes and/or int16 values
+# (x, y of left_hand, right_hand and face, then x, y of the deltas)
+KEYFRAME_STRUCT = struct.Struct("<BBBB8h")
+EVENT_STRUCT = struct.Struct("<BBBB")
+UPDATE_STRUCT = struct.Struct("<B8h")
+
+
+def is_discrete_action(action) -> bool:
+    """
+    Check if an action is a one-off user action (click or validated swipe) rather than a state
+    :param action: action of a payload
+    :return: boolean
+    """
+    return action == "click" or action in swipe_directions.values()
+
+
+def get_values(payload):
+    """
+    Flatten the continuous part of a payload
+    :return: tuple of 8 ints: coordinates of left_hand, right_hand, face, then deltas
+    """
+    coordinates = payload["coordinates"]
+    deltas = payload["deltas"]
+
+    return (
+        *coordinates["left_hand"],
+        *coordinates["right_hand"],
+        *coordinates["face"],
+        deltas["x"],
+        deltas["y"],
+    )
+
+
+def get_discrete_state(payload):
+    return payload["hand"], payload["gesture"], payload["action"]
+
+
+def build_payload(discrete_state, values):
+    hand, gesture, action = discrete_state
+
+    return {
+        "hand": hand,
+        "coordinates": {key: (values[2 * i], values[2 * i + 1]) for i, key in enumerate(COORDINATES_KEYS)},
+        "gesture": gesture,
+        "deltas": {"x": values[6], "y": values[7]},
+        "action": action,
+    }
+
+
+class ChangeOnlyEncoder:
+    """
+    Encodes the payload stream as change-only messages:
+    - "event" when the hand, gesture or action changes
+    - "update" with the coordinates and deltas, delta encoded from the last ones sent, at most `update_rate` per second
+    - "keyframe" with the full state every `keyframe_interval` seconds, so late joiners can resync
+
+    Messages are JSON strings, or bytes with binary=True (see the *_STRUCT layouts).
+    """
+
+    def __init__(self, update_rate: float = 15, keyframe_interval: float = 2, binary: bool = False):
+        self.update_interval = 1 / update_rate
+        self.keyframe_interval = keyframe_interval
+        self.binary = binary
+
+        self.discrete_state = None
+        self.values = None
+
+        self.last_keyframe_time = None
+        self.last_update_time = None
+
+    def encode(self, payload, timestamp=None) -> list:
+        """
+        Encode the payload of a frame
+        :param payload: payload built by GestureHandler.recognize
+        :param timestamp: time of the frame in seconds, time.monotonic() by default
+        :return: list of messages to send, often empty
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+
+        discrete_state = get_discrete_state(payload)
+        values = get_values(payload)
+
+        if self.last_keyframe_time is None or timestamp - self.last_keyframe_time >= self.keyframe_interval:
+            self.discrete_state = discrete_state
+            self.values = values
+            self.last_keyframe_time = timestamp
+            self.last_update_time = timestamp
+
+            return [self.encode_keyframe(discrete_state, values)]
+
+        messages = []
+
+        if discrete_state != self.discrete_state:
+            self.discrete_state = discrete_state
+            messages.append(self.encode_event(discrete_state))
+
+        if values != self.values and timestamp - self.last_update_time >= self.update_interval:
+            differences = tuple(value - last_value for value, last_value in zip(values, self.values))
+
+            self.values = values
+            self.last_update_time = timestamp
+            messages.append(self.encode_update(differences))
+
+        return messages
+
+    def encode_keyframe(self, discrete_state, values):
+        if self.binary:
+            return KEYFRAME_STRUCT.pack(MESSAGE_TYPES.index(KEYFRAME), *encode_discrete_state(discrete_state), *values)
+
+        return json.dumps({"type": KEYFRAME, **build_payload(discrete_state, values)})
+
+    def encode_event(self, discrete_state):
+        if self.binary:
+            return EVENT_STRUCT.pack(MESSAGE_TYPES.index(EVENT), *encode_discrete_state(discrete_state))
+
+        hand, gesture, action = discrete_state
+
+        return json.dumps({"type": EVENT, "hand": hand, "gesture": gesture, "action": action})
+
+    def encode_update(self, differences):
+        if self.binary:
+            return UPDATE_STRUCT.pack(MESSAGE_TYPES.index(UPDATE), *differences)
+
+        return json.dumps({"type": UPDATE, "d": differences}, separators=(",", ":"))
+
+
+def encode_discrete_state(discrete_state):
+    hand, gesture, action = discrete_state
+
+    return HANDS.index(hand), GESTURES.index(gesture), ACTIONS.index(action)
+
+
+def decode_discrete_state(indexes):
+    hand, gesture, action = indexes
+
+    return HANDS[hand], GESTURES[gesture], ACTIONS[action]
+
+
+class ChangeOnlyDecoder:
+    """
+    Rebuilds the payloads from the messages of a ChangeOnlyEncoder, for consumers of the protocol
+    """
+
+    def __init__(self):
+        self.discrete_state = None
+        self.values = None
+
+    def decode(self, message):
+        """
+        Apply a message
+        :param message: JSON string or bytes
+        :return: the current payload, None until the first keyframe
+        """
+        if isinstance(message, bytes):
+            self.decode_binary(message)
+        else:
+            self.decode_json(json.loads(message))
+
+        if self.discrete_state is None:
+            return None
+
+        return build_payload(self.discrete_state, self.values)
+
+    def decode_json(self, message):
+        message_type = message["type"]
+
+        if message_type == KEYFRAME:
+            self.discrete_state = get_discrete_state(message)
+            self.values = get_values(message)
+
+        elif message_type == EVENT and self.discrete_state is not None:
+            self.discrete_state = get_discrete_state(message)
+
+        elif message_type == UPDATE and self.values is not None:
+            self.values = tuple(value + difference for value, difference in zip(self.values, message["d"]))
+
+    def decode_binary(self, message):
+        message_type = MESSAGE_TYPES[message[0]]
+
+        if message_type == KEYFRAME:
+            unpacked = KEYFRAME_STRUCT.unpack(message)
+            self.discrete_state = decode_discrete_state(unpacked[1:4])
+            self.values = unpacked[4:]
+
+        elif message_type == EVENT and self.discrete_state is not None:
+            self.discrete_state = decode_discrete_state(EVENT_STRUCT.unpack(message)[1:])
+
+        elif message_type == UPDATE and self.values is not None:
+            differences = UPDATE_STRUCT.unpack(message)[1:]
+            self.values = tuple(value + difference for value, difference in zip(self.values, differences))
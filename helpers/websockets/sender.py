@@ -0,0 +1,127 @@
+import asyncio
+from collections import deque
+
+import websockets
+
+from helpers.websockets.protocol import is_discrete_action
+from helpers.websockets.websockets import connect, send_gesture
+
+
+class GestureSender:
+    """
+    Sends the payloads from its own task so recognition never waits for the network.
+
+    Payloads are queued in a bounded queue: when it is full, the oldest payload without a discrete action
+    (click, validated swipe) is dropped, as it is superseded by the newer ones. Discrete actions are only dropped,
+    oldest first, when the queue holds nothing else.
+    The connection is reestablished in the background with an exponential backoff, then the latest state is replayed.
+    """
+
+    def __init__(self, uri, queue_size=8, encoder_factory=None, retry_delay=0.5, max_retry_delay=10):
+        """
+        :param uri: websocket URI
+        :param queue_size: payloads waiting to be sent before superseded ones get dropped
+        :param encoder_factory: function creating the encoder of a new connection (e.g. ChangeOnlyEncoder),
+        payloads are sent as JSON when None
+        :param retry_delay: seconds before the first reconnection attempt
+        :param max_retry_delay: maximum seconds between two reconnection attempts
+        """
+        self.uri = uri
+        self.queue_size = queue_size
+        self.encoder_factory = encoder_factory
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self.queue = deque()
+        self.queue_not_empty = asyncio.Event()
+        self.latest_payload = None
+
+        self.websocket = None
+        self.task = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.dropped_actions = 0
+        self.reconnects = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    def publish(self, payload):
+        """
+        Queue a payload without waiting
+        :param payload: payload built by GestureHandler.recognize
+        """
+        self.latest_payload = payload
+
+        self.queue.append(payload)
+        self.drop_superseded()
+        self.queue_not_empty.set()
+
+    def drop_superseded(self):
+        """
+        Drop payloads until the queue fits in queue_size
+        """
+        while len(self.queue) > self.queue_size:
+            for queued in self.queue:
+                if not is_discrete_action(queued["action"]):
+                    self.queue.remove(queued)
+                    self.dropped += 1
+                    break
+            else:
+                # Only discrete actions are waiting: the network is too far behind, the oldest one is lost
+                self.queue.popleft()
+                self.dropped_actions += 1
+
+    async def next_payload(self):
+        while not self.queue:
+            self.queue_not_empty.clear()
+            await self.queue_not_empty.wait()
+
+        return self.queue.popleft()
+
+    async def run(self):
+        while True:
+            self.websocket = await connect(self.uri, self.retry_delay, self.max_retry_delay)
+            encoder = self.encoder_factory() if self.encoder_factory else None
+
+            # Replay the latest state so the server does not keep the one from before the disconnection
+            if not self.queue and self.latest_payload is not None:
+                self.queue.append(self.latest_payload)
+
+            payload = None
+            try:
+                while True:
+                    payload = await self.next_payload()
+                    await send_gesture(self.websocket, payload, encoder)
+                    self.sent += 1
+                    payload = None
+
+            except websockets.ConnectionClosed:
+                print("Connection lost. Reconnecting...")
+                self.reconnects += 1
+
+                if payload is not None:
+                    self.queue.appendleft(payload)
+                    self.drop_superseded()
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    def get_counters(self):
+        return {
+            "queue_depth": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "dropped_actions": self.dropped_actions,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,176 @@
+import asyncio
+import socket
+from collections import deque
+
+import websockets
+
+from helpers.instrumentation import instrumentation
+from helpers.websockets.websockets import serialize_gesture
+
+# Close code sent to the evicted clients: "try again later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Bytes buffered by the transport and by the kernel for a client before sends wait for it. Kept small so a slow client
+# fills its own message buffer, and gets evicted, instead of piling up seconds of messages in the socket buffers
+WRITE_LIMIT = 4096
+SOCKET_SEND_BUFFER = 8192
+
+
+class Subscriber:
+    """
+    Connection of a client to the GestureServer, with its own bounded buffer of messages waiting to be sent
+    """
+
+    def __init__(self, connection, buffer_size):
+        self.connection = connection
+        self.buffer_size = buffer_size
+
+        self.buffer = deque()
+        self.buffer_not_empty = asyncio.Event()
+        self.evicted = False
+
+        self.sent = 0
+
+    def push(self, messages: list) -> bool:
+        """
+        Queue messages without waiting
+        :return: True if the buffer overflowed and the client got evicted by these messages
+        """
+        if self.evicted:
+            return False
+
+        if len(self.buffer) + len(messages) > self.buffer_size:
+            # Messages are not dropped: with the change-only protocols every update is a delta of the previous one
+            self.evicted = True
+            self.buffer.clear()
+        else:
+            self.buffer.extend(messages)
+
+        self.buffer_not_empty.set()
+
+        return self.evicted
+
+    async def run(self):
+        """
+        Send the buffered messages until the client disconnects or is evicted
+        """
+        try:
+            while True:
+                while not self.buffer and not self.evicted:
+                    self.buffer_not_empty.clear()
+                    await self.buffer_not_empty.wait()
+
+                if self.evicted:
+                    await self.connection.close(SLOW_CONSUMER_CLOSE_CODE, "slow consumer")
+                    return
+
+                message = self.buffer.popleft()
+                with instrumentation.span("send"):
+                    await self.connection.send(message)
+                self.sent += 1
+
+        except websockets.ConnectionClosed:
+            return
+
+
+class GestureServer:
+    """
+    Serves the payloads to every connected client, instead of sending them to a single server like GestureSender.
+
+    Each payload is serialized once and the same messages are queued for every client. Clients have their own bounded
+    buffer: a client that cannot keep up with the frame rate overflows it and is disconnected (close code 1013), it
+    can reconnect. New clients first receive the latest state: the last JSON payload, or a keyframe with the
+    change-only protocols.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, buffer_size=8, encoder=None):
+        """
+        :param host: interface to listen on, local clients only by default ("0.0.0.0" for every interface)
+        :param port: port to listen on, clients connect to ws://host:port/
+        :param buffer_size: messages waiting for a client before it is evicted
+        :param encoder: ChangeOnlyEncoder shared by every client, payloads are sent as JSON when None
+        """
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.encoder = encoder
+
+        self.server = None
+        self.subscribers = set()
+        # Last JSON message, sent to new clients
+        self.latest_message = None
+
+        self.published = 0
+        self.connections = 0
+        self.evicted = 0
+
+    async def start(self):
+        # No per-message compression: it is stateful per connection, the messages would be compressed once per client
+        self.server = await websockets.serve(self.handle_client, self.host, self.port, compression=None,
+                                             write_limit=WRITE_LIMIT)
+        return self
+
+    async def handle_client(self, connection):
+        connection.transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                                                  SOCKET_SEND_BUFFER)
+
+        subscriber = Subscriber(connection, self.buffer_size)
+        self.connections += 1
+
+        join_message = self.get_join_message()
+        if join_message is not None:
+            subscriber.push([join_message])
+
+        self.subscribers.add(subscriber)
+
+        # The send loop only sees a disconnection when it sends, an idle client is removed when its connection closes
+        sending = asyncio.create_task(subscriber.run())
+        closing = asyncio.create_task(connection.wait_closed())
+        try:
+            await asyncio.wait([sending, closing], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sending.cancel()
+            closing.cancel()
+            self.subscribers.discard(subscriber)
+
+    def get_join_message(self):
+        if self.encoder is None:
+            return self.latest_message
+
+        if self.encoder.discrete_state is None:
+            return None
+
+        # Keyframe of the state the next deltas are computed from
+        return self.encoder.encode_keyframe(self.encoder.discrete_state, self.encoder.values)
+
+    def publish(self, payload):
+        """
+        Serialize a payload once and queue its messages for every client, without waiting
+        :param payload: payload built by GestureHandler.recognize
+        """
+        messages = serialize_gesture(payload, self.encoder)
+        self.published += 1
+
+        if not messages:
+            return
+
+        if self.encoder is None:
+            self.latest_message = messages[-1]
+
+        for subscriber in self.subscribers:
+            if subscriber.push(messages):
+                self.evicted += 1
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def get_counters(self):
+        return {
+            "clients": len(self.subscribers),
+            "connections": self.connections,
+            "published": self.published,
+            "evicted": self.evicted,
+            "max_buffer_depth": max((len(subscriber.buffer) for subscriber in self.subscribers), default=0),
+        }
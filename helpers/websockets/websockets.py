@@ -3,8 +3,17 @@ import json
 
 import websockets
 
+from helpers.instrumentation import instrumentation
 
-async def connect(uri):
+
+async def connect(uri, retry_delay=1, max_retry_delay=1):
+    """
+    Connect to the server, retrying until it answers
+    :param uri: websocket URI
+    :param retry_delay: seconds before the first retry
+    :param max_retry_delay: the delay doubles after each failed attempt up to this value
+    :return: websocket connection
+    """
     while True:
         try:
             print("Connecting to server...")
@@ -13,9 +22,30 @@ async def connect(uri):
             return websocket
         except Exception as e:
             print(f"Failed to connect to server: {e}")
-            print("Retrying in 1 seconds...")
-            await asyncio.sleep(1)  # Attendre avant de tenter de se reconnecter
+            print(f"Retrying in {retry_delay} seconds...")
+            await asyncio.sleep(retry_delay)  # Attendre avant de tenter de se reconnecter
+            retry_delay = min(retry_delay * 2, max_retry_delay)
+
+
+def serialize_gesture(gesture: dict, encoder=None) -> list:
+    """
+    :param gesture: payload built by GestureHandler.recognize
+    :param encoder: ChangeOnlyEncoder, the whole payload is serialized as JSON when None
+    :return: list of messages to send
+    """
+    with instrumentation.span("serialization"):
+        return [json.dumps(gesture)] if encoder is None else encoder.encode(gesture)
+
 
+async def send_gesture(websocket, gesture: dict, encoder=None):
+    """
+    Send the payload of a frame
+    :param websocket: websocket connection
+    :param gesture: payload built by GestureHandler.recognize
+    :param encoder: ChangeOnlyEncoder, the whole payload is sent as JSON when None
+    """
+    messages = serialize_gesture(gesture, encoder)
 
-async def send_gesture(websocket, gesture: dict):
-    await websocket.send(json.dumps(gesture))
+    for message in messages:
+        with instrumentation.span("send"):
+            await websocket.send(message)
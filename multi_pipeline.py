@@ -0,0 +1,37 @@
+from helpers.multi_stream import MultiStreamRunner, print_stream_report
+
+# One process per stream: a camera index, a video file or a raw frame file (see helpers/frame_recording.py),
+# with its own websocket channel (None to not send the payloads). Any key of SETTINGS can be overridden per stream
+STREAMS = [
+    {"source": 0, "uri": "ws://localhost:8000/ws/swipes/0"},
+    {"source": 1, "uri": "ws://localhost:8000/ws/swipes/1"},
+]
+
+# Shared by the streams, see helpers.multi_stream.DEFAULT_SETTINGS
+SETTINGS = {
+    "resize_to": (1000, 1000),
+    "resolution": (360, 360),
+    "landmarks_roi": True,
+    "model_complexity": 0,
+    "landmark_backend": "holistic",
+}
+
+MODEL_NAME = "March28"
+MODEL_PATH = f"./models/{MODEL_NAME}/{MODEL_NAME}.keras"
+MODEL_BACKEND = "numpy"
+
+# Seconds the shared classifier waits for the other streams before classifying a request (0: batch the pending ones)
+BATCH_WAIT = 0
+
+if __name__ == "__main__":
+    runner = MultiStreamRunner(STREAMS, MODEL_PATH, MODEL_BACKEND, SETTINGS, batch_wait=BATCH_WAIT).start()
+
+    try:
+        report = runner.run(on_report=print_stream_report)
+    except KeyboardInterrupt:
+        print("Stop")
+        report = runner.stop()
+
+    for stream_report in report["streams"]:
+        print_stream_report(stream_report)
+    print(f"Classifier: {report['classifier']}")
@@ -1,32 +1,77 @@
 import asyncio
 
 import cv2
-import mediapipe as mp
-import websockets
 
-from helpers.camera import close_camera, flip_frame, frame_preprocessing, get_close_event, read_frame, show_frame
+from helpers.camera import FramePreprocessor, SynchronousCapture, ThreadedCapture, close_camera, flip_frame, \
+    get_close_event, show_frame
+from helpers.frame_recording import FrameRecorder
+from helpers.frame_scheduler import FrameScheduler
 from helpers.gesture_handler.gesture_handler import GestureHandler
-from helpers.websockets.websockets import connect, send_gesture
+from helpers.gesture_handler.landmarks import create_landmark_model
+from helpers.gesture_handler.recording import LandmarkRecorder
+from helpers.instrumentation import instrumentation
+from helpers.recognition_worker import RecognitionWorker
+from helpers.websockets.protocol import ChangeOnlyEncoder
+from helpers.websockets.sender import GestureSender
+from helpers.websockets.server import GestureServer
 
 MIN_DETECTION_CONFIDENCE = 0.4
 MIN_PRESENCE_CONFIDENCE = 0.4
 NUM_HANDS = 1
 MIN_TRACKING_CONFIDENCE = 0.2
 
-mp_holistic = mp.solutions.holistic
-mp_drawing = mp.solutions.drawing_utils
-
 BOX_MARGIN = 24
 
 DEBUG = False
-FRAMERATE = 48
 
+# No overlay drawing, no display window (kiosk boxes without a monitor)
+HEADLESS = False
+# Draw and display one frame out of PREVIEW_EVERY when not headless
+PREVIEW_EVERY = 1
+FRAMERATE = 48  # Only used by the synchronous capture, the threaded capture follows the camera
+
+# Read the camera in a background thread and always process the newest frame
+THREADED_CAPTURE = True
+
+# Selfie view: the landmarks are mirrored, the frames are not flipped
 FLIP_CAMERA = False
 
+# Save the landmarks of every frame to replay them with benchmarks/replay.py (None to disable)
+RECORD_LANDMARKS_PATH = None  # "./recordings/session.npz"
+
+# Save the preprocessed frames to a raw file, played back by benchmarks.landmark_backends --frames-file (None to disable)
+RECORD_FRAMES_PATH = None  # "./recordings/session.raw"
+
+# Latency histograms of each stage (capture, preprocessing, landmarks, ... send)
+INSTRUMENTATION = False
+INSTRUMENTATION_SAMPLE_EVERY = 1  # Time one frame out of N
+INSTRUMENTATION_DUMP_PATH = "./logs/instrumentation.json"  # Rewritten every INSTRUMENTATION_DUMP_INTERVAL seconds
+INSTRUMENTATION_DUMP_INTERVAL = 10
+INSTRUMENTATION_PORT = None  # Also serve the report on http://127.0.0.1:<port>/ (None to disable)
+
+# Frames recognized ahead of the websocket sender
+RECOGNITION_QUEUE_SIZE = 2
+
+# Target capture to payload latency in seconds, frames are classified less or skipped to meet it (None to disable)
+TARGET_LATENCY = 0.05
+
 MODEL_NAME = "March28"
 MODEL_PATH = f"./models/{MODEL_NAME}/{MODEL_NAME}.keras"
+# "keras" | "numpy" | "tflite" | "tflite_int8", the tflite backends need `python -m helpers.ai.tflite` first, and again
+# after the model is retrained
+MODEL_BACKEND = "numpy"
+# Run the models once on dummy inputs before the first frame (see benchmarks/startup.py)
+WARM_UP = True
+
+# Reuse the gesture of a hand that did not move by more than MOTION_EPSILON (normalized, relative to the wrist),
+# for at most MAX_GESTURE_REUSE_AGE seconds (None to classify every frame)
+MOTION_EPSILON = 0.01
+MAX_GESTURE_REUSE_AGE = 0.5
 
 MP_MODEL_COMPLEXITY = 0
+LANDMARK_BACKEND = "holistic"  # "holistic" | "hands_face_detection"
+# Locate the face every N frames only, the anchor is held in between (Holistic always locates it)
+FACE_REFRESH_EVERY = 5
 
 SWIPE_SENSITIVITY = {"x": 0.075, "y": 0.1}
 
@@ -34,78 +79,173 @@ SWIPE_SENSITIVITY = {"x": 0.075, "y": 0.1}
 
 WEBSOCKET_URI = "ws://localhost:8000/ws/swipes"
 
+# Serve the payloads to any number of clients on ws://<SERVER_HOST>:<SERVER_PORT>/ instead of sending them to
+# WEBSOCKET_URI (None to disable). A client more than SERVER_BUFFER_SIZE messages behind is disconnected.
+# The payloads are not authenticated: only local clients can connect unless SERVER_HOST is set to "0.0.0.0"
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = None  # 8765
+SERVER_BUFFER_SIZE = 16
+
+# "json": whole payload every frame, "changes": change-only JSON messages, "changes_binary": change-only binary messages
+PROTOCOL = "json"
+COORDINATES_UPDATE_RATE = 15  # Coordinates and deltas updates per second with the change-only protocols
+KEYFRAME_INTERVAL = 2  # Seconds between two full states with the change-only protocols
+SEND_QUEUE_SIZE = 8  # Payloads waiting for the network before superseded ones are dropped
+
 capture = cv2.VideoCapture(0)
+capture_source = ThreadedCapture(capture) if THREADED_CAPTURE else SynchronousCapture(capture, FRAMERATE)
 
 # RESOLUTION = (capture.get(cv2.CAP_PROP_FRAME_WIDTH), capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
 RESIZE_TO = (1000, 1000)  # (800, 800)
 RESOLUTION = (360, 360)  # (800, 800)  # (1280, 720)
 
+# Compute the landmarks on a full resolution crop around the activation area instead of the resized frame. The crop
+# is scaled down to the pixels of RESOLUTION and skipped when it covers more than half of the frame (see
+# helpers/gesture_handler/roi.py): the 800 px wide activation area only leaves room for it from about 1280x720
+LANDMARKS_ROI = True
+ROI_PADDING = 0.1
+
+frame_recorder = FrameRecorder(RECORD_FRAMES_PATH) if RECORD_FRAMES_PATH else None
+
+# Frames in flight: queued for the event loop, being recognized and being displayed
+frame_preprocessor = FramePreprocessor(RESIZE_TO, RESOLUTION, buffers=RECOGNITION_QUEUE_SIZE + 2)
+
 
 def handle_frame():
     """
-    Function that gets frame from camera and preprocess it (resize, rescale, flip)
-    :return: The preprocessed frame
+    Function that gets frame from camera and preprocess it (crop, resize)
+    :return: The preprocessed frame, with LANDMARKS_ROI the full resolution frame it was resized from,
+    and the capture timestamp
     """
-    frame = read_frame(capture, FRAMERATE)
-    frame = frame_preprocessing(frame, RESIZE_TO, RESOLUTION, FLIP_CAMERA)
+    with instrumentation.span("capture"):
+        frame, timestamp, _ = capture_source.read()
+
+    with instrumentation.span("preprocessing"):
+        frame, source_frame = frame_preprocessor.process(frame)
+
+    if frame_recorder:
+        frame_recorder.write(frame, timestamp)
 
-    return frame
+    return frame, source_frame if LANDMARKS_ROI else None, timestamp
 
 
 async def main():
-    with mp_holistic.Holistic(
+    instrumentation_dump = None
+    instrumentation_server = None
+
+    if INSTRUMENTATION:
+        instrumentation.configure(sample_every=INSTRUMENTATION_SAMPLE_EVERY)
+        instrumentation_dump = instrumentation.start_periodic_dump(INSTRUMENTATION_DUMP_PATH,
+                                                                   INSTRUMENTATION_DUMP_INTERVAL)
+        if INSTRUMENTATION_PORT:
+            instrumentation_server = instrumentation.start_http_endpoint(INSTRUMENTATION_PORT)
+
+    capture_source.start()
+
+    with create_landmark_model(
+            LANDMARK_BACKEND,
             min_detection_confidence=MIN_DETECTION_CONFIDENCE,
             min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
             model_complexity=MP_MODEL_COMPLEXITY,
-    ) as holistic:
+    ) as landmark_model:
 
         gesture_handler = GestureHandler(frame_resolution=RESOLUTION,
-                                         holistic_model=holistic,
+                                         landmark_model=landmark_model,
                                          gesture_model_path=MODEL_PATH,
-                                         swipe_sensitivity=SWIPE_SENSITIVITY)
-
-        while True:
-            websocket = await connect(WEBSOCKET_URI)
-            try:
-                while True:
-                    frame = handle_frame()
-
-                    gesture_handler.handle_frame(frame)
-                    listening_hand = gesture_handler.get_listening_hand(frame)
-
-                    payload = {
-                        "hand": None,
-                        "coordinates": gesture_handler.coordinates,
-                        "gesture": "no_gesture",
-                        "deltas": {"x": 0, "y": 0},
-                        "action": None,
-                    }
-
-                    if listening_hand:
-                        action = gesture_handler.listen(frame, listening_hand)
-
-                        payload = {
-                            "hand": listening_hand,
-                            "coordinates": gesture_handler.coordinates,
-                            "gesture": gesture_handler.current_gesture,
-                            "deltas": gesture_handler.swipe_handler.deltas,
-                            "action": action,
-                        }
-
-                    await send_gesture(websocket, payload)
-                    frame = flip_frame(frame)
-                    show_frame(frame, "hand gesture recognition")
-
-                    if get_close_event():
-                        print("Stop")
-                        break
-
-            except websockets.ConnectionClosed:
-                print("Connection lost. Reconnecting...")
-                continue
-
-    close_camera(capture)
+                                         swipe_sensitivity=SWIPE_SENSITIVITY,
+                                         gesture_model_backend=MODEL_BACKEND,
+                                         face_refresh_every=FACE_REFRESH_EVERY,
+                                         roi_padding=ROI_PADDING,
+                                         recorder=LandmarkRecorder() if RECORD_LANDMARKS_PATH else None,
+                                         motion_epsilon=MOTION_EPSILON,
+                                         max_reuse_age=MAX_GESTURE_REUSE_AGE,
+                                         mirror=FLIP_CAMERA,
+                                         count_copy=frame_preprocessor.count_copy)
+
+        if WARM_UP:
+            print(f"Models warmed up in {gesture_handler.warm_up() * 1000:.0f} ms")
+
+        frame_scheduler = FrameScheduler(TARGET_LATENCY) if TARGET_LATENCY else None
+
+        recognition_worker = RecognitionWorker(handle_frame, gesture_handler, RECOGNITION_QUEUE_SIZE,
+                                               preview_every=None if HEADLESS else PREVIEW_EVERY,
+                                               scheduler=frame_scheduler).start()
+
+        encoder_factory = None
+        if PROTOCOL != "json":
+            # New encoder on each connection so the server starts with a keyframe
+            def encoder_factory():
+                return ChangeOnlyEncoder(COORDINATES_UPDATE_RATE, KEYFRAME_INTERVAL, binary=PROTOCOL == "changes_binary")
+
+        if SERVER_PORT:
+            # One encoder shared by the clients, new clients start with a keyframe of its state
+            sender = await GestureServer(SERVER_HOST, SERVER_PORT, buffer_size=SERVER_BUFFER_SIZE,
+                                         encoder=encoder_factory() if encoder_factory else None).start()
+        else:
+            sender = GestureSender(WEBSOCKET_URI, SEND_QUEUE_SIZE, encoder_factory).start()
+
+        # Flipped preview, reused across the displayed frames
+        display_frame = None
+
+        # Headless, the loop only ends on Ctrl-C: asyncio.run cancels main, the shutdown still runs
+        try:
+            while True:
+                frame, payload = await recognition_worker.get()
+
+                sender.publish(payload)
+                instrumentation.count("frames")
+
+                if frame is None:
+                    continue
+
+                display_frame = flip_frame(frame, display_frame)
+                frame_preprocessor.count_copy(display_frame.nbytes)
+                show_frame(display_frame, "hand gesture recognition")
+
+                if get_close_event():
+                    print("Stop")
+                    break
+
+        finally:
+            await shutdown(recognition_worker, sender, gesture_handler, frame_scheduler)
+            capture_source.stop()
+            close_camera(capture)
+
+            print(f"Dropped {capture_source.dropped_frames} stale frames")
+
+            if instrumentation_dump:
+                instrumentation_dump.set()
+                instrumentation.dump(INSTRUMENTATION_DUMP_PATH)
+                print(f"Stage latencies written to {INSTRUMENTATION_DUMP_PATH}")
+
+            if instrumentation_server:
+                instrumentation_server.shutdown()
+
+
+async def shutdown(recognition_worker, sender, gesture_handler, frame_scheduler):
+    """
+    Stop the recognition and the sender, print the reports and save the recordings
+    """
+    await recognition_worker.stop()
+    await sender.stop()
+
+    if frame_scheduler:
+        print(f"Frame scheduler: {frame_scheduler.get_report()}")
+    print(f"Sender: {sender.get_counters()}")
+    print(f"Preprocessing: {frame_preprocessor.get_report()}")
+
+    print(f"Face anchor: {gesture_handler.face_tracker.get_report()}")
+
+    if gesture_handler.motion_gate:
+        print(f"Motion gate: {gesture_handler.motion_gate.get_report()}")
+
+    if gesture_handler.recorder is not None:
+        gesture_handler.recorder.save(RECORD_LANDMARKS_PATH)
+        print(f"Landmarks recorded in {RECORD_LANDMARKS_PATH}")
 
+    if frame_recorder:
+        frame_recorder.close()
+        print(f"Frames recorded in {RECORD_FRAMES_PATH}")
 
 asyncio.run(main())
@@ -0,0 +1,29 @@
+import pytest
+
+from helpers.websockets.protocol import GESTURES, ChangeOnlyDecoder, ChangeOnlyEncoder
+
+
+def make_payload(gesture, action=None, x=100):
+    return {
+        "hand": "right_hand",
+        "coordinates": {"left_hand": (0, 0), "right_hand": (x, 120), "face": (180, 108)},
+        "gesture": gesture,
+        "deltas": {"x": 2, "y": -3},
+        "action": action,
+    }
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_round_trip(binary):
+    encoder = ChangeOnlyEncoder(update_rate=30, keyframe_interval=1, binary=binary)
+    decoder = ChangeOnlyDecoder()
+
+    # get_label returns "none" when the prediction is flat
+    payloads = [make_payload(gesture, x=100 + i) for i, gesture in enumerate(GESTURES + ["none", GESTURES[1]])]
+
+    for i, payload in enumerate(payloads):
+        decoded = None
+        for message in encoder.encode(payload, timestamp=i * 0.1):
+            decoded = decoder.decode(message)
+
+        assert decoded == payload
@@ -0,0 +1,56 @@
+import numpy as np
+
+from helpers.gesture_handler.gesture_handler import GestureHandler
+from helpers.gesture_handler.recording import LandmarkRecorder, RecordedFaceTracker, RecordedLandmarks, \
+    load_recording
+
+MODEL_PATH = "./models/March28/March28.keras"
+RESOLUTION = (360, 360)
+
+
+def make_recording(path, num_frames=12):
+    """
+    Recording of a still face, looked for on one frame out of 3, and a right hand
+    """
+    rng = np.random.default_rng(0)
+    recorder = LandmarkRecorder()
+
+    hands = np.full((2, 21, 3), np.nan, dtype=np.float32)
+    hands[1] = rng.random((21, 3)) * 0.1 + [0.5, 0.4, 0]
+
+    for i in range(num_frames):
+        detect_face = i % 3 == 0
+
+        recorder.timestamps.append(i / 30)
+        recorder.hands.append(hands)
+        recorder.faces.append(np.array([[0.5, 0.3, 0]] if detect_face else np.full((1, 3), np.nan), dtype=np.float32))
+        recorder.detect_face.append(detect_face)
+
+    recorder.save(path)
+
+
+def test_replay_in_with_block(tmp_path):
+    path = str(tmp_path / "session.npz")
+    make_recording(path)
+    timestamps, hands, faces, detect_face = load_recording(path)
+
+    with RecordedLandmarks(hands, faces) as landmark_model:
+        face_tracker = RecordedFaceTracker(detect_face)
+        gesture_handler = GestureHandler(RESOLUTION, landmark_model, MODEL_PATH, gesture_model_backend="numpy",
+                                         clock=lambda: 0, face_tracker=face_tracker)
+
+        frame = np.zeros((1, 1, 3), dtype=np.uint8)
+        anchors = []
+        for _ in timestamps:
+            gesture_handler.recognize(frame)
+            anchors.append(gesture_handler.coordinates["face"])
+
+    # The face is held between the recorded localizations instead of being lost
+    assert anchors == [(180, 108)] * len(timestamps)
+    assert landmark_model.index == face_tracker.index == len(timestamps)
+    assert face_tracker.get_report() == {"located": 4, "held": 8, "lost": 0, "mean_age": 1.0, "max_age": 2}
+
+
+def test_recorded_face_tracker_is_not_a_context_manager():
+    assert not hasattr(RecordedFaceTracker, "__enter__")
+    assert hasattr(RecordedLandmarks, "__enter__") and hasattr(RecordedLandmarks, "__exit__")